@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "parivar",
     "rest_framework",
     "rest_framework.authtoken",
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "parivar.middleware.LoginPersonMiddleware",
 ]
 
 ROOT_URLCONF = "bila_parivar.urls"
@@ -168,4 +170,74 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 CELERY_BROKER_URL = "redis://localhost:6379/0"
+# Face-crop thumbnails run on a dedicated pool:
+#   celery -A bila_parivar worker -Q thumbnails --concurrency=2
+CELERY_TASK_ROUTES = {
+    "parivar.tasks.generate_pending_thumbnails": {"queue": "thumbnails"},
+}
+# Scheduled notifications go out at their start time:
+#   celery -A bila_parivar beat
+CELERY_BEAT_SCHEDULE = {
+    "dispatch-due-notifications": {
+        "task": "notifications.tasks.dispatch_due_notifications",
+        "schedule": 60.0,
+    },
+    "send-event-reminders": {
+        "task": "notifications.tasks.send_event_reminders",
+        "schedule": 60.0,
+    },
+}
+# Hour of day (local time) of the daily / weekly event reminders
+EVENT_REMINDER_HOUR = int(os.getenv("EVENT_REMINDER_HOUR", 9))
+
+# OneSignal push delivery (notifications.onesignal). Sending stays off
+# unless enabled, so local runs only log the payload metrics.
+ONESIGNAL_SEND_ENABLED = os.getenv("ONESIGNAL_SEND_ENABLED", "false").lower() == "true"
+ONESIGNAL_API_URL = os.getenv("ONESIGNAL_API_URL", "https://onesignal.com/api/v1/notifications")
+# Provider limit for include_player_ids per request
+ONESIGNAL_CHUNK_SIZE = int(os.getenv("ONESIGNAL_CHUNK_SIZE", 2000))
+ONESIGNAL_MAX_WORKERS = int(os.getenv("ONESIGNAL_MAX_WORKERS", 4))
+ONESIGNAL_MAX_RETRIES = int(os.getenv("ONESIGNAL_MAX_RETRIES", 4))
+ONESIGNAL_TIMEOUT = int(os.getenv("ONESIGNAL_TIMEOUT", 10))
+
+# Notification images (notifications.images): originals are stored by the
+# request, the worker writes size-capped JPEG / WebP variants and a preview.
+# Point NOTIFICATION_IMAGE_STORAGE at django.core.files.storage.FileSystemStorage
+# to keep the files under MEDIA_ROOT when running without S3.
+NOTIFICATION_IMAGE_STORAGE = os.getenv(
+    "NOTIFICATION_IMAGE_STORAGE", "notifications.storages.NotificationImageS3Storage"
+)
+NOTIFICATION_IMAGE_MAX_SIZE = int(os.getenv("NOTIFICATION_IMAGE_MAX_SIZE", 1440))
+NOTIFICATION_IMAGE_PREVIEW_SIZE = int(os.getenv("NOTIFICATION_IMAGE_PREVIEW_SIZE", 320))
+NOTIFICATION_IMAGE_QUALITY = int(os.getenv("NOTIFICATION_IMAGE_QUALITY", 82))
+
+# Seconds a (role, samaj, day) present-notification page stays cached; saves
+# and deletes of notifications drop it earlier (the cache is shared, see CACHES)
+NOTIFICATION_INBOX_CACHE_TTL = int(os.getenv("NOTIFICATION_INBOX_CACHE_TTL", 300))
+
+# Shared cache (Redis next to the Celery broker) so that invalidation on a
+# save reaches every web and worker process. Set CACHE_REDIS_URL="" to fall
+# back to a per-process cache when running a single process locally. Callers
+# treat the cache as optional: while Redis is down they read the database, and
+# the short socket timeouts keep an unreachable Redis from stalling requests.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/1")
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "OPTIONS": {"socket_connect_timeout": 1, "socket_timeout": 1},
+        }
+        if CACHE_REDIS_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    )
+}
+
+# Seconds a resolved X-Mobile-Number -> Person lookup stays cached; Person
+# saves and deletes drop the entries of the numbers they touch
+LOGIN_PERSON_CACHE_TTL = int(os.getenv("LOGIN_PERSON_CACHE_TTL", 30))
+
+# Seconds the v4 login admin contacts and pending count stay cached per scope
+LOGIN_BUNDLE_CACHE_TTL = int(os.getenv("LOGIN_BUNDLE_CACHE_TTL", 10))
+
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
@@ -27,7 +27,8 @@ class NotificationAdmin(admin.ModelAdmin):
 
 @admin.register(NotificationImage)
 class NotificationImageAdmin(admin.ModelAdmin):
-    list_display = ["id", "notification_id", "image_url"]
+    list_display = ["id", "notification_id", "image_url", "state", "width", "height"]
+    list_filter = ["state"]
 
 
 @admin.register(PersonPlayerId)
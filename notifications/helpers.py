@@ -2,15 +2,19 @@
 Birthday helper functions for Bila Parivar.
 
 Provides reusable, role-aware queryset scoping and
-today / upcoming (next-7-days) birthday splitting.
+today / upcoming (next-N-days) birthday listing.
 
 Person.date_of_birth is a CharField in the format:
     "YYYY-MM-DD HH:MM:SS.SSS"  (e.g. "1990-02-24 00:00:00.000")
-So birthday matching is done on the MM-DD slice [5:10].
+Person.save() copies its month/day into the indexed ``birth_md`` column
+(month * 100 + day), so birthday matching is an indexed lookup in SQL.
 """
 
 from datetime import date, timedelta
 
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
 
 # ---------------------------------------------------------------------------
 # Role-based scoping
@@ -61,33 +65,93 @@ def get_birthday_queryset(person, base_qs):
 
 
 # ---------------------------------------------------------------------------
-# Birthday splitting — today vs. next 7 days
+# Upcoming birthdays — today + the next N days
 # ---------------------------------------------------------------------------
 
-def _next_seven_md_strings(today):
+# Horizons (in days after today) the birthday APIs accept
+BIRTHDAY_HORIZONS = (7, 30, 90)
+DEFAULT_BIRTHDAY_HORIZON = 7
+
+
+def month_day(day):
+    """``birth_md`` value of a date: 24 February -> 224."""
+    return day.month * 100 + day.day
+
+
+def _is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def birthday_offsets(start, days):
     """
-    Return a list of 7 MM-DD strings for the 7 days AFTER today
-    (day+1 through day+7), correctly wrapping across year boundaries.
+    ``{birth_md: days after start}`` for the ``days`` days starting at
+    ``start``. In non-leap years 29 February birthdays fall on 28 February.
+    """
+    offsets = {}
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        offsets.setdefault(month_day(day), offset)
+        if day.month == 2 and day.day == 28 and not _is_leap(day.year):
+            offsets.setdefault(229, offset)
+    return offsets
 
-    Args:
-        today (date): Reference date.
 
-    Returns:
-        list[str]: Ordered list like ["02-25", "02-26", ..., "03-03"]
+def birthday_window_q(start, days):
+    """
+    Q matching persons whose birthday falls in the ``days`` days starting at
+    ``start``, as one range on ``birth_md`` (two when the window wraps past
+    31 December). A window that spans 28 February also covers 29 February.
     """
-    return [
-        (today + timedelta(days=1)).strftime("%m-%d")
-        # for i in range(1, 8)
-    ]
+    if days >= 366:
+        return Q(birth_md__isnull=False)
+    first = month_day(start)
+    last_day = start + timedelta(days=days - 1)
+    last = month_day(last_day)
+    if last == 228 and not _is_leap(last_day.year):
+        last = 229
+    if first <= last:
+        return Q(birth_md__range=(first, last))
+    return Q(birth_md__gte=first) | Q(birth_md__lte=last)
+
+
+def upcoming_birthdays(scoped_qs, start, days, login_person=None):
+    """
+    Persons of *scoped_qs* whose birthday falls in the ``days`` days starting
+    at ``start``, annotated with ``days_until`` and sorted in SQL:
 
+        days_until asc → login person's surname first → first_name → id
 
-def split_birthdays(scoped_qs, login_person=None):
+    Callers slice the queryset to paginate.
     """
-    Split a scoped Person queryset into today's and upcoming (next-7-day)
-    birthdays using the MM-DD portion of date_of_birth.
+    offsets = birthday_offsets(start, days)
+    days_until = Case(
+        *(When(birth_md=md, then=Value(offset)) for md, offset in offsets.items()),
+        default=Value(None),
+        output_field=IntegerField(),
+    )
+    login_surname_id = login_person.surname_id if login_person else None
+    surname_priority = Case(
+        When(surname_id=login_surname_id, then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField(),
+    ) if login_surname_id else Value(1, output_field=IntegerField())
+
+    return (
+        scoped_qs.filter(birthday_window_q(start, days))
+        .select_related("surname", "samaj")
+        .only(
+            "id", "first_name", "middle_name", "date_of_birth", "birth_md",
+            "surname", "samaj", "flag_show", "profile", "thumb_profile",
+        )
+        .annotate(days_until=days_until, surname_priority=surname_priority)
+        .order_by("days_until", "surname_priority", Lower("first_name"), "id")
+    )
+
 
-    Records with a null / empty / un-parseable date_of_birth are skipped
-    silently.
+def split_birthdays(scoped_qs, login_person=None, days=DEFAULT_BIRTHDAY_HORIZON):
+    """
+    Split a scoped Person queryset into today's and upcoming (next ``days``
+    days) birthdays, in one query.
 
     Sorting rules
     -------------
@@ -100,67 +164,14 @@ def split_birthdays(scoped_qs, login_person=None):
         scoped_qs   (QuerySet): Role-scoped Person queryset.
         login_person (Person):  The requesting person (used for surname
                                 priority sorting). Pass ``None`` to disable.
+        days        (int):      Upcoming horizon after today.
 
     Returns:
         tuple:
             today_list     (list[Person]) — birthdays today
-            upcoming_list  (list[Person]) — birthdays in next 7 days
+            upcoming_list  (list[Person]) — birthdays in the next ``days`` days
     """
-    today = date.today()
-    today_md   = today.strftime("%m-%d")            # e.g. "02-24"
-    upcoming_mds = _next_seven_md_strings(today)    # e.g. ["02-25", ..., "03-03"]
-    upcoming_order = {md: idx for idx, md in enumerate(upcoming_mds)}
-
-    # Surname id of the login person — used as a sort priority key
-    login_surname_id = (
-        login_person.surname_id
-        if login_person and login_person.surname_id
-        else None
-    )
-
-    def surname_sort_key(person):
-        """
-        0 if same surname as login person (surfaces first),
-        1 otherwise.
-        """
-        if login_surname_id and person.surname_id == login_surname_id:
-            return 0
-        return 1
-
-    # Only fetch fields needed for matching + serialization
-    persons = scoped_qs.select_related("surname", "samaj").only(
-        "id", "first_name", "middle_name", "date_of_birth",
-        "surname", "samaj", "flag_show", "profile", "thumb_profile",
-    )
-
-    today_list = []
-    upcoming_unsorted = []  # list of (date_pos, surname_priority, first_name, person)
-
-    for person in persons:
-        dob = (person.date_of_birth or "").strip()
-        if not dob or len(dob) < 10:
-            continue  # skip blank / malformed DOB
-
-        person_md = dob[5:10]  # "MM-DD" slice
-
-        if person_md == today_md:
-            today_list.append(person)
-        elif person_md in upcoming_order:
-            upcoming_unsorted.append((
-                upcoming_order[person_md],   # primary:  nearest date first
-                surname_sort_key(person),    # secondary: same surname first
-                (person.first_name or "").lower(),  # tertiary: alphabetical
-                person,
-            ))
-
-    # ── Today: same surname first, then first_name alphabetical ──────────
-    today_list.sort(key=lambda p: (
-        surname_sort_key(p),
-        (p.first_name or "").lower(),
-    ))
-
-    # ── Upcoming: (date asc, same-surname first, first_name asc) ─────────
-    upcoming_unsorted.sort(key=lambda t: (t[0], t[1], t[2]))
-    upcoming_list = [t[3] for t in upcoming_unsorted]
-
+    today_list, upcoming_list = [], []
+    for person in upcoming_birthdays(scoped_qs, date.today(), days + 1, login_person):
+        (today_list if person.days_until == 0 else upcoming_list).append(person)
     return today_list, upcoming_list
@@ -0,0 +1,125 @@
+"""
+Notification image ingest.
+
+The upload request only stores the original file. ``process_image`` (run by
+notifications.tasks.transcode_notification_images) decodes it once and
+writes three variants next to it:
+
+    <stem>.jpg          long edge <= NOTIFICATION_IMAGE_MAX_SIZE, the push
+                        ``big_picture`` and app image (JPEG works on every
+                        Android / iOS version)
+    <stem>.webp         same size, smaller, for clients that accept WebP
+    <stem>_preview.webp long edge <= NOTIFICATION_IMAGE_PREVIEW_SIZE
+
+Transparent images are flattened on white for the JPEG only.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import NotificationImage
+
+logger = logging.getLogger(__name__)
+
+
+def _resized(image, max_size):
+    image = image.copy()
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    return image
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def transcode(source):
+    """
+    Decode ``source`` (a file object) and return ``(variants, width, height)``,
+    ``variants`` mapping a NotificationImage variant field to ``(suffix, bytes)``.
+    Raises ``UnidentifiedImageError`` / ``OSError`` for files that are not images.
+    """
+    quality = settings.NOTIFICATION_IMAGE_QUALITY
+    with Image.open(source) as opened:
+        opened.seek(0)  # first frame of animated images
+        image = ImageOps.exif_transpose(opened)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    full = _resized(image, settings.NOTIFICATION_IMAGE_MAX_SIZE)
+    preview = _resized(image, settings.NOTIFICATION_IMAGE_PREVIEW_SIZE)
+
+    flat = full
+    if has_alpha:
+        flat = Image.new("RGB", full.size, (255, 255, 255))
+        flat.paste(full, mask=full.getchannel("A"))
+
+    variants = {
+        "optimized_url": (".jpg", _encode(flat, "JPEG", quality=quality, optimize=True, progressive=True)),
+        "webp_url": (".webp", _encode(full, "WEBP", quality=quality, method=4)),
+        "preview_url": ("_preview.webp", _encode(preview, "WEBP", quality=quality, method=4)),
+    }
+    return variants, full.width, full.height
+
+
+def write_variants(storage, original_name, variants):
+    """Save the variants next to ``original_name``; returns ``{field: stored name}``."""
+    stem = os.path.splitext(original_name)[0]
+    return {
+        field: storage.save(f"{stem}{suffix}", ContentFile(data))
+        for field, (suffix, data) in variants.items()
+    }
+
+
+def process_image(image):
+    """Transcode one pending NotificationImage and record the result."""
+    if not image.image_url:
+        image.state = NotificationImage.STATE_SKIPPED
+        image.save(update_fields=["state"])
+        return image
+
+    storage = image.image_url.storage
+    try:
+        with storage.open(image.image_url.name, "rb") as source:
+            variants, width, height = transcode(source)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        # Not an image (or refused as one): the original is delivered as uploaded
+        image.state = NotificationImage.STATE_SKIPPED
+        image.save(update_fields=["state"])
+        return image
+    except OSError:
+        logger.exception("Notification image %s could not be transcoded", image.pk)
+        image.state = NotificationImage.STATE_FAILED
+        image.save(update_fields=["state"])
+        return image
+
+    for field, name in write_variants(storage, image.image_url.name, variants).items():
+        getattr(image, field).name = name
+    image.width, image.height = width, height
+    image.state = NotificationImage.STATE_READY
+    image.save(update_fields=[*NotificationImage.VARIANT_FIELDS, "width", "height", "state"])
+    return image
+
+
+def process_pending(notification_id):
+    """Transcode the pending images of a notification; returns the push image name."""
+    images = list(
+        NotificationImage.objects.filter(notification_id_id=notification_id).order_by("id")
+    )
+    for image in images:
+        if image.state == NotificationImage.STATE_PENDING:
+            process_image(image)
+    return images[0].push_name if images else None
+
+
+def push_image_names(notification_ids):
+    """``{notification_id: big_picture name}`` for many notifications in one query."""
+    names = {}
+    for image in NotificationImage.objects.filter(notification_id__in=notification_ids).order_by("id"):
+        names.setdefault(image.notification_id_id, image.push_name)
+    return names
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from notifications.services import AudienceService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the NotificationAudience index from PersonPlayerId and Person."
+
+    def handle(self, *args, **options):
+        count = AudienceService.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} devices."))
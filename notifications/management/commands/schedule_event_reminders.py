@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from notifications.models import Notification
+from notifications.services import EventReminderService
+
+
+class Command(BaseCommand):
+    help = "Recompute the EventReminder slots of every upcoming event notification."
+
+    def handle(self, *args, **options):
+        events = Notification.objects.filter(is_event=True, expire_date__gt=datetime.now())
+        scheduled = sum(EventReminderService.schedule(event) for event in events.iterator())
+        self.stdout.write(self.style.SUCCESS(f"Scheduled {scheduled} reminders for {events.count()} events."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from notifications.images import process_image
+from notifications.models import NotificationImage
+
+
+class Command(BaseCommand):
+    help = "Write the JPEG / WebP / preview variants of pending (or failed) notification images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry-failed", action="store_true", help="Also retry failed images.")
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many images.")
+
+    def handle(self, *args, **options):
+        states = [NotificationImage.STATE_PENDING]
+        if options["retry_failed"]:
+            states.append(NotificationImage.STATE_FAILED)
+        queryset = NotificationImage.objects.filter(state__in=states).order_by("id")
+        if options["limit"]:
+            queryset = queryset[: options["limit"]]
+
+        counts = {}
+        for image in queryset.iterator():
+            state = process_image(image).state
+            counts[state] = counts.get(state, 0) + 1
+
+        summary = ", ".join(f"{count} {state}" for state, count in sorted(counts.items())) or "nothing to do"
+        style = self.style.WARNING if counts.get(NotificationImage.STATE_FAILED) else self.style.SUCCESS
+        self.stdout.write(style(f"Notification images: {summary}."))
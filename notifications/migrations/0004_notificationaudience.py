@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_audience(apps, schema_editor):
+    PersonPlayerId = apps.get_model("notifications", "PersonPlayerId")
+    NotificationAudience = apps.get_model("notifications", "NotificationAudience")
+
+    rows = []
+    for player in PersonPlayerId.objects.select_related("person").exclude(player_id=None).exclude(player_id="").iterator():
+        person = player.person
+        rows.append(
+            NotificationAudience(
+                device_id=player.pk,
+                person_id=person.id,
+                samaj_id=person.samaj_id,
+                surname_id=person.surname_id,
+                platform=player.platform if player.platform in ("Android", "Ios") else "Android",
+                player_id=player.player_id,
+                is_active=not person.is_deleted,
+                is_listed=bool(person.flag_show),
+            )
+        )
+        if len(rows) >= 1000:
+            NotificationAudience.objects.bulk_create(rows)
+            rows = []
+    NotificationAudience.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_notificatio_expire__f24ed5_idx_and_more'),
+        ('parivar', '0083_person_thumb_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationAudience',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='audience', serialize=False, to='notifications.personplayerid')),
+                ('platform', models.CharField(max_length=10)),
+                ('player_id', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_listed', models.BooleanField(default=False)),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='parivar.person')),
+                ('samaj', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.samaj')),
+                ('surname', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.surname')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['surname', 'platform'], name='notif_audience_surname_idx'), models.Index(condition=models.Q(('is_active', True)), fields=['samaj', 'platform'], name='notif_audience_samaj_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_audience, migrations.RunPython.noop),
+    ]
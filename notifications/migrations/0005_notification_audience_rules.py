@@ -0,0 +1,130 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:57
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def collapse_to_person(apps, schema_editor):
+    """
+    Turn each notification's to_person rows into rules that select the
+    same readers among today's approved persons: samaj rules for samaj
+    that were fully targeted (an "all" rule when every samaj was), surname
+    rules plus person exclusions when most of a surname was targeted, and
+    person rules for the rest.
+    """
+    Person = apps.get_model("parivar", "Person")
+    Surname = apps.get_model("parivar", "Surname")
+    Notification = apps.get_model("notifications", "Notification")
+    Rule = apps.get_model("notifications", "NotificationAudienceRule")
+    Through = Notification.to_person.through
+
+    top_member_ids = {
+        int(value)
+        for value in Surname.objects.values_list("top_member", flat=True)
+        if str(value).isdigit()
+    }
+    person_samaj = {}
+    person_surname = {}
+    eligible_by_samaj = defaultdict(set)
+    eligible_by_surname = defaultdict(set)
+    for person_id, samaj_id, surname_id in (
+        Person.objects.filter(is_deleted=False, flag_show=True)
+        .values_list("id", "samaj_id", "surname_id")
+        .iterator()
+    ):
+        if person_id in top_member_ids:
+            continue
+        person_samaj[person_id] = samaj_id
+        person_surname[person_id] = surname_id
+        eligible_by_samaj[samaj_id].add(person_id)
+        if surname_id:
+            eligible_by_surname[surname_id].add(person_id)
+
+    members_by_notification = defaultdict(set)
+    for notification_id, person_id in Through.objects.values_list("notification_id", "person_id").iterator():
+        if person_id in person_samaj:
+            members_by_notification[notification_id].add(person_id)
+
+    rules = []
+    for notification in Notification.objects.only("id", "filter").iterator():
+        members = members_by_notification.get(notification.id)
+        if not members:
+            continue
+
+        def add(scope, is_exclusion=False, **target):
+            rules.append(
+                Rule(notification_id=notification.id, scope=scope, is_exclusion=is_exclusion, **target)
+            )
+
+        if len(members) == len(person_samaj):
+            add("all")
+            continue
+        clean_samaj = {
+            samaj_id
+            for samaj_id, eligible in eligible_by_samaj.items()
+            if samaj_id and eligible <= members
+        }
+        for samaj_id in clean_samaj:
+            add("samaj", samaj_id=samaj_id)
+
+        rest = {person_id for person_id in members if person_samaj[person_id] not in clean_samaj}
+        by_surname = defaultdict(set)
+        for person_id in rest:
+            by_surname[person_surname[person_id]].add(person_id)
+        for surname_id, targeted in by_surname.items():
+            eligible = {
+                person_id
+                for person_id in eligible_by_surname.get(surname_id, ())
+                if person_samaj[person_id] not in clean_samaj
+            }
+            if surname_id and len(targeted) * 2 >= len(eligible):
+                add("surname", surname_id=surname_id)
+                for person_id in eligible - targeted:
+                    add("person", is_exclusion=True, person_id=person_id)
+            else:
+                for person_id in targeted:
+                    add("person", person_id=person_id)
+
+        if len(rules) >= 1000:
+            Rule.objects.bulk_create(rules)
+            rules = []
+    Rule.objects.bulk_create(rules)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notificationaudience'),
+        ('parivar', '0083_person_thumb_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationInboxState',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='parivar.person')),
+                ('offset', models.BigIntegerField(default=0)),
+                ('read_bits', models.BinaryField(default=b'')),
+                ('dismissed_bits', models.BinaryField(default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationAudienceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('all', 'All'), ('samaj', 'Samaj'), ('surname', 'Surname'), ('person', 'Person')], max_length=10)),
+                ('is_exclusion', models.BooleanField(default=False)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audience_rules', to='notifications.notification')),
+                ('person', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='parivar.person')),
+                ('samaj', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='parivar.samaj')),
+                ('surname', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='parivar.surname')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['notification', 'is_exclusion', 'scope'], name='notificatio_notific_d3657d_idx')],
+            },
+        ),
+        migrations.RunPython(collapse_to_person, migrations.RunPython.noop),
+    ]
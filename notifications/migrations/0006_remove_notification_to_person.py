@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_audience_rules'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='notification',
+            name='to_person',
+        ),
+    ]
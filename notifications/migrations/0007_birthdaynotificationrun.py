@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_remove_notification_to_person'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BirthdayNotificationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField(unique=True)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('birthday_count', models.PositiveIntegerField(default=0)),
+                ('samaj_count', models.PositiveIntegerField(default=0)),
+                ('pushes_sent', models.PositiveIntegerField(default=0)),
+                ('sent_samaj', models.JSONField(blank=True, default=list)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:07
+
+import notifications.storages
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_birthdaynotificationrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationimage',
+            name='optimized_url',
+            field=models.FileField(blank=True, null=True, storage=notifications.storages.notification_image_storage, upload_to='notification_images/'),
+        ),
+        migrations.AddField(
+            model_name='notificationimage',
+            name='preview_url',
+            field=models.FileField(blank=True, null=True, storage=notifications.storages.notification_image_storage, upload_to='notification_images/'),
+        ),
+        migrations.AddField(
+            model_name='notificationimage',
+            name='state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notificationimage',
+            name='webp_url',
+            field=models.FileField(blank=True, null=True, storage=notifications.storages.notification_image_storage, upload_to='notification_images/'),
+        ),
+        migrations.AddField(
+            model_name='notificationimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationimage',
+            name='image_url',
+            field=models.FileField(blank=True, null=True, storage=notifications.storages.notification_image_storage, upload_to='notification_images/'),
+        ),
+    ]
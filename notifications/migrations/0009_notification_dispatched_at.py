@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:08
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def mark_sent_notifications(apps, schema_editor):
+    # The old flow pushed on create when the start date was the creation day,
+    # and the daily cron pushed everything else on its start date.
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.filter(
+        models.Q(start_date__lte=datetime.now())
+        | models.Q(start_date__date=models.F("created_at__date"))
+        | models.Q(start_date__isnull=True)
+    ).update(dispatched_at=Coalesce("start_date", "created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_notificationimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['start_date', 'id'], name='notification_due_idx'),
+        ),
+        migrations.RunPython(mark_sent_notifications, migrations.RunPython.noop),
+    ]
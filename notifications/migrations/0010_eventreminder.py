@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_notification_dispatched_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('remind_at', models.DateTimeField()),
+                ('kind', models.CharField(choices=[('custom', 'Custom'), ('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='notifications.notification')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['remind_at', 'id'], name='event_reminder_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventreminder',
+            constraint=models.UniqueConstraint(fields=('notification', 'remind_at'), name='event_reminder_unique_slot'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
-from parivar.models import Person
-from notifications.storages import NotificationImageS3Storage
+from parivar.models import Person, Samaj, Surname
+from notifications.storages import notification_image_storage
 from django.contrib.postgres.indexes import GinIndex
 
 class PersonPlayerId(models.Model):
@@ -18,6 +18,40 @@ class PersonPlayerId(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class NotificationAudience(models.Model):
+    """
+    Push audience index: one row per registered device with the owner's
+    samaj, surname and status copied in, so a notification's recipients are
+    resolved with one indexed query. Kept in sync by AudienceService.
+    """
+
+    device = models.OneToOneField(
+        PersonPlayerId, on_delete=models.CASCADE, primary_key=True, related_name="audience"
+    )
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="+")
+    samaj = models.ForeignKey(Samaj, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    surname = models.ForeignKey(Surname, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    platform = models.CharField(max_length=10)
+    player_id = models.CharField(max_length=100)
+    # Person is not deleted
+    is_active = models.BooleanField(default=True)
+    # Person is approved (flag_show)
+    is_listed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["surname", "platform"],
+                name="notif_audience_surname_idx",
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=["samaj", "platform"],
+                name="notif_audience_samaj_idx",
+                condition=models.Q(is_active=True),
+            ),
+        ]
+
 
 class Notification(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -27,15 +61,14 @@ class Notification(models.Model):
     start_date = models.DateTimeField(blank=True, null=True)
     expire_date = models.DateTimeField(blank=False, null=False)
     is_event = models.BooleanField(default=False)
-    to_person = models.ManyToManyField(
-        Person, related_name="notifications_persons", blank=True
-    )
     event_reminder_date = models.DateTimeField(blank=True, null=True)
     created_user = models.CharField(max_length=255, blank=True, null=True)
     filter = models.JSONField(null=True, blank=True)
     is_show_left_time = models.BooleanField(default=False)
     is_show_ad_lable = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the push went out (NotificationDispatcher); null means still due
+    dispatched_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         indexes = [
@@ -43,25 +76,244 @@ class Notification(models.Model):
             models.Index(fields=["created_at"]),
             models.Index(fields=["is_event"]),
             GinIndex(fields=["filter"]),
+            models.Index(
+                fields=["start_date", "id"],
+                name="notification_due_idx",
+                condition=models.Q(dispatched_at__isnull=True),
+            ),
         ]
 
     def __str__(self):
         return self.title
 
 
+class NotificationAudienceRule(models.Model):
+    """
+    Who sees a notification in the inbox. A reader sees it when at least one
+    inclusion rule matches their samaj / surname / id and no exclusion rule
+    does; rules are evaluated at read time by InboxService.
+    """
+
+    SCOPE_ALL = "all"
+    SCOPE_SAMAJ = "samaj"
+    SCOPE_SURNAME = "surname"
+    SCOPE_PERSON = "person"
+    SCOPE_CHOICES = [
+        (SCOPE_ALL, "All"),
+        (SCOPE_SAMAJ, "Samaj"),
+        (SCOPE_SURNAME, "Surname"),
+        (SCOPE_PERSON, "Person"),
+    ]
+
+    notification = models.ForeignKey(
+        Notification, on_delete=models.CASCADE, related_name="audience_rules"
+    )
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    # A surname rule with a samaj only matches readers of that samaj
+    samaj = models.ForeignKey(Samaj, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    surname = models.ForeignKey(Surname, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    is_exclusion = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["notification", "is_exclusion", "scope"]),
+        ]
+
+    def __str__(self):
+        kind = "exclude" if self.is_exclusion else "include"
+        return f"{self.notification_id} {kind} {self.scope}"
+
+
+class NotificationInboxState(models.Model):
+    """
+    Read and dismissed notifications of one person, stored as two bitmaps
+    over notification ids: bit ``i`` stands for notification ``offset + i``.
+    """
+
+    person = models.OneToOneField(
+        Person, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    offset = models.BigIntegerField(default=0)
+    read_bits = models.BinaryField(default=b"")
+    dismissed_bits = models.BinaryField(default=b"")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def _bits(self, field):
+        return bytearray(getattr(self, field) or b"")
+
+    def contains(self, field, notification_id):
+        index = notification_id - self.offset
+        bits = self._bits(field)
+        return 0 <= index < len(bits) * 8 and bool(bits[index // 8] & (1 << index % 8))
+
+    def ids(self, field):
+        return [
+            self.offset + byte_index * 8 + bit
+            for byte_index, byte in enumerate(self._bits(field))
+            if byte
+            for bit in range(8)
+            if byte & (1 << bit)
+        ]
+
+    def add(self, field, notification_ids):
+        notification_ids = sorted(set(notification_ids))
+        if not notification_ids:
+            return
+        fields = ("read_bits", "dismissed_bits")
+        empty = not any(getattr(self, name) for name in fields)
+        low = notification_ids[0] - notification_ids[0] % 8
+        if empty:
+            self.offset = low
+        elif low < self.offset:
+            # Re-base both bitmaps so the lower id fits
+            padding = bytes((self.offset - low) // 8)
+            for name in fields:
+                setattr(self, name, padding + bytes(self._bits(name)))
+            self.offset = low
+        bits = self._bits(field)
+        for notification_id in notification_ids:
+            index = notification_id - self.offset
+            if index // 8 >= len(bits):
+                bits.extend(bytes(index // 8 + 1 - len(bits)))
+            bits[index // 8] |= 1 << index % 8
+        setattr(self, field, bytes(bits))
+
+
+class EventReminder(models.Model):
+    """
+    One precomputed reminder push of an event notification
+    (EventReminderService.slots). Unsent rows are fired by
+    notifications.tasks.send_event_reminders once ``remind_at`` is reached.
+    """
+
+    KIND_CUSTOM = "custom"
+    KIND_DAILY = "daily"
+    KIND_WEEKLY = "weekly"
+    KIND_CHOICES = (
+        (KIND_CUSTOM, "Custom"),
+        (KIND_DAILY, "Daily"),
+        (KIND_WEEKLY, "Weekly"),
+    )
+
+    notification = models.ForeignKey(
+        Notification, on_delete=models.CASCADE, related_name="reminders"
+    )
+    remind_at = models.DateTimeField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["notification", "remind_at"], name="event_reminder_unique_slot"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["remind_at", "id"],
+                name="event_reminder_due_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_id} @ {self.remind_at:%Y-%m-%d %H:%M}"
+
+
+class BirthdayNotificationRun(models.Model):
+    """
+    One daily birthday fan-out (notifications.tasks.send_birthday_notifications).
+
+    ``run_date`` is unique, so triggering the cron again on the same day
+    reuses the run; ``sent_samaj`` lists the samaj already notified, so a
+    failed run resumes without pushing twice.
+    """
+
+    STATE_PENDING = "pending"
+    STATE_RUNNING = "running"
+    STATE_COMPLETED = "completed"
+    STATE_FAILED = "failed"
+    STATE_CHOICES = (
+        (STATE_PENDING, "Pending"),
+        (STATE_RUNNING, "Running"),
+        (STATE_COMPLETED, "Completed"),
+        (STATE_FAILED, "Failed"),
+    )
+
+    run_date = models.DateField(unique=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_PENDING)
+    birthday_count = models.PositiveIntegerField(default=0)
+    samaj_count = models.PositiveIntegerField(default=0)
+    pushes_sent = models.PositiveIntegerField(default=0)
+    sent_samaj = models.JSONField(default=list, blank=True)
+    stats = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.run_date} - {self.state}"
+
+
 class NotificationImage(models.Model):
+    """
+    An uploaded notification image. The request stores the original as-is;
+    notifications.tasks.transcode_notification_images then writes the
+    size-capped JPEG (push big_picture and app display), WebP and preview
+    variants and marks the image ready.
+    """
+
+    STATE_PENDING = "pending"
+    STATE_READY = "ready"
+    STATE_FAILED = "failed"
+    # Uploads that are not images are kept as they are
+    STATE_SKIPPED = "skipped"
+    STATE_CHOICES = (
+        (STATE_PENDING, "Pending"),
+        (STATE_READY, "Ready"),
+        (STATE_FAILED, "Failed"),
+        (STATE_SKIPPED, "Skipped"),
+    )
+
     notification_id = models.ForeignKey(Notification, on_delete=models.CASCADE)
     image_url = models.FileField(
-        storage=NotificationImageS3Storage(),
+        storage=notification_image_storage,
         upload_to="notification_images/",
         blank=True,
         null=True,
     )
+    optimized_url = models.FileField(
+        storage=notification_image_storage, upload_to="notification_images/", blank=True, null=True
+    )
+    webp_url = models.FileField(
+        storage=notification_image_storage, upload_to="notification_images/", blank=True, null=True
+    )
+    preview_url = models.FileField(
+        storage=notification_image_storage, upload_to="notification_images/", blank=True, null=True
+    )
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_PENDING)
+
+    VARIANT_FIELDS = ("optimized_url", "webp_url", "preview_url")
 
     def __str__(self):
         return self.notification_id.title
 
+    @property
+    def push_name(self):
+        """Storage name sent as the push ``big_picture``: the optimized JPEG once ready."""
+        return self.optimized_url.name if self.optimized_url else self.image_url.name
+
+    @property
+    def display_file(self):
+        return self.optimized_url if self.optimized_url else self.image_url
+
     def delete(self, *args, **kwargs):
-        # Delete the file from S3
+        # Delete the original and its variants from S3
         self.image_url.delete(save=False)
+        for field in self.VARIANT_FIELDS:
+            getattr(self, field).delete(save=False)
         super().delete(*args, **kwargs)
@@ -0,0 +1,197 @@
+"""
+OneSignal push delivery.
+
+One pooled ``requests.Session`` is shared per worker process. Player id
+lists are split into chunks of ``ONESIGNAL_CHUNK_SIZE`` (the provider caps
+``include_player_ids`` per request), and the chunks of every platform are
+posted concurrently. 429 and 5xx answers, timeouts and connection errors
+are retried with full-jitter exponential backoff, honouring ``Retry-After``.
+``deliver`` returns a metrics dict that is also logged as one JSON line.
+
+Set ``ONESIGNAL_API_URL`` to point the engine at a local stub server.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+IMAGE_BASE_URL = "https://classdekho.s3.ap-south-1.amazonaws.com/Billaparivar/"
+
+# Per platform: (app id env var, authorization env var)
+PLATFORM_CREDENTIALS = {
+    "Android": ("ANDROID_ONE_SIGNAL_APP_ID", "ANDROID_ONE_SIGNAL_AUTHORIZATION_ID"),
+    "Ios": ("IOS_ONE_SIGNAL_APP_ID", "IOS_ONE_SIGNAL_AUTHORIZATION_ID"),
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Retries are handled by post_with_retry, not by urllib3
+                adapter = HTTPAdapter(
+                    pool_connections=2,
+                    pool_maxsize=settings.ONESIGNAL_MAX_WORKERS,
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Content-Type"] = "application/json"
+                _session = session
+    return _session
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def build_payload(platform, title, sub_title, image_url, player_ids=None):
+    """Payload for one platform; ``player_ids=None`` targets the "All" segment."""
+    app_id_env, _ = PLATFORM_CREDENTIALS[platform]
+    payload = {
+        "app_id": os.getenv(app_id_env),
+        "headings": {"en": title if title else "Bila Parivar"},
+        "contents": {"en": sub_title if sub_title else ""},
+        "big_picture": f"{IMAGE_BASE_URL}{image_url}" if image_url else "",
+    }
+    if player_ids is None:
+        payload["included_segments"] = ["All"]
+    else:
+        payload["include_player_ids"] = list(player_ids)
+    if platform == "Ios":
+        payload["ios_badgeCount"] = 1
+        payload["ios_badgeType"] = "Increase"
+    return payload
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff; a ``Retry-After`` header wins when present."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def post_with_retry(session, url, headers, payload, max_retries, timeout, sleep=time.sleep):
+    """
+    POST ``payload`` and retry on 429/5xx and transport errors. Returns a
+    result dict: status, attempts, elapsed, ok, error and the provider body.
+    """
+    started = time.monotonic()
+    result = {"status": None, "attempts": 0, "ok": False, "error": "", "body": None}
+    for attempt in range(max_retries + 1):
+        result["attempts"] = attempt + 1
+        retry_after = None
+        try:
+            response = session.post(url, headers=headers, data=json.dumps(payload), timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            result["status"] = None
+            result["error"] = f"{type(exc).__name__}: {exc}"
+        else:
+            result["status"] = response.status_code
+            try:
+                result["body"] = response.json()
+            except ValueError:
+                result["body"] = response.text
+            if response.status_code < 300:
+                result["ok"] = True
+                result["error"] = ""
+                break
+            result["error"] = f"HTTP {response.status_code}"
+            if response.status_code not in RETRY_STATUSES:
+                break
+            retry_after = response.headers.get("Retry-After")
+        if attempt < max_retries:
+            sleep(backoff_delay(attempt, retry_after))
+    result["elapsed"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def _send_chunk(platform, payload, sleep):
+    _, authorization_env = PLATFORM_CREDENTIALS[platform]
+    result = post_with_retry(
+        get_session(),
+        settings.ONESIGNAL_API_URL,
+        {"Authorization": os.getenv(authorization_env) or ""},
+        payload,
+        max_retries=settings.ONESIGNAL_MAX_RETRIES,
+        timeout=settings.ONESIGNAL_TIMEOUT,
+        sleep=sleep,
+    )
+    result["platform"] = platform
+    player_ids = payload.get("include_player_ids")
+    result["recipients"] = len(player_ids) if player_ids is not None else "All"
+    body = result.pop("body")
+    if isinstance(body, dict):
+        errors = body.get("errors")
+        if isinstance(errors, dict):
+            result["invalid_player_ids"] = len(errors.get("invalid_player_ids", []))
+        result["id"] = body.get("id", "")
+    return result
+
+
+def deliver(title, sub_title, image_url, is_all_segment, player_ids_android=None, player_ids_ios=None, sleep=time.sleep):
+    """
+    Send one notification to both platforms and return the delivery metrics.
+    ``is_all_segment`` keeps the string convention of the views ("false"
+    means "only the given player ids").
+    """
+    started = time.monotonic()
+    targets = {"Android": player_ids_android, "Ios": player_ids_ios}
+    payloads = []
+    for platform, player_ids in targets.items():
+        if is_all_segment != "false":
+            payloads.append((platform, build_payload(platform, title, sub_title, image_url)))
+            continue
+        for chunk in chunked(list(dict.fromkeys(player_ids or [])), settings.ONESIGNAL_CHUNK_SIZE):
+            payloads.append((platform, build_payload(platform, title, sub_title, image_url, chunk)))
+
+    metrics = {
+        "title": title,
+        "enabled": settings.ONESIGNAL_SEND_ENABLED,
+        "requests": len(payloads),
+        "recipients": {platform: len(set(ids or [])) for platform, ids in targets.items()},
+        "sent": 0,
+        "failed": 0,
+        "retries": 0,
+        "invalid_player_ids": 0,
+        "chunks": [],
+    }
+    if not settings.ONESIGNAL_SEND_ENABLED:
+        logger.info("onesignal dry run %s", json.dumps(metrics, ensure_ascii=False))
+        return metrics
+
+    with ThreadPoolExecutor(max_workers=settings.ONESIGNAL_MAX_WORKERS) as executor:
+        results = list(executor.map(lambda item: _send_chunk(*item, sleep), payloads))
+
+    for result in results:
+        metrics["sent" if result["ok"] else "failed"] += 1
+        metrics["retries"] += result["attempts"] - 1
+        metrics["invalid_player_ids"] += result.get("invalid_player_ids", 0)
+    metrics["chunks"] = results
+    metrics["elapsed"] = round(time.monotonic() - started, 3)
+    log = logger.warning if metrics["failed"] else logger.info
+    log("onesignal delivery %s", json.dumps(metrics, ensure_ascii=False))
+    return metrics
@@ -2,6 +2,19 @@ from rest_framework import serializers
 from notifications.models import Notification, NotificationImage
 
 
+def image_variants(image):
+    """URLs of a NotificationImage; the variants are null until transcoding finished."""
+    return {
+        "original": image.image_url.url,
+        "jpeg": image.optimized_url.url if image.optimized_url else None,
+        "webp": image.webp_url.url if image.webp_url else None,
+        "preview": image.preview_url.url if image.preview_url else None,
+        "width": image.width,
+        "height": image.height,
+        "state": image.state,
+    }
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
@@ -10,6 +23,7 @@ class NotificationSerializer(serializers.ModelSerializer):
 
 class NotificationCreateSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
@@ -19,10 +33,10 @@ class NotificationCreateSerializer(serializers.ModelSerializer):
             "sub_title",
             "redirect_url",
             "image_url",
+            "image_variants",
             "is_event",
             "event_reminder_date",
             "filter",
-            "to_person",
             "created_user",
             "start_date",
             "expire_date",
@@ -31,15 +45,21 @@ class NotificationCreateSerializer(serializers.ModelSerializer):
         ]
 
     def get_image_url(self, obj):
-        images = NotificationImage.objects.filter(notification_id=obj.id)
-        return [image.image_url.url for image in images if image.image_url]
+        # Served from prefetch_related("notificationimage_set") when the caller prefetched
+        images = obj.notificationimage_set.all()
+        return [image.display_file.url for image in images if image.image_url]
+
+    def get_image_variants(self, obj):
+        return [image_variants(image) for image in obj.notificationimage_set.all() if image.image_url]
 
 
 class NotificationNewGetSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     start_date = serializers.SerializerMethodField()
     expire_date = serializers.SerializerMethodField()
     event_reminder_date = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
@@ -49,6 +69,7 @@ class NotificationNewGetSerializer(serializers.ModelSerializer):
             "sub_title",
             "redirect_url",
             "image_url",
+            "image_variants",
             "is_event",
             "event_reminder_date",
             "filter",
@@ -57,11 +78,19 @@ class NotificationNewGetSerializer(serializers.ModelSerializer):
             "expire_date",
             "is_show_left_time",
             "is_show_ad_lable",
+            "is_read",
         ]
 
     def get_image_url(self, obj):
-        images = NotificationImage.objects.filter(notification_id=obj.id)
-        return [image.image_url.url for image in images if image.image_url]
+        # Served from prefetch_related("notificationimage_set") when the caller prefetched
+        images = obj.notificationimage_set.all()
+        return [image.display_file.url for image in images if image.image_url]
+
+    def get_image_variants(self, obj):
+        return [image_variants(image) for image in obj.notificationimage_set.all() if image.image_url]
+
+    def get_is_read(self, obj):
+        return obj.id in self.context.get("read_ids", ())
 
     def get_start_date(self, obj):
         # Convert datetime to milliseconds timestamp
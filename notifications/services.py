@@ -0,0 +1,852 @@
+import base64
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from parivar.models import Person, Surname
+
+from .helpers import birthday_window_q
+from .images import push_image_names
+from .models import (
+    BirthdayNotificationRun,
+    EventReminder,
+    Notification,
+    NotificationAudience,
+    NotificationAudienceRule,
+    NotificationInboxState,
+    PersonPlayerId,
+)
+from .onesignal import deliver
+
+logger = logging.getLogger(__name__)
+
+
+class AudienceService:
+    """
+    Maintains NotificationAudience and turns notification targets into
+    Android / iOS player id lists.
+
+    Targets are surname ids (surnames belong to one samaj, so a target never
+    leaks into another samaj) or a whole samaj. Deleted persons never
+    receive pushes.
+    """
+
+    BATCH_SIZE = 500
+    PLATFORMS = ("Android", "Ios")
+
+    @classmethod
+    def build_entry(cls, player, person):
+        return NotificationAudience(
+            device_id=player.pk,
+            person_id=person.id,
+            samaj_id=person.samaj_id,
+            surname_id=person.surname_id,
+            platform=player.platform if player.platform in cls.PLATFORMS else "Android",
+            player_id=player.player_id,
+            is_active=not person.is_deleted,
+            is_listed=bool(person.flag_show),
+        )
+
+    @classmethod
+    def _write(cls, players):
+        entries = []
+        stale = []
+        for player in players:
+            if player.player_id:
+                entries.append(cls.build_entry(player, player.person))
+            else:
+                stale.append(player.pk)
+        if stale:
+            NotificationAudience.objects.filter(device_id__in=stale).delete()
+        NotificationAudience.objects.bulk_create(
+            entries,
+            batch_size=cls.BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["device"],
+            update_fields=[
+                "person", "samaj", "surname", "platform", "player_id", "is_active", "is_listed",
+            ],
+        )
+
+    @classmethod
+    def refresh_players(cls, player_pks):
+        """Re-index the given PersonPlayerId rows."""
+        player_pks = list(set(player_pks) - {None})
+        for start in range(0, len(player_pks), cls.BATCH_SIZE):
+            cls._write(
+                PersonPlayerId.objects.filter(pk__in=player_pks[start:start + cls.BATCH_SIZE])
+                .select_related("person")
+            )
+
+    @classmethod
+    def refresh_persons(cls, person_ids):
+        """Re-index every device of ``person_ids`` (after a bulk update of persons)."""
+        person_ids = list(set(person_ids) - {None})
+        for start in range(0, len(person_ids), cls.BATCH_SIZE):
+            cls._write(
+                PersonPlayerId.objects.filter(person_id__in=person_ids[start:start + cls.BATCH_SIZE])
+                .select_related("person")
+            )
+
+    @classmethod
+    def sync_person(cls, person):
+        """Copy a saved person's samaj, surname and status onto its devices."""
+        NotificationAudience.objects.filter(person_id=person.id).update(
+            samaj_id=person.samaj_id,
+            surname_id=person.surname_id,
+            is_active=not person.is_deleted,
+            is_listed=bool(person.flag_show),
+        )
+
+    @classmethod
+    def rebuild_all(cls):
+        queryset = PersonPlayerId.objects.select_related("person").order_by("pk")
+        last_pk = 0
+        total = 0
+        while True:
+            players = list(queryset.filter(pk__gt=last_pk)[:cls.BATCH_SIZE])
+            if not players:
+                break
+            cls._write(players)
+            last_pk = players[-1].pk
+            total += len(players)
+        return total
+
+    @classmethod
+    def _split(cls, rows):
+        targets = {platform: [] for platform in cls.PLATFORMS}
+        for platform, player_id in rows:
+            targets[platform].append(player_id)
+        return targets["Android"], targets["Ios"]
+
+    @classmethod
+    def resolve(cls, surname_ids=None, samaj_id=None, listed_only=False, exclude_person_id=None):
+        """Return ``(android_ids, ios_ids)`` for the given surnames and/or samaj."""
+        queryset = NotificationAudience.objects.filter(is_active=True)
+        if surname_ids is not None:
+            queryset = queryset.filter(surname_id__in=surname_ids)
+        if samaj_id:
+            queryset = queryset.filter(samaj_id=samaj_id)
+        if listed_only:
+            queryset = queryset.filter(is_listed=True)
+        if exclude_person_id:
+            queryset = queryset.exclude(person_id=exclude_person_id)
+        return cls._split(queryset.values_list("platform", "player_id"))
+
+    @classmethod
+    def resolve_by_samaj(cls, samaj_ids, listed_only=False):
+        """
+        One query for many samaj: returns ``{samaj_id: [(person_id, platform,
+        player_id), ...]}`` so callers can exclude a person per message.
+        """
+        queryset = NotificationAudience.objects.filter(is_active=True, samaj_id__in=set(samaj_ids))
+        if listed_only:
+            queryset = queryset.filter(is_listed=True)
+        result = defaultdict(list)
+        for samaj_id, person_id, platform, player_id in queryset.values_list(
+            "samaj_id", "person_id", "platform", "player_id"
+        ):
+            result[samaj_id].append((person_id, platform, player_id))
+        return result
+
+    @classmethod
+    def notification_surname_ids(cls, notifications):
+        """
+        Map notification id -> surname ids from ``filter["surname"]``.
+
+        Entries are ``{"id", "name"}`` dicts; older notifications stored bare
+        surname names, which are looked up inside the creator's samaj only.
+        """
+        surname_ids = {}
+        legacy = {}
+        for notification in notifications:
+            entries = (notification.filter or {}).get("surname") or []
+            ids = set()
+            names = set()
+            for entry in entries:
+                if isinstance(entry, dict) and entry.get("id"):
+                    ids.add(int(entry["id"]))
+                elif isinstance(entry, str):
+                    names.add(entry)
+            surname_ids[notification.id] = ids
+            if names:
+                legacy[notification.id] = names
+
+        if legacy:
+            creators = {
+                notification.id: int(notification.created_user)
+                for notification in notifications
+                if notification.id in legacy and str(notification.created_user or "").isdigit()
+            }
+            creator_samaj = dict(
+                Person.objects.filter(id__in=set(creators.values())).values_list("id", "samaj_id")
+            )
+            names = set().union(*legacy.values())
+            by_name = {
+                (samaj_id, name): surname_id
+                for surname_id, samaj_id, name in Surname.objects.filter(
+                    name__in=names, samaj_id__in=set(creator_samaj.values()) - {None}
+                ).values_list("id", "samaj_id", "name")
+            }
+            for notification_id, names in legacy.items():
+                samaj_id = creator_samaj.get(creators.get(notification_id))
+                if not samaj_id:
+                    logger.warning(
+                        "Notification %s targets surnames by name but its creator has no samaj; skipped",
+                        notification_id,
+                    )
+                    continue
+                surname_ids[notification_id].update(
+                    by_name[(samaj_id, name)] for name in names if (samaj_id, name) in by_name
+                )
+        return surname_ids
+
+    @classmethod
+    def resolve_notifications(cls, notifications):
+        """
+        Resolve the audience of many notifications at once. Returns
+        ``{notification_id: (android_ids, ios_ids)}``; "All" notifications
+        map to ``None`` (sent to the provider's All segment).
+        """
+        notifications = list(notifications)
+        targeted = [n for n in notifications if (n.filter or {}).get("All") is False]
+        surname_ids = cls.notification_surname_ids(targeted)
+
+        by_surname = defaultdict(list)
+        wanted = set().union(*surname_ids.values()) if surname_ids else set()
+        if wanted:
+            for surname_id, platform, player_id in NotificationAudience.objects.filter(
+                is_active=True, surname_id__in=wanted
+            ).values_list("surname_id", "platform", "player_id"):
+                by_surname[surname_id].append((platform, player_id))
+
+        audiences = {notification.id: None for notification in notifications}
+        for notification in targeted:
+            audiences[notification.id] = cls._split(
+                row for surname_id in surname_ids[notification.id] for row in by_surname[surname_id]
+            )
+        return audiences
+
+
+
+class InboxService:
+    """
+    Decides which notifications a reader sees from NotificationAudienceRule
+    rows (no per-recipient rows are stored) and keeps the per-person read /
+    dismissed bitmaps in NotificationInboxState.
+
+    Inbox lists are keyset-paginated on (expire_date, id). The present page
+    candidates of a (role, samaj, day) are cached in the shared cache for
+    NOTIFICATION_INBOX_CACHE_TTL seconds and dropped in every process whenever
+    a notification is created or deleted; the reader's own rules, dismissals
+    and read flags are applied on top.
+    """
+
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    ROLE_MEMBER = "member"
+    ROLE_ADMIN = "admin"
+    ROLE_ADMIN_PLATFORM = "admin-platform"
+    _VERSION_KEY = "notification_inbox:version"
+
+    @staticmethod
+    def _matches_reader(person):
+        Rule = NotificationAudienceRule
+        return (
+            Q(scope=Rule.SCOPE_ALL)
+            | Q(scope=Rule.SCOPE_SAMAJ, samaj_id=person.samaj_id)
+            | (
+                Q(scope=Rule.SCOPE_SURNAME, surname_id=person.surname_id)
+                & (Q(samaj__isnull=True) | Q(samaj_id=person.samaj_id))
+            )
+            | Q(scope=Rule.SCOPE_PERSON, person_id=person.id)
+        )
+
+    @classmethod
+    def visible_to(cls, person):
+        """Q for notifications included for ``person`` and not excluded."""
+        rules = NotificationAudienceRule.objects.filter(notification=OuterRef("pk")).filter(
+            cls._matches_reader(person)
+        )
+        return Exists(rules.filter(is_exclusion=False)) & ~Exists(rules.filter(is_exclusion=True))
+
+    @staticmethod
+    def reaches_samaj(samaj_id):
+        """Q for notifications with an inclusion rule that reaches ``samaj_id``."""
+        Rule = NotificationAudienceRule
+        return Exists(
+            Rule.objects.filter(notification=OuterRef("pk"), is_exclusion=False).filter(
+                Q(scope=Rule.SCOPE_ALL)
+                | Q(samaj_id=samaj_id)
+                | Q(scope=Rule.SCOPE_SURNAME, surname__samaj_id=samaj_id)
+                | Q(scope=Rule.SCOPE_PERSON, person__samaj_id=samaj_id)
+            )
+        )
+
+    @staticmethod
+    def create_rules(notification, surname_ids=None, samaj_id=None):
+        """
+        Target ``surname_ids`` (limited to ``samaj_id`` when given), or the
+        whole samaj / everyone when ``surname_ids`` is None.
+        """
+        Rule = NotificationAudienceRule
+        if surname_ids is None:
+            rules = [
+                Rule(notification=notification, scope=Rule.SCOPE_SAMAJ, samaj_id=samaj_id)
+                if samaj_id
+                else Rule(notification=notification, scope=Rule.SCOPE_ALL)
+            ]
+        else:
+            rules = [
+                Rule(notification=notification, scope=Rule.SCOPE_SURNAME, surname_id=surname_id, samaj_id=samaj_id)
+                for surname_id in set(surname_ids)
+            ]
+        Rule.objects.bulk_create(rules)
+        InboxService.invalidate()
+
+    @staticmethod
+    def get_state(person_id):
+        return NotificationInboxState.objects.filter(person_id=person_id).first()
+
+    @staticmethod
+    def _mark(person_id, field, notification_ids):
+        with transaction.atomic():
+            state, _ = NotificationInboxState.objects.select_for_update().get_or_create(
+                person_id=person_id
+            )
+            state.add(field, notification_ids)
+            state.save()
+        return state
+
+    @classmethod
+    def mark_read(cls, person_id, notification_ids):
+        return cls._mark(person_id, "read_bits", notification_ids)
+
+    @classmethod
+    def dismiss(cls, person_id, notification_id):
+        return cls._mark(person_id, "dismissed_bits", [notification_id])
+
+    @classmethod
+    def admin_visible(cls, person, entire_platform=False):
+        """
+        Q for the admin inbox: notifications for everyone, for the admin's
+        samaj (any samaj with ``entire_platform``) or for the admin's surname.
+        """
+        Rule = NotificationAudienceRule
+        samaj_match = Q(scope=Rule.SCOPE_SAMAJ)
+        if not entire_platform:
+            samaj_match &= Q(samaj_id=person.samaj_id)
+        return Exists(
+            Rule.objects.filter(notification=OuterRef("pk"), is_exclusion=False).filter(
+                Q(scope=Rule.SCOPE_ALL)
+                | samaj_match
+                | Q(scope=Rule.SCOPE_SURNAME, surname_id=person.surname_id)
+            )
+        )
+
+    @classmethod
+    def _rule_matches(cls, rule, person, role):
+        """Python twin of _matches_reader / admin_visible for cached rules."""
+        scope, samaj_id, surname_id, person_id = rule
+        Rule = NotificationAudienceRule
+        if scope == Rule.SCOPE_ALL:
+            return True
+        if scope == Rule.SCOPE_SAMAJ:
+            return role == cls.ROLE_ADMIN_PLATFORM or samaj_id == person.samaj_id
+        if scope == Rule.SCOPE_SURNAME:
+            return surname_id == person.surname_id and (
+                role != cls.ROLE_MEMBER or samaj_id is None or samaj_id == person.samaj_id
+            )
+        return role == cls.ROLE_MEMBER and person_id == person.id
+
+    @classmethod
+    def _is_visible(cls, entry, person, role):
+        if not any(cls._rule_matches(rule, person, role) for rule in entry["include"]):
+            return False
+        if role != cls.ROLE_MEMBER:
+            return True
+        return not any(cls._rule_matches(rule, person, role) for rule in entry["exclude"])
+
+    # -- keyset pagination -------------------------------------------------
+
+    @classmethod
+    def page_size(cls, value):
+        try:
+            return max(1, min(int(value), cls.MAX_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return cls.PAGE_SIZE
+
+    @staticmethod
+    def encode_cursor(expire_date, notification_id):
+        raw = f"{expire_date.isoformat()}|{notification_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Return ``(expire_date, id)``; raises ValueError for a bad cursor."""
+        try:
+            expire_date, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(expire_date), int(notification_id)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+
+    @classmethod
+    def paginate(cls, queryset, cursor=None, page_size=PAGE_SIZE, descending=False):
+        """
+        One page of ``queryset`` ordered by (expire_date, id), with images
+        prefetched. Returns ``(notifications, next_cursor)``.
+        """
+        if descending:
+            queryset = queryset.order_by("-expire_date", "-id")
+        else:
+            queryset = queryset.order_by("expire_date", "id")
+        if cursor:
+            expire_date, notification_id = cls.decode_cursor(cursor)
+            if descending:
+                queryset = queryset.filter(
+                    Q(expire_date__lt=expire_date) | Q(expire_date=expire_date, id__lt=notification_id)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(expire_date__gt=expire_date) | Q(expire_date=expire_date, id__gt=notification_id)
+                )
+        notifications = list(queryset.prefetch_related("notificationimage_set")[: page_size + 1])
+        next_cursor = None
+        if len(notifications) > page_size:
+            notifications = notifications[:page_size]
+            last = notifications[-1]
+            next_cursor = cls.encode_cursor(last.expire_date, last.id)
+        return notifications, next_cursor
+
+    # -- present page cache --------------------------------------------------
+
+    @classmethod
+    def _cache_version(cls):
+        return cache.get_or_set(cls._VERSION_KEY, 1, None)
+
+    @classmethod
+    def invalidate(cls):
+        """Drop every cached present page (called on notification create / delete)."""
+        # add + incr keeps concurrent invalidations from different processes apart
+        try:
+            cache.add(cls._VERSION_KEY, 1, None)
+            cache.incr(cls._VERSION_KEY)
+        except Exception:
+            # Cache unavailable — cached pages expire with their TTL
+            logger.warning("Could not invalidate the notification inbox cache", exc_info=True)
+
+    @classmethod
+    def _present_candidates(cls, role, person, day_start, day_end, serialize):
+        try:
+            key = f"notification_inbox:{cls._cache_version()}:{role}:{person.samaj_id}:{day_start.date()}"
+            entries = cache.get(key)
+        except Exception:
+            # Cache unavailable — build the candidates from the database
+            logger.warning("Notification inbox cache unavailable", exc_info=True)
+            key = entries = None
+        if entries is not None:
+            return entries
+
+        queryset = Notification.objects.filter(start_date__lte=day_end, expire_date__gte=day_start)
+        if role == cls.ROLE_MEMBER or (role == cls.ROLE_ADMIN and person.samaj_id):
+            queryset = queryset.filter(cls.reaches_samaj(person.samaj_id))
+        notifications = list(
+            queryset.order_by("expire_date", "id").prefetch_related(
+                "notificationimage_set", "audience_rules"
+            )
+        )
+        data = serialize(notifications)
+        entries = []
+        for notification, item in zip(notifications, data):
+            rules = {False: [], True: []}
+            for rule in notification.audience_rules.all():
+                rules[rule.is_exclusion].append(
+                    (rule.scope, rule.samaj_id, rule.surname_id, rule.person_id)
+                )
+            entries.append(
+                {
+                    "key": (notification.expire_date, notification.id),
+                    "data": item,
+                    "include": rules[False],
+                    "exclude": rules[True],
+                }
+            )
+        if key:
+            try:
+                cache.set(key, entries, getattr(settings, "NOTIFICATION_INBOX_CACHE_TTL", 300))
+            except Exception:
+                logger.warning("Could not cache notification inbox %s", key, exc_info=True)
+        return entries
+
+    @classmethod
+    def present_page(cls, role, person, day_start, day_end, serialize, cursor=None, page_size=PAGE_SIZE, dismissed_ids=(), read_ids=()):
+        """
+        Present notifications for ``person`` from the cached candidates.
+        ``serialize`` turns a list of notifications into response dicts.
+        Returns ``(items, next_cursor)``.
+        """
+        entries = cls._present_candidates(role, person, day_start, day_end, serialize)
+        after = cls.decode_cursor(cursor) if cursor else None
+        dismissed_ids = set(dismissed_ids)
+        items = []
+        next_cursor = None
+        for entry in entries:
+            if after and entry["key"] <= after:
+                continue
+            if entry["key"][1] in dismissed_ids or not cls._is_visible(entry, person, role):
+                continue
+            if len(items) == page_size:
+                last_expire, last_id = last_key
+                next_cursor = cls.encode_cursor(last_expire, last_id)
+                break
+            items.append(dict(entry["data"], is_read=entry["key"][1] in read_ids))
+            last_key = entry["key"]
+        return items, next_cursor
+
+
+class BirthdayDigestService:
+    """
+    Daily birthday pushes. Today's birthday persons are grouped by samaj,
+    each samaj's devices are resolved once and the samaj gets one digest
+    push naming its birthday persons (who are left out of the recipients).
+    Progress is recorded per samaj on a BirthdayNotificationRun.
+    """
+
+    NAMES_IN_DIGEST = 3
+    # Persons this old without a mobile number are not announced
+    NO_MOBILE_MAX_AGE = 30
+    # A run left "running" this long is treated as crashed and may resume
+    STALE_AFTER = timedelta(hours=1)
+
+    @staticmethod
+    def full_name(person):
+        surname = person.surname.name if person.surname else ""
+        return " ".join(part for part in (person.first_name, person.middle_name, surname) if part)
+
+    @classmethod
+    def is_eligible(cls, person, today):
+        """Anyone with a mobile; without one, only persons under 30 (family will see it)."""
+        if (person.mobile_number1 or "").strip() or (person.mobile_number2 or "").strip():
+            return True
+        if not person.birth_date:
+            return True  # can't compute age, assume eligible
+        age = today.year - person.birth_date.year - (
+            (today.month, today.day) < (person.birth_date.month, person.birth_date.day)
+        )
+        return age < cls.NO_MOBILE_MAX_AGE
+
+    @classmethod
+    def digest_text(cls, persons):
+        names = [cls.full_name(person) for person in persons[: cls.NAMES_IN_DIGEST]]
+        others = len(persons) - len(names)
+        if len(persons) == 1:
+            return "🎂 Today's Birthday!", f"Wish {names[0]} a very Happy Birthday! 🎉"
+        if others:
+            listed = f"{', '.join(names)} and {others} {'other' if others == 1 else 'others'}"
+        else:
+            listed = f"{', '.join(names[:-1])} and {names[-1]}"
+        return "🎂 Today's Birthdays!", f"Wish {listed} a very Happy Birthday! 🎉"
+
+    @classmethod
+    def birthday_persons(cls, day):
+        """Eligible birthday persons of ``day`` grouped by samaj id."""
+        persons = (
+            Person.objects.filter(
+                is_deleted=False,
+                is_demo=False,
+                flag_show=True,
+                samaj__isnull=False,
+            )
+            .filter(birthday_window_q(day, 1))
+            .select_related("surname")
+            .only(
+                "id", "first_name", "middle_name", "birth_date",
+                "mobile_number1", "mobile_number2", "surname", "samaj",
+            )
+            .order_by("samaj_id", "first_name", "id")
+        )
+        by_samaj = defaultdict(list)
+        for person in persons:
+            if cls.is_eligible(person, day):
+                by_samaj[person.samaj_id].append(person)
+        return by_samaj
+
+    @staticmethod
+    def start(day=None):
+        """Return ``(run, created)`` for ``day`` (today by default)."""
+        return BirthdayNotificationRun.objects.get_or_create(run_date=day or date.today())
+
+    @classmethod
+    def can_run(cls, run):
+        Run = BirthdayNotificationRun
+        if run.state in (Run.STATE_PENDING, Run.STATE_FAILED):
+            return True
+        return run.state == Run.STATE_RUNNING and run.updated_at < datetime.now() - cls.STALE_AFTER
+
+    @classmethod
+    def _claim(cls, run_id):
+        """Move the run to "running" unless another worker holds it."""
+        Run = BirthdayNotificationRun
+        claimable = Q(state__in=[Run.STATE_PENDING, Run.STATE_FAILED]) | Q(
+            state=Run.STATE_RUNNING, updated_at__lt=datetime.now() - cls.STALE_AFTER
+        )
+        return Run.objects.filter(claimable, pk=run_id).update(
+            state=Run.STATE_RUNNING, error="", updated_at=datetime.now()
+        )
+
+    @classmethod
+    def run(cls, run_id):
+        """Send (or resume) the birthday digests of a run."""
+        Run = BirthdayNotificationRun
+        if not cls._claim(run_id):
+            return Run.objects.filter(pk=run_id).first()
+        run = Run.objects.get(pk=run_id)
+
+        try:
+            by_samaj = cls.birthday_persons(run.run_date)
+            audiences = AudienceService.resolve_by_samaj(by_samaj, listed_only=True)
+            run.birthday_count = sum(len(persons) for persons in by_samaj.values())
+            run.samaj_count = len(by_samaj)
+            run.save(update_fields=["birthday_count", "samaj_count", "updated_at"])
+
+            sent = set(run.sent_samaj)
+            for samaj_id, persons in sorted(by_samaj.items()):
+                if samaj_id in sent:
+                    continue
+                birthday_ids = {person.id for person in persons}
+                android_ids, ios_ids = AudienceService._split(
+                    (platform, player_id)
+                    for person_id, platform, player_id in audiences.get(samaj_id, [])
+                    if person_id not in birthday_ids
+                )
+                entry = {"birthdays": len(persons), "android": len(android_ids), "ios": len(ios_ids)}
+                if android_ids or ios_ids:
+                    title, body = cls.digest_text(persons)
+                    metrics = deliver(title, body, None, "false", android_ids, ios_ids)
+                    entry.update(sent=metrics["sent"], failed=metrics["failed"])
+                    run.pushes_sent += 1
+                run.stats[str(samaj_id)] = entry
+                run.sent_samaj.append(samaj_id)
+                run.save(update_fields=["stats", "sent_samaj", "pushes_sent", "updated_at"])
+        except Exception as e:
+            logger.exception("Birthday run %s failed", run.id)
+            run.state = Run.STATE_FAILED
+            run.error = str(e)
+            run.save(update_fields=["state", "error", "updated_at"])
+            raise
+
+        run.state = Run.STATE_COMPLETED
+        run.finished_at = timezone.now()
+        run.save(update_fields=["state", "finished_at", "updated_at"])
+        logger.info(
+            "Birthday run %s: %s birthdays in %s samaj, %s pushes",
+            run.run_date, run.birthday_count, run.samaj_count, run.pushes_sent,
+        )
+        return run
+
+
+class NotificationDispatcher:
+    """
+    Pushes every notification once, at its start time (minute granularity
+    with the beat schedule in settings).
+
+    Due rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` and
+    marked ``dispatched_at`` in the same transaction, so parallel
+    dispatchers never pick the same notification and a notification is
+    never pushed twice.
+    """
+
+    BATCH_SIZE = 50
+    # Due notifications older than this (e.g. after an outage) are marked
+    # dispatched without a push
+    MAX_DELAY = timedelta(days=1)
+
+    @classmethod
+    def claim(cls, now, limit=BATCH_SIZE):
+        with transaction.atomic():
+            notifications = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True, start_date__lte=now)
+                .order_by("start_date", "id")[:limit]
+            )
+            if notifications:
+                Notification.objects.filter(
+                    id__in=[notification.id for notification in notifications]
+                ).update(dispatched_at=now)
+        return notifications
+
+    @classmethod
+    def dispatch_due(cls, send=deliver, now=None):
+        """
+        Claim and push every due notification. ``send`` takes the
+        ``deliver`` arguments (title, sub_title, image, is_all_segment,
+        android ids, ios ids). Returns counts.
+        """
+        now = now or datetime.now()
+        counts = {"claimed": 0, "pushed": 0, "stale": 0}
+        while True:
+            notifications = cls.claim(now)
+            if not notifications:
+                break
+            counts["claimed"] += len(notifications)
+            pushable = [
+                notification
+                for notification in notifications
+                if notification.expire_date >= now and notification.start_date >= now - cls.MAX_DELAY
+            ]
+            counts["stale"] += len(notifications) - len(pushable)
+
+            # One query each for the images and the audiences of the batch
+            images = push_image_names(pushable)
+            audiences = AudienceService.resolve_notifications(pushable)
+            for notification in pushable:
+                audience = audiences[notification.id]
+                if audience is not None:
+                    is_all_segment = "false"
+                    player_ids_android, player_ids_ios = audience
+                else:
+                    is_all_segment = "true"
+                    player_ids_android, player_ids_ios = [], []
+                try:
+                    send(
+                        notification.title,
+                        notification.sub_title,
+                        images.get(notification.id),
+                        is_all_segment,
+                        player_ids_android,
+                        player_ids_ios,
+                    )
+                except Exception:
+                    # Already marked dispatched: log and carry on with the batch
+                    logger.exception("Dispatching notification %s failed", notification.id)
+                    continue
+                counts["pushed"] += 1
+        if counts["claimed"]:
+            logger.info("Notification dispatch at %s: %s", now, counts)
+        return counts
+
+
+class EventReminderService:
+    """
+    Reminder pushes of event notifications, precomputed into EventReminder
+    rows whenever an event is saved:
+
+        custom  at ``event_reminder_date``, when the creator set one
+        daily   at REMINDER_HOUR on each of the 7 days before ``expire_date``
+        weekly  at REMINDER_HOUR on Mondays 8 to 30 days before ``expire_date``
+
+    Only instants after the event has started and before it ends are kept.
+    """
+
+    REMINDER_HOUR = settings.EVENT_REMINDER_HOUR
+    DAILY_DAYS = 7
+    WEEKLY_DAYS = 30
+    BATCH_SIZE = 100
+
+    @classmethod
+    def slots(cls, notification, now=None):
+        """``[(remind_at, kind), ...]`` still ahead of ``now`` for an event notification."""
+        now = now or datetime.now()
+        if not notification.is_event or not notification.expire_date:
+            return []
+        starts = notification.start_date or now
+        ends = notification.expire_date
+        at_hour = lambda day: datetime.combine(day, datetime.min.time()).replace(hour=cls.REMINDER_HOUR)
+
+        slots = {}
+        event_day = ends.date()
+        for days_before in range(cls.WEEKLY_DAYS, 0, -1):
+            day = event_day - timedelta(days=days_before)
+            if days_before <= cls.DAILY_DAYS:
+                slots[at_hour(day)] = EventReminder.KIND_DAILY
+            elif day.weekday() == 0:
+                slots[at_hour(day)] = EventReminder.KIND_WEEKLY
+        if notification.event_reminder_date:
+            slots[notification.event_reminder_date] = EventReminder.KIND_CUSTOM
+        return sorted(
+            (remind_at, kind)
+            for remind_at, kind in slots.items()
+            if max(starts, now) <= remind_at < ends
+        )
+
+    @classmethod
+    def schedule(cls, notification, now=None):
+        """Replace the unsent reminders of ``notification``; returns how many are scheduled."""
+        slots = cls.slots(notification, now)
+        with transaction.atomic():
+            EventReminder.objects.filter(notification=notification, sent_at__isnull=True).delete()
+            EventReminder.objects.bulk_create(
+                [
+                    EventReminder(notification=notification, remind_at=remind_at, kind=kind)
+                    for remind_at, kind in slots
+                ],
+                ignore_conflicts=True,  # slots that were already sent
+            )
+        return len(slots)
+
+    @classmethod
+    def claim(cls, now, limit=BATCH_SIZE):
+        with transaction.atomic():
+            reminders = list(
+                EventReminder.objects.select_for_update(skip_locked=True)
+                .filter(sent_at__isnull=True, remind_at__lte=now)
+                .order_by("remind_at", "id")[:limit]
+            )
+            if reminders:
+                EventReminder.objects.filter(
+                    id__in=[reminder.id for reminder in reminders]
+                ).update(sent_at=now)
+        return reminders
+
+    @classmethod
+    def fire_due(cls, send=deliver, now=None):
+        """
+        Claim every due reminder and push each event once per batch, with
+        the ``deliver`` arguments (see NotificationDispatcher.dispatch_due).
+        """
+        now = now or datetime.now()
+        counts = {"reminders": 0, "pushed": 0}
+        while True:
+            reminders = cls.claim(now)
+            if not reminders:
+                break
+            counts["reminders"] += len(reminders)
+            # Several missed slots of one event collapse into one push
+            notifications = list(
+                Notification.objects.filter(
+                    id__in={reminder.notification_id for reminder in reminders},
+                    expire_date__gt=now,
+                ).order_by("expire_date")
+            )
+            images = push_image_names(notifications)
+            audiences = AudienceService.resolve_notifications(notifications)
+            for notification in notifications:
+                audience = audiences[notification.id]
+                if audience is not None:
+                    is_all_segment = "false"
+                    player_ids_android, player_ids_ios = audience
+                else:
+                    is_all_segment = "true"
+                    player_ids_android, player_ids_ios = [], []
+                try:
+                    send(
+                        notification.title,
+                        notification.sub_title,
+                        images.get(notification.id),
+                        is_all_segment,
+                        player_ids_android,
+                        player_ids_ios,
+                    )
+                except Exception:
+                    logger.exception("Event reminder of notification %s failed", notification.id)
+                    continue
+                counts["pushed"] += 1
+        if counts["reminders"]:
+            logger.info("Event reminders at %s: %s", now, counts)
+        return counts
@@ -1,12 +1,40 @@
 from django.dispatch import receiver
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 
-from notifications.models import NotificationImage
+from notifications.models import Notification, NotificationImage, PersonPlayerId
+from notifications.services import AudienceService, EventReminderService, InboxService
+from parivar.models import Person
 
 
 @receiver(pre_delete, sender=NotificationImage)
 def delete_file_from_s3(sender, instance, **kwargs):
     
-    # This will delete the file from S3 before the model instance is deleted
-    if instance.image_url:
-        instance.image_url.delete(save=False)
+    # This will delete the file and its variants from S3 before the model instance is deleted
+    for field in ("image_url", *NotificationImage.VARIANT_FIELDS):
+        if getattr(instance, field):
+            getattr(instance, field).delete(save=False)
+
+
+@receiver(post_save, sender=PersonPlayerId)
+def player_id_save(sender, instance, **kwargs):
+    AudienceService.refresh_players([instance.pk])
+
+
+@receiver(post_save, sender=Person)
+def person_audience_save(sender, instance, created, **kwargs):
+    # A new person has no registered devices yet
+    if not created:
+        AudienceService.sync_person(instance)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_inbox_changed(sender, instance, **kwargs):
+    InboxService.invalidate()
+
+
+@receiver(post_save, sender=Notification)
+def notification_reminders_changed(sender, instance, created, **kwargs):
+    # Reminder instants follow the event dates; non-events have none
+    if instance.is_event or not created:
+        EventReminderService.schedule(instance)
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
 from storages.backends.s3boto3 import S3Boto3Storage
 
 
@@ -5,3 +7,11 @@ class NotificationImageS3Storage(S3Boto3Storage):
     location = "Billaparivar"
     bucket_name = "classdekho"
     custom_domain = "classdekho.s3.ap-south-1.amazonaws.com"
+
+
+def notification_image_storage():
+    """
+    Storage of NotificationImage files, chosen by the NOTIFICATION_IMAGE_STORAGE
+    setting (S3 in production, a FileSystemStorage for local runs and tests).
+    """
+    return import_string(settings.NOTIFICATION_IMAGE_STORAGE)()
@@ -1,14 +1,8 @@
-from datetime import datetime
 from celery import shared_task
-import requests
-import json
-import os
 
-
-def append_to_log(filename, message):
-    """Append a message to an existing log file, creating the file if it doesn't exist."""
-    with open(filename, "a") as file:
-        file.write(message + "\n")
+from notifications.images import process_pending
+from notifications.onesignal import deliver
+from notifications.services import BirthdayDigestService, EventReminderService, NotificationDispatcher
 
 
 @shared_task
@@ -21,106 +15,53 @@ def notification_created(
     player_ids_android=None,
     player_ids_ios=None,
 ):
-    now = datetime.now()
-    # filename = "celery.log"
-    filename = "/tmp/celery.log"
-    message = f"\nstart celery notification send time :- {now}"
-    append_to_log(filename, message)
-    # Android notification
-    image_full_url = ""
-
-    if image_url:
-        image_full_url = (
-            f"https://classdekho.s3.ap-south-1.amazonaws.com/Billaparivar/{image_url}"
-        )
-
-    url = "https://onesignal.com/api/v1/notifications"
-
-    if is_all_segment != "false":
-
-        payload = json.dumps(
-            {
-                "app_id": os.getenv("ANDROID_ONE_SIGNAL_APP_ID"),
-                "included_segments": ["All"],
-                "headings": {"en": title},
-                "contents": {"en": sub_title if sub_title else ""},
-                "big_picture": image_full_url,
-            }
-        )
-
-    else:
-
-        payload = json.dumps(
-            {
-                "app_id": os.getenv("ANDROID_ONE_SIGNAL_APP_ID"),
-                "include_player_ids": player_ids_android,
-                "headings": {"en": title},
-                "contents": {"en": sub_title if sub_title else ""},
-                "big_picture": image_full_url,
-            }
-        )
+    """Push one notification to Android and iOS; returns the delivery metrics."""
+    return deliver(
+        title,
+        sub_title,
+        image_url,
+        is_all_segment,
+        player_ids_android,
+        player_ids_ios,
+    )
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def send_birthday_notifications(run_id):
+    # A redelivered message resumes the run; samaj already notified are skipped.
+    run = BirthdayDigestService.run(run_id)
+    return run.state if run else None
+
+
+@shared_task(acks_late=True)
+def transcode_notification_images(notification_id, push=None):
+    """
+    Write the image variants of a notification. ``push`` holds the
+    notification_created arguments of a notification that starts today; it
+    is sent once the optimized image exists, so big_picture points at it.
+    """
+    image_name = process_pending(notification_id)
+    if push:
+        return notification_created(image_url=image_name, **push)
+    return image_name
+
+
+def _queue_push(title, sub_title, image_url, is_all_segment, player_ids_android, player_ids_ios):
+    task_args = ("Notification", title, sub_title, image_url, is_all_segment, player_ids_android, player_ids_ios)
+    try:
+        notification_created.delay(*task_args)
+    except Exception:
+        # Redis unavailable — run synchronously (local dev / no broker)
+        notification_created(*task_args)
 
-    headers = {
-        "Authorization": os.getenv("ANDROID_ONE_SIGNAL_AUTHORIZATION_ID"),
-        "Content-Type": "application/json",
-    }
 
-    # response = requests.post(url, headers=headers, data=payload)    
-    # message = f"Response :- {response.text}"
-    # if response.status_code != 200:
-    #     message = f"Response Error :- {response.text}"
-    # append_to_log(filename, message)
-    # ── OneSignal calls commented out for local testing ───────────────────
-    # response = requests.post(url, headers=headers, data=payload)
-    # message = f"Response :- {response.text}"
-    # if response.status_code != 200:
-    #     message = f"Response Error :- {response.text}"
-    # append_to_log(filename, message)
-    append_to_log(filename, f"[TEST MODE] Android payload ready — title: {title}, targets: {player_ids_android or 'All'}")
-
-    # iOS notification
-    if is_all_segment != "false":
-
-        payload = json.dumps(
-            {
-                "app_id": os.getenv("IOS_ONE_SIGNAL_APP_ID"),
-                "headings": {"en": title if title else "Bila Parivar"},
-                "contents": {"en": sub_title if sub_title else ""},
-                "included_segments": ["All"],
-                "big_picture": image_full_url,
-                "ios_badgeCount": 1,
-                "ios_badgeType": "Increase",
-            }
-        )
-
-    else:
-
-        payload = json.dumps(
-            {
-                "app_id": os.getenv("IOS_ONE_SIGNAL_APP_ID"),
-                "headings": {"en": title if title else "Bila Parivar"},
-                "contents": {"en": sub_title if sub_title else ""},
-                "include_player_ids": player_ids_ios,
-                "big_picture": image_full_url,
-                "ios_badgeCount": 1,
-                "ios_badgeType": "Increase",
-            }
-        )
+@shared_task
+def dispatch_due_notifications():
+    """Run every minute by celery beat (CELERY_BEAT_SCHEDULE); one push task per notification."""
+    return NotificationDispatcher.dispatch_due(send=_queue_push)
 
-    headers = {
-        "Authorization": os.getenv("IOS_ONE_SIGNAL_AUTHORIZATION_ID"),
-        "Content-Type": "application/json",
-        "Cookie": "__cf_bm=5LdmNasmbo8fgB1DrbNd5lm6Gq_pCZ3LYwu4zAvoQAs-1716875406-1.0.1.1-XsyawWvQvRMpi9DNiWiGyLphXwziSoiXNzYcNwq6SFMpsKnMD1_wBi7VOSn38F4J6lOdbcceH24KgRKIshs1dQ",
-    }
-    # response = requests.post(url, headers=headers, data=payload)
-    # message = f"Response :- {response.text}"
-    # append_to_log(filename, message)
-    # ── OneSignal calls commented out for local testing ───────────────────
-    # response = requests.post(url, headers=headers, data=payload)
-    # message = f"Response :- {response.text}"
-    # append_to_log(filename, message)
-    append_to_log(filename, f"[TEST MODE] iOS payload ready — title: {title}, targets: {player_ids_ios or 'All'}")
 
-    now = datetime.now()
-    message = f"\n end celery notification send time :- {now}"
-    append_to_log(filename, message)
+@shared_task
+def send_event_reminders():
+    """Run every minute by celery beat; fires only the reminders that are due."""
+    return EventReminderService.fire_due(send=_queue_push)
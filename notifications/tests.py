@@ -1,3 +1,235 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Q
+from django.test import SimpleTestCase, override_settings
+from PIL import Image, UnidentifiedImageError
+
+from notifications.helpers import birthday_offsets, birthday_window_q
+from notifications.images import transcode, write_variants
+from notifications.models import EventReminder, Notification
+from notifications.onesignal import deliver
+from notifications.services import EventReminderService
+
+
+class StubOneSignal(BaseHTTPRequestHandler):
+    """Answers like the provider; ``fail_first`` requests get a 429 first."""
+
+    requests = []
+    fail_first = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            self.requests.append(payload)
+            throttle = StubOneSignal.fail_first > 0
+            if throttle:
+                StubOneSignal.fail_first -= 1
+        if throttle:
+            self.respond(429, {"errors": ["rate limited"]})
+        else:
+            self.respond(200, {"id": "stub", "errors": {"invalid_player_ids": payload.get("include_player_ids", [])[:1]}})
+
+    def respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class OneSignalDeliveryTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOneSignal)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/api/v1/notifications"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubOneSignal.requests = []
+        StubOneSignal.fail_first = 0
+
+    def send(self, **kwargs):
+        with override_settings(
+            ONESIGNAL_SEND_ENABLED=True,
+            ONESIGNAL_API_URL=self.url,
+            ONESIGNAL_CHUNK_SIZE=3,
+            ONESIGNAL_MAX_RETRIES=2,
+        ):
+            return deliver("Title", "Body", None, sleep=lambda seconds: None, **kwargs)
+
+    def test_player_ids_are_chunked_per_platform(self):
+        metrics = self.send(
+            is_all_segment="false",
+            player_ids_android=[f"a{i}" for i in range(7)],
+            player_ids_ios=["i1", "i2", "i1"],
+        )
+        self.assertEqual(metrics["requests"], 4)
+        self.assertEqual(metrics["sent"], 4)
+        self.assertEqual(metrics["invalid_player_ids"], 4)
+        sizes = sorted(len(payload["include_player_ids"]) for payload in StubOneSignal.requests)
+        self.assertEqual(sizes, [1, 2, 3, 3])
+
+    def test_throttled_requests_are_retried(self):
+        StubOneSignal.fail_first = 2
+        metrics = self.send(is_all_segment="true")
+        self.assertEqual(metrics["sent"], 2)
+        self.assertEqual(metrics["retries"], 2)
+        self.assertEqual(len(StubOneSignal.requests), 4)
+        self.assertTrue(all(payload["included_segments"] == ["All"] for payload in StubOneSignal.requests))
+
+    def test_gives_up_after_max_retries(self):
+        StubOneSignal.fail_first = 10
+        metrics = self.send(is_all_segment="false", player_ids_android=["a1"], player_ids_ios=[])
+        self.assertEqual(metrics["failed"], 1)
+        self.assertEqual(metrics["chunks"][0]["attempts"], 3)
+        self.assertEqual(metrics["chunks"][0]["status"], 429)
+
+
+@override_settings(NOTIFICATION_IMAGE_MAX_SIZE=400, NOTIFICATION_IMAGE_PREVIEW_SIZE=100)
+class NotificationImageTranscodeTests(SimpleTestCase):
+    def upload(self, mode, size, fmt):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, format=fmt)
+        buffer.seek(0)
+        return buffer
+
+    def test_variants_are_size_capped(self):
+        variants, width, height = transcode(self.upload("RGB", (1600, 800), "JPEG"))
+        self.assertEqual((width, height), (400, 200))
+        formats = {}
+        for field, (suffix, data) in variants.items():
+            with Image.open(io.BytesIO(data)) as image:
+                formats[field] = (image.format, image.size)
+        self.assertEqual(formats["optimized_url"], ("JPEG", (400, 200)))
+        self.assertEqual(formats["webp_url"], ("WEBP", (400, 200)))
+        self.assertEqual(formats["preview_url"], ("WEBP", (100, 50)))
+
+    def test_transparent_png_is_flattened_for_jpeg(self):
+        variants, width, height = transcode(self.upload("RGBA", (300, 300), "PNG"))
+        self.assertEqual((width, height), (300, 300))
+        with Image.open(io.BytesIO(variants["optimized_url"][1])) as image:
+            self.assertEqual(image.mode, "RGB")
+        with Image.open(io.BytesIO(variants["webp_url"][1])) as image:
+            self.assertEqual(image.mode, "RGBA")
+
+    def test_not_an_image(self):
+        with self.assertRaises(UnidentifiedImageError):
+            transcode(io.BytesIO(b"%PDF-1.4 not an image"))
+
+    def test_variants_are_written_next_to_the_original(self):
+        variants, _, _ = transcode(self.upload("RGB", (50, 50), "PNG"))
+        with tempfile.TemporaryDirectory() as location:
+            storage = FileSystemStorage(location=location)
+            names = write_variants(storage, "notification_images/12photo.png", variants)
+            self.assertEqual(names, {
+                "optimized_url": "notification_images/12photo.jpg",
+                "webp_url": "notification_images/12photo.webp",
+                "preview_url": "notification_images/12photo_preview.webp",
+            })
+            self.assertTrue(all(storage.exists(name) for name in names.values()))
+
+
+class BirthdayWindowTests(SimpleTestCase):
+    def test_window_wraps_past_new_year(self):
+        start = date(2025, 12, 29)
+        offsets = birthday_offsets(start, 7)
+        self.assertEqual(offsets, {1229: 0, 1230: 1, 1231: 2, 101: 3, 102: 4, 103: 5, 104: 6})
+        self.assertEqual(birthday_window_q(start, 7), Q(birth_md__gte=1229) | Q(birth_md__lte=104))
+
+    def test_feb_29_falls_on_feb_28_in_non_leap_year(self):
+        start = date(2025, 2, 22)
+        offsets = birthday_offsets(start, 7)
+        self.assertEqual(offsets[228], 6)
+        self.assertEqual(offsets[229], 6)
+        self.assertEqual(birthday_window_q(start, 7), Q(birth_md__range=(222, 229)))
+
+    def test_feb_29_is_its_own_day_in_leap_year(self):
+        offsets = birthday_offsets(date(2024, 2, 23), 7)
+        self.assertEqual((offsets[228], offsets[229]), (5, 6))
+        self.assertEqual(birthday_window_q(date(2024, 2, 23), 7), Q(birth_md__range=(223, 229)))
+        # A leap-year window ending on 28 February stops there
+        self.assertNotIn(229, birthday_offsets(date(2024, 2, 22), 7))
+        self.assertEqual(birthday_window_q(date(2024, 2, 22), 7), Q(birth_md__range=(222, 228)))
+
+    def test_ninety_day_horizon(self):
+        start = date(2025, 11, 1)
+        offsets = birthday_offsets(start, 90)
+        self.assertEqual(len(offsets), 90)
+        self.assertEqual((offsets[1101], offsets[129]), (0, 89))
+        self.assertEqual(birthday_window_q(start, 90), Q(birth_md__gte=1101) | Q(birth_md__lte=129))
+        # Across February of a non-leap year 29 February shares 28 February's offset
+        offsets = birthday_offsets(date(2025, 2, 1), 90)
+        self.assertEqual(len(offsets), 91)
+        self.assertEqual(offsets[229], offsets[228])
+
+
+
+class EventReminderSlotTests(SimpleTestCase):
+    # Event on Thursday 10 April 2025; Mondays 8-30 days before are 17, 24 and 31 March
+    EVENT_END = datetime(2025, 4, 10, 18, 0)
+
+    def setUp(self):
+        patcher = mock.patch.object(EventReminderService, "REMINDER_HOUR", 9)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, **kwargs):
+        fields = {"is_event": True, "start_date": datetime(2025, 3, 1), "expire_date": self.EVENT_END}
+        fields.update(kwargs)
+        return Notification(**fields)
+
+    def test_daily_and_weekly_slots(self):
+        slots = EventReminderService.slots(self.event(), now=datetime(2025, 3, 1))
+        weekly = [(datetime(2025, 3, day, 9), EventReminder.KIND_WEEKLY) for day in (17, 24, 31)]
+        daily = [(datetime(2025, 4, day, 9), EventReminder.KIND_DAILY) for day in range(3, 10)]
+        self.assertEqual(slots, weekly + daily)
+
+    def test_slots_are_clipped_to_start_now_and_expiry(self):
+        # Already past 5 April 09:00
+        slots = EventReminderService.slots(self.event(), now=datetime(2025, 4, 5, 10))
+        self.assertEqual([remind_at.day for remind_at, _ in slots], [6, 7, 8, 9])
+        # Starts after now
+        slots = EventReminderService.slots(
+            self.event(start_date=datetime(2025, 4, 7)), now=datetime(2025, 3, 1)
+        )
+        self.assertEqual([remind_at.day for remind_at, _ in slots], [7, 8, 9])
+        # A custom instant at or after the end is dropped
+        for reminder_at in (self.EVENT_END, datetime(2025, 4, 11, 9)):
+            slots = EventReminderService.slots(
+                self.event(event_reminder_date=reminder_at), now=datetime(2025, 4, 9, 10)
+            )
+            self.assertEqual(slots, [])
+
+    def test_custom_reminder_overrides_generated_slot(self):
+        slots = EventReminderService.slots(
+            self.event(event_reminder_date=datetime(2025, 4, 8, 9)), now=datetime(2025, 4, 7, 10)
+        )
+        self.assertEqual(
+            slots,
+            [
+                (datetime(2025, 4, 8, 9), EventReminder.KIND_CUSTOM),
+                (datetime(2025, 4, 9, 9), EventReminder.KIND_DAILY),
+            ],
+        )
+
+    def test_only_events_get_reminders(self):
+        self.assertEqual(EventReminderService.slots(self.event(is_event=False), now=datetime(2025, 3, 1)), [])
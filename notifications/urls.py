@@ -25,6 +25,11 @@ urlpatterns = [
         views.NotificationDeleteView.as_view(),
         name="remove_notification",
     ),
+    path(
+        "api/v4/read-notification",
+        views.NotificationReadView.as_view(),
+        name="read_notification",
+    ),
     # Birthday API (standalone GET endpoint)
     path(
         "api/v4/birthdays",
@@ -1,10 +1,7 @@
-import io
 import json
-import mimetypes
+import logging
 
 from django.db.models import Q
-from django.utils import timezone
-from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 
@@ -13,7 +10,7 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from datetime import datetime, timedelta
-from notifications.models import Notification, NotificationImage, PersonPlayerId
+from notifications.models import BirthdayNotificationRun, Notification, NotificationImage, PersonPlayerId
 from notifications.serializers import (
     NotificationCreateSerializer,
     NotificationNewGetSerializer,
@@ -21,11 +18,18 @@ from notifications.serializers import (
 )
 from notifications.time_conveter import convert_time_format
 from parivar.models import Person, Surname
-from notifications.tasks import notification_created
+from notifications.services import AudienceService, BirthdayDigestService, InboxService
+from notifications.tasks import (
+    dispatch_due_notifications,
+    notification_created,
+    send_birthday_notifications,
+    send_event_reminders,
+    transcode_notification_images,
+)
 from notifications.helpers import get_birthday_queryset, split_birthdays
 from parivar.utils import get_person_queryset
-from parivar.v3.views import append_to_log
-from PIL import Image
+
+logger = logging.getLogger(__name__)
 
 
 class NotificationDetailView(APIView):
@@ -286,150 +290,97 @@ class NotificationDetailView(APIView):
                         status=status.HTTP_403_FORBIDDEN,
                     )
 
-            person_surename_ids = [person.surname.id]
-            if (
-                person.flag_show == True
-                and person.is_admin == False
-                and person.is_super_admin == False
-            ):
-                present_notification = Notification.objects.filter(
-                    Q(start_date__lte=today_end),
-                    Q(expire_date__gte=today_start),
-                    to_person=person.id,
-                ).order_by("expire_date")
-
-                past_notification = Notification.objects.filter(
-                    Q(start_date__lt=today_start),
-                    Q(expire_date__lt=today_start),
-                    to_person=person.id,
-                ).order_by("-expire_date")
-
-                pending_notification = Notification.objects.filter(
-                    start_date__gte=today_end, is_event=False
+            inbox_state = InboxService.get_state(person.id)
+            dismissed_ids = inbox_state.ids("dismissed_bits") if inbox_state else []
+            read_ids = set(inbox_state.ids("read_bits")) if inbox_state else set()
+            is_admin = person.is_admin or person.is_super_admin
+            if not person.flag_show:
+                return Response(
+                    {"message": "Person is not approved yet"},
+                    status=status.HTTP_403_FORBIDDEN,
                 )
-            elif person.flag_show == True and person.is_admin == True:
+            if not is_admin:
+                role = InboxService.ROLE_MEMBER
+                # Audience rules are matched against the reader's samaj / surname
+                visible_notifications = Notification.objects.filter(
+                    InboxService.visible_to(person)
+                ).exclude(id__in=dismissed_ids)
+                pending_notification = Notification.objects.none()
+            else:
                 # Add toggle for admins to view entire platform or scope to their samaj
                 is_entire_platform = request.GET.get("is_entire_platform", "false").lower() == "true"
-                samaj_filter = Q(to_person__samaj_id=person.samaj_id) if person.samaj_id and not is_entire_platform else Q()
-                
-                present_notification = Notification.objects.filter(
-                    Q(start_date__lte=today_end),
-                    Q(expire_date__gte=today_start),
-                    (
-                        Q(filter__All=True)
-                        | Q(
-                            filter__surname__contains=[
-                                {"id": id} for id in person_surename_ids
-                            ]
-                        )
-                    ),
-                    samaj_filter,
-                ).distinct().order_by("expire_date")
-
-                past_notification = Notification.objects.filter(
-                    Q(start_date__lt=today_start),
-                    Q(expire_date__lt=today_start),
-                    (
-                        Q(filter__All=True)
-                        | Q(
-                            filter__surname__contains=[
-                                {"id": id} for id in person_surename_ids
-                            ]
-                        )
-                    ),
-                    samaj_filter,
-                ).distinct().order_by("-expire_date")
-
+                if is_entire_platform or not person.samaj_id:
+                    role = InboxService.ROLE_ADMIN_PLATFORM
+                    samaj_filter = Q()
+                else:
+                    role = InboxService.ROLE_ADMIN
+                    samaj_filter = InboxService.reaches_samaj(person.samaj_id)
+                visible_notifications = Notification.objects.filter(
+                    InboxService.admin_visible(person, role == InboxService.ROLE_ADMIN_PLATFORM)
+                )
                 pending_notification = Notification.objects.filter(
                     samaj_filter,
                     start_date__gte=today_end, is_event=False,
-                ).distinct()
-            # else:
-            #     if (
-            #         person.flag_show == True
-            #         and person.is_admin == False
-            #         and person.is_super_admin == False
-            #     ):
-            #         present_notification = Notification.objects.filter(
-            #             Q(start_date__lte=today_end),
-            #             Q(expire_date__gte=today_start),
-            #             to_person=person.id,
-            #             is_event=True,
-            #         ).order_by("expire_date")
-
-            #         past_notification = Notification.objects.filter(
-            #             Q(start_date__lt=today_start),
-            #             Q(expire_date__lt=today_start),
-            #             to_person=person.id,
-            #             is_event=True,
-            #         ).order_by("-expire_date")
-
-            #         pending_notification = Notification.objects.filter(
-            #             start_date__gte=today_end,
-            #             is_event=True,
-            #         )
-            #     elif (
-            #         person.flag_show == True
-            #         and person.is_admin == True
-            #         and person.is_super_admin == False
-            #     ):
-            #         present_notification = Notification.objects.filter(
-            #             Q(start_date__lte=today_end),
-            #             Q(expire_date__gte=today_start),
-            #             (
-            #                 Q(filter__All=True)
-            #                 | Q(
-            #                     filter__surname__contains=[
-            #                         {"id": id} for id in person_surename_ids
-            #                     ]
-            #                 )
-            #             ),
-            #             is_event=True,
-            #         ).order_by("expire_date")
-
-            #         past_notification = Notification.objects.filter(
-            #             Q(start_date__lt=today_start),
-            #             Q(expire_date__lt=today_start),
-            #             (
-            #                 Q(filter__All=True)
-            #                 | Q(
-            #                     filter__surname__contains=[
-            #                         {"id": id} for id in person_surename_ids
-            #                     ]
-            #                 )
-            #             ),
-            #             is_event=True,
-            #         ).order_by("-expire_date")
-
-            #         pending_notification = Notification.objects.filter(
-            #             start_date__gte=today_end,
-            #             is_event=True,
-            #         )
-            #     elif (
-            #         person.flag_show == True
-            #         and person.is_admin == False
-            #         and person.is_super_admin == True
-            #     ):
-            #         present_notification = Notification.objects.filter(
-            #             Q(start_date__lte=today_end),
-            #             Q(expire_date__gte=today_start),
-            #             is_event=True,
-            #         ).order_by("expire_date")
-
-            #         past_notification = Notification.objects.filter(
-            #             Q(start_date__lt=today_start),
-            #             Q(expire_date__lt=today_start),
-            #             is_event=True,
-            #         ).order_by("-expire_date")
-
-            #         pending_notification = Notification.objects.filter(
-            #             start_date__gte=today_end,
-            #             is_event=True,
-            #         )
-
-            present_data = NotificationNewGetSerializer(present_notification, many=True)
-            past_data = NotificationNewGetSerializer(past_notification, many=True)
-            pending_data = NotificationNewGetSerializer(pending_notification, many=True)
+                )
+
+            past_notification = visible_notifications.filter(
+                Q(start_date__lt=today_start),
+                Q(expire_date__lt=today_start),
+            )
+
+            # Every list is keyset-paginated on (expire_date, id); pass
+            # section=<present|past|pending>&cursor=<next_cursor> for later pages
+            page_size = InboxService.page_size(request.GET.get("page_size"))
+            section = request.GET.get("section")
+            cursor = request.GET.get("cursor") or None
+            inbox_context = {"read_ids": read_ids}
+
+            def serialize(notifications):
+                return NotificationNewGetSerializer(notifications, many=True, context=inbox_context).data
+
+            def present_page(cursor=None):
+                return InboxService.present_page(
+                    role,
+                    person,
+                    today_start,
+                    today_end,
+                    lambda notifications: NotificationNewGetSerializer(notifications, many=True).data,
+                    cursor=cursor,
+                    page_size=page_size,
+                    dismissed_ids=dismissed_ids,
+                    read_ids=read_ids,
+                )
+
+            def queryset_page(queryset, cursor=None, descending=False):
+                notifications, next_cursor = InboxService.paginate(
+                    queryset, cursor, page_size, descending=descending
+                )
+                return serialize(notifications), next_cursor
+
+            sections = {
+                "present": present_page,
+                "past": lambda cursor=None: queryset_page(past_notification, cursor, descending=True),
+                "pending": lambda cursor=None: queryset_page(pending_notification, cursor),
+            }
+            if section:
+                if section not in sections:
+                    return Response(
+                        {"message": "section must be present, past or pending"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                try:
+                    data, next_cursor = sections[section](cursor)
+                except ValueError:
+                    return Response(
+                        {"message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+                    )
+                return Response(
+                    {"data": data, "next_cursor": next_cursor}, status=status.HTTP_200_OK
+                )
+
+            present_data, present_next = present_page()
+            past_data, past_next = sections["past"]()
+            pending_data, pending_next = sections["pending"]()
 
             # ── Birthday data ─────────────────────────────────────────────
             birthday_context = {"request": request}
@@ -475,7 +426,7 @@ class NotificationDetailView(APIView):
                     "message": message,
                 }
             # ── Merge birthday card as first item in present_notification ──
-            present_list = list(present_data.data)
+            present_list = list(present_data)
             if birthday_notification:
                 present_list.insert(0, birthday_notification)
             # ─────────────────────────────────────────────────────────────
@@ -483,12 +434,13 @@ class NotificationDetailView(APIView):
             return Response(
                 {
                     "present_notification": present_list,
-                    "past_notification": past_data.data,
-                    "pending_notification": (
-                        pending_data.data
-                        if person.is_admin
-                        else []
-                    ),
+                    "past_notification": past_data,
+                    "pending_notification": pending_data if is_admin else [],
+                    "next_cursor": {
+                        "present": present_next,
+                        "past": past_next,
+                        "pending": pending_next if is_admin else None,
+                    },
                     "today_birthday": BirthdayPersonSerializer(
                         today_bdays, many=True, context=birthday_context
                     ).data,
@@ -591,22 +543,11 @@ class NotificationDetailView(APIView):
                         status=status.HTTP_404_NOT_FOUND,
                     )
 
-            surnames = list(include_player_ids)
-            android_qs = PersonPlayerId.objects.filter(
-                person__surname_id__in=surnames,
-                person__is_deleted=False,
-                platform="Android",
-            )
-            ios_qs = PersonPlayerId.objects.filter(
-                person__surname_id__in=surnames, platform="Ios"
-            )
             # Scope player IDs to sender's samaj
-            if sender_samaj:
-                android_qs = android_qs.filter(person__samaj=sender_samaj)
-                ios_qs = ios_qs.filter(person__samaj=sender_samaj)
-
-            player_ids_android = list(android_qs.values_list("player_id", flat=True))
-            player_ids_ios = list(ios_qs.values_list("player_id", flat=True))
+            player_ids_android, player_ids_ios = AudienceService.resolve(
+                surname_ids=list(include_player_ids),
+                samaj_id=sender_samaj.id if sender_samaj else None,
+            )
 
         if include_player_ids:
             if isinstance(include_player_ids, str):
@@ -619,38 +560,13 @@ class NotificationDetailView(APIView):
                     )
 
         surname = []
+        # None targets the sender's whole samaj (or everyone for is_entire_platform)
+        audience_surname_ids = None
         if is_all_segment != "true":
-            surname_top_member_list = Surname.objects.filter(
-                id__in=include_player_ids
-            ).values_list("top_member", flat=True)
-
-            surname_list = Surname.objects.filter(
-                id__in=include_player_ids
-            ).values_list("id", flat=True)
-
             surname_data = Surname.objects.filter(id__in=include_player_ids)
             for i in surname_data:
                 surname.append({"id": i.id, "name": i.name})
-
-        else:
-            surname_top_member_list = Surname.objects.values_list(
-                "top_member", flat=True
-            )
-            # Scope all-segment to sender's samaj if not super-admin
-            if sender_samaj:
-                surname_list = Surname.objects.filter(samaj=sender_samaj).values_list("id", flat=True)
-            else:
-                surname_list = Surname.objects.values_list("id", flat=True)
-
-        surname_top_member_list = [int(x) for x in surname_top_member_list]
-
-        # Build to_persons scoped to sender's samaj
-        to_persons_qs = Person.objects.filter(
-            surname__id__in=surname_list, is_deleted=False, flag_show=True
-        ).exclude(id__in=surname_top_member_list)
-        if sender_samaj:
-            to_persons_qs = to_persons_qs.filter(samaj=sender_samaj)
-        to_persons = to_persons_qs.values_list("id", flat=True)
+            audience_surname_ids = [i["id"] for i in surname]
 
         filter_field = {
             "surname": ([] if is_all_segment != "false" else surname),
@@ -663,7 +579,6 @@ class NotificationDetailView(APIView):
             "redirect_url": redirect_url,
             "start_date": start_date,
             "expire_date": expire_date,
-            "to_person": to_persons,
             "is_event": is_event,
             "event_reminder_date": event_reminder,
             "created_user": person_id,
@@ -672,71 +587,44 @@ class NotificationDetailView(APIView):
             "is_show_ad_lable": is_show_ad_lable,
         }
 
+        # Notifications that have already started are pushed now; later ones
+        # are left to the dispatcher (notifications.tasks.dispatch_due_notifications)
+        push_now = datetime.fromisoformat(start_date) <= datetime.now()
+
         serializer = NotificationCreateSerializer(data=notification_data)
         if serializer.is_valid():
-            data = serializer.save()
+            data = serializer.save(dispatched_at=datetime.now() if push_now else None)
             data_id = data.id
+            InboxService.create_rules(
+                data,
+                surname_ids=audience_surname_ids,
+                samaj_id=sender_samaj.id if sender_samaj else None,
+            )
+            # Originals are stored as uploaded; the worker writes the
+            # optimized variants (notifications.images).
+            for file in image_url:
+                NotificationImage.objects.create(notification_id_id=data_id, image_url=file)
+
+            push = None
+            if push_now:
+                push = {
+                    "sender": "Notification",
+                    "title": title,
+                    "sub_title": sub_title,
+                    "is_all_segment": is_all_segment,
+                    "player_ids_android": player_ids_android,
+                    "player_ids_ios": player_ids_ios,
+                }
+
             if image_url:
-                for file in image_url:
-                    try:
-                        mime_type, _ = mimetypes.guess_type(file.name)
-                        if mime_type and mime_type.startswith("image"):
-                            # image is Check a This is Png
-                            img = Image.open(file)
-                            if img.format != "PNG":
-                                img = img.convert("RGBA")
-                                png_image_io = io.BytesIO()
-                                img.save(png_image_io, format="PNG")
-                                png_image_io.seek(0)
-                                image_name = f"{data_id}{file.name.split('.')[0]}.png"
-                                image_file = InMemoryUploadedFile(
-                                    png_image_io,
-                                    None,
-                                    image_name,
-                                    "image/png",
-                                    png_image_io.getbuffer().nbytes,
-                                    None,
-                                )
-                            else:
-                                # Image is already PNG, use the uploaded file directly
-                                image_file = file
-                        else:
-                            # If not an image, use the file as is
-                            image_file = file
-
-                        # Save the file or Image
-                        NotificationImage.objects.create(
-                            notification_id_id=data_id, image_url=image_file
-                        )
-                    except IOError:
-                        return Response(
-                            {"message": "Invalid file."},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-            notifiy_image = (
-                NotificationImage.objects.filter(notification_id_id=data_id)
-                .values_list("image_url", flat=True)
-                .first()
-            )
-            image_url = notifiy_image
-            sender = "Notification"
-            start_date = datetime.fromisoformat(start_date)
-            start_date = timezone.make_aware(
-                start_date, timezone.get_default_timezone()
-            )
-            start_date = timezone.localtime(start_date).date()
-            today = datetime.now().date()
-            if str(start_date) == str(today):
-                notification_created.delay(
-                    sender,
-                    title,
-                    sub_title,
-                    image_url,
-                    is_all_segment,
-                    player_ids_android,
-                    player_ids_ios,
-                )
-                pass
+                # The push waits for the optimized image, so it goes out from the worker
+                try:
+                    transcode_notification_images.delay(data_id, push)
+                except Exception:
+                    # Redis unavailable — run synchronously (local dev / no broker)
+                    transcode_notification_images(data_id, push)
+            elif push:
+                notification_created.delay(image_url=None, **push)
 
             return Response(
                 {
@@ -823,14 +711,15 @@ class NotificationDeleteView(APIView):
             )
 
         try:
-            if person not in notification.to_person.all():
+            if not Notification.objects.filter(
+                InboxService.visible_to(person), id=notification.id
+            ).exists():
                 return Response(
                     {"message": "Person is not associated with this notification"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            notification.to_person.remove(person_id)
-            notification.save()
+            InboxService.dismiss(person.id, notification.id)
 
             return Response(
                 {"message": "Notification updated successfully"},
@@ -840,187 +729,58 @@ class NotificationDeleteView(APIView):
             return Response({"message": f"{e}"})
 
 
-class EventFrequency(APIView):
-    def get(self, request):
-        today = datetime.now()
-        today_start = today.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today.replace(hour=23, minute=59, second=59, microsecond=59)
-
-        one_week_end = (today + timedelta(weeks=1)).replace(
-            hour=23, minute=59, second=59, microsecond=59
-        )
-
-        one_month_end = (today + timedelta(days=30)).replace(
-            hour=23, minute=59, second=59, microsecond=59
-        )
-
-        six_months_end = (today + timedelta(days=6 * 30)).replace(
-            hour=23, minute=59, second=59, microsecond=59
-        )
-
-        def process_notifications(notifications):
-            player_ids_android = []
-            player_ids_ios = []
-
-            for notification in notifications:
-                notification_image = (
-                    NotificationImage.objects.filter(
-                        notification_id_id=notification.id, is_event=True
-                    )
-                    .values_list("image_url", flat=True)
-                    .first()
-                )
-
-                if notification.filter.get("All") == False:
-                    is_all_segment = "false"
-                    surnames = notification.filter.get("surname")
-                    player_ids_android = list(
-                        PersonPlayerId.objects.filter(
-                            person__surname__name__in=surnames,
-                            person__is_deleted=False,
-                            platform="Android",
-                        ).values_list("player_id", flat=True)
-                    )
-                    player_ids_ios = list(
-                        PersonPlayerId.objects.filter(
-                            person__surname__name__in=surnames,
-                            person__is_deleted=False,
-                            platform="Ios",
-                        ).values_list("player_id", flat=True)
-                    )
-                else:
-                    is_all_segment = "true"
-
-                notification_created.delay(
-                    "Notification",
-                    notification.title,
-                    notification.sub_title,
-                    notification_image,
-                    is_all_segment,
-                    player_ids_android,
-                    player_ids_ios,
-                )
-
-            return (
-                NotificationNewGetSerializer(notifications, many=True).data
-                if notifications
-                else []
-            )
-
-        one_week_before_serializer = []
-        one_week_after_serializer = []
-
-        one_week_before_notifications = Notification.objects.filter(
-            start_date__lte=today_end,
-            expire_date__range=[today_end, one_week_end],
-            is_event=True,
-        )
-        one_week_before_serializer = process_notifications(
-            one_week_before_notifications
-        )
-
-        if today.weekday() == 0:
-            one_week_after_notifications = Notification.objects.filter(
-                start_date__lte=today_end,
-                expire_date__range=[one_week_end, one_month_end],
-                is_event=True,
+class NotificationReadView(APIView):
+    def post(self, request):
+        person_id = request.data.get("person_id")
+        notification_ids = request.data.get("notification_ids") or []
+        if not person_id or not isinstance(notification_ids, list):
+            return Response(
+                {"message": "Person ID and a list of notification IDs are required."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            one_week_after_serializer = process_notifications(
-                one_week_after_notifications
+        try:
+            person = Person.objects.get(id=person_id, is_deleted=False)
+        except Person.DoesNotExist:
+            return Response(
+                {"message": "Person not found"}, status=status.HTTP_404_NOT_FOUND
             )
-
-        return Response(
-            {
-                "one_week_before_notifications": one_week_before_serializer,
-                "one_week_after_notifications": one_week_after_serializer,
-            }
+        visible_ids = list(
+            Notification.objects.filter(
+                InboxService.visible_to(person), id__in=notification_ids
+            ).values_list("id", flat=True)
         )
+        InboxService.mark_read(person.id, visible_ids)
+        return Response({"read": visible_ids}, status=status.HTTP_200_OK)
 
 
-class PendingNotificationSend(APIView):
-    def get(self, request):
-        try:
-            # Log the start time
-            now = datetime.now()
-            filename = "cronlog.log"
-            message = f"\nstart pending notification send time :- {now}"
-            append_to_log(filename, message)
-
-            # Define target datetime
-            target_date = datetime.now()
-            today_start = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            today_end = target_date.replace(
-                hour=23, minute=59, second=59, microsecond=999999
-            )
-            player_ids_android = []
-            player_ids_ios = []
-            # Query notifications
-            notifications = Notification.objects.filter(
-                start_date__range=(today_start, today_end)
-            ).order_by("id")
-
-            # Process notifications
-            for i in notifications:
-                notification_image = (
-                    NotificationImage.objects.filter(notification_id_id=i.id)
-                    .values_list("image_url", flat=True)
-                    .first()
-                )
-
-                if i.filter.get("All") == False:
-                    is_all_segment = "false"
-                    surnames = i.filter.get("surname")
-                    player_ids_android = list(
-                        PersonPlayerId.objects.filter(
-                            person__surname__name__in=surnames,
-                            person__is_deleted=False,
-                            platform="Android",
-                        ).values_list("player_id", flat=True)
-                    )
+class EventFrequency(APIView):
+    """
+    Fires the event reminders that are due (celery beat already does this
+    every minute). Reminder instants are precomputed per event into
+    EventReminder when the event is saved, see EventReminderService.
+    """
 
-                    player_ids_ios = list(
-                        PersonPlayerId.objects.filter(
-                            person__surname__name__in=surnames, platform="Ios"
-                        ).values_list("player_id", flat=True)
-                    )
-                else:
-                    is_all_segment = "true"
-
-                image_url = notification_image
-                sender = "Notification"
-
-                task_args = (
-                    sender,
-                    i.title,
-                    i.sub_title,
-                    image_url,
-                    is_all_segment,
-                    player_ids_android,
-                    player_ids_ios,
-                )
-                try:
-                    notification_created.delay(*task_args)
-                except Exception:
-                    # Redis unavailable — run synchronously (local dev / no broker)
-                    notification_created(*task_args)
+    def get(self, request):
+        return Response(send_event_reminders(), status=status.HTTP_200_OK)
 
-            # Log end time
-            now = datetime.now()
-            filename = "cronlog.log"
-            message = f"End pending notification send time :- {now}"
-            append_to_log(filename, message)
 
-            return Response("okay", status=status.HTTP_200_OK)
+class PendingNotificationSend(APIView):
+    """
+    Runs the notification dispatcher once (celery beat already does this
+    every minute). Only notifications whose start time has passed and that
+    were not pushed yet are sent, so calling it repeatedly is safe.
+    """
 
+    def get(self, request):
+        try:
+            counts = dispatch_due_notifications()
         except Exception as e:
-            now = datetime.now()
-            filename = "cronlog.log"
-            message = f"End pending notification send time :- {now} \n Error is :- {e}"
-            append_to_log(filename, message)
+            logger.exception("Pending notification send failed")
             return Response(
                 {"message": f"Error Sending Pending Notification: {e}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        return Response(counts, status=status.HTTP_200_OK)
 
 
 # ---------------------------------------------------------------------------
@@ -1029,32 +789,50 @@ class PendingNotificationSend(APIView):
 
 class BirthdayAPIView(APIView):
     """
-    GET /api/v4/birthdays?person_id=<id>&lang=<en|guj>
+    GET /api/v4/birthdays?person_id=<id>&lang=<en|guj>&days=<7|30|90>
 
-    Returns today's and upcoming (next-7-day) birthdays scoped to the
-    requesting person's role:
+    Returns today's and upcoming (next ``days`` days, 7 by default)
+    birthdays scoped to the requesting person's role:
         - Normal member  → same samaj
         - Admin          → same samaj + same surname
         - Super Admin    → entire village (all samaj)
 
+    Super admins see a whole village, so their upcoming list is paginated
+    with ``page`` / ``page_size`` (defaults 1 / 50, max 100).
+
     Query Params:
         person_id (int, required): ID of the requesting person.
+        days      (int, optional): 7 (default), 30 or 90.
+        page      (int, optional): super admins only.
+        page_size (int, optional): super admins only.
         lang      (str, optional): "en" (default) or "guj"
                                    — reserved for future use.
 
     Response:
         {
             "today_birthdays":    [ ...BirthdayPersonSerializer... ],
-            "upcoming_birthdays": [ ...BirthdayPersonSerializer... ]
+            "upcoming_birthdays": [ ...BirthdayPersonSerializer... ],
+            "days": 7,
+            # super admins only:
+            "page": 1, "page_size": 50, "has_next": false
         }
     """
 
     authentication_classes = []
     permission_classes = []
 
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 100
+
     def get(self, request):
+        from datetime import date as _date
         from parivar.utils import get_person_queryset
-        from notifications.helpers import get_birthday_queryset, split_birthdays
+        from notifications.helpers import (
+            BIRTHDAY_HORIZONS,
+            DEFAULT_BIRTHDAY_HORIZON,
+            get_birthday_queryset,
+            upcoming_birthdays,
+        )
         from notifications.serializers import BirthdayPersonSerializer
 
         person_id = request.GET.get("person_id")
@@ -1064,6 +842,16 @@ class BirthdayAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        try:
+            days = int(request.GET.get("days", DEFAULT_BIRTHDAY_HORIZON))
+        except (TypeError, ValueError):
+            days = None
+        if days not in BIRTHDAY_HORIZONS:
+            return Response(
+                {"message": f"days must be one of {', '.join(map(str, BIRTHDAY_HORIZONS))}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         # Fetch requesting person (respects demo-mode via get_person_queryset)
         try:
             person = get_person_queryset(request).select_related(
@@ -1087,8 +875,33 @@ class BirthdayAPIView(APIView):
         # Apply role-based scoping
         scoped_qs = get_birthday_queryset(person, base_qs)
 
-        # Split into today & upcoming (surname-priority sort applied)
-        today_list, upcoming_list = split_birthdays(scoped_qs, login_person=person)
+        # Window predicate, days-until and surname-priority sort run in SQL
+        today = _date.today()
+        today_list = list(upcoming_birthdays(scoped_qs, today, 1, login_person=person))
+        upcoming_qs = upcoming_birthdays(
+            scoped_qs, today + timedelta(days=1), days, login_person=person
+        )
+
+        pagination = {}
+        if person.is_super_admin:
+            try:
+                page = max(int(request.GET.get("page", 1)), 1)
+                page_size = min(max(int(request.GET.get("page_size", self.PAGE_SIZE)), 1), self.MAX_PAGE_SIZE)
+            except (TypeError, ValueError):
+                return Response(
+                    {"message": "Invalid page or page_size"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            offset = (page - 1) * page_size
+            upcoming_list = list(upcoming_qs[offset:offset + page_size + 1])
+            pagination = {
+                "page": page,
+                "page_size": page_size,
+                "has_next": len(upcoming_list) > page_size,
+            }
+            upcoming_list = upcoming_list[:page_size]
+        else:
+            upcoming_list = list(upcoming_qs)
 
         return Response(
             {
@@ -1098,6 +911,8 @@ class BirthdayAPIView(APIView):
                 "upcoming_birthdays": BirthdayPersonSerializer(
                     upcoming_list, many=True, context={"request": request}
                 ).data,
+                "days": days,
+                **pagination,
             },
             status=status.HTTP_200_OK,
         )
@@ -1105,16 +920,15 @@ class BirthdayAPIView(APIView):
 
 # ---------------------------------------------------------------------------
 # Birthday Cron Send API  
-# ---------------------------------------------------------------------------
-
 class BirthdaySendView(APIView):
     """
     GET /api/v4/send-birthday-notifications
 
-    Finds every person whose birthday (MM-DD portion of date_of_birth)
-    matches TODAY's date, then sends an individual push notification to
-    all members of that person's samaj via the existing OneSignal /
-    Celery pipeline.
+    Starts today's birthday run (notifications.tasks.send_birthday_notifications):
+    persons whose birthday is TODAY are grouped by samaj and every samaj
+    receives one digest push naming them, via the OneSignal / Celery
+    pipeline. Calling it again the same day resumes an unfinished run and
+    never sends twice.
 
     Designed to be called once daily at 12:00 AM by a system cron:
 
@@ -1127,162 +941,52 @@ class BirthdaySendView(APIView):
     authentication_classes = []
     permission_classes = []
 
-    def get(self, request):
-        from datetime import date as _date
-
-        today_md = _date.today().strftime("%m-%d")  # e.g. "02-24"
-
-        log_file = "/tmp/birthday_cron.log"
-        now = datetime.now()
-        append_to_log(log_file, f"\n[{now}] Birthday cron started — matching MM-DD = {today_md}")
-
-        # ── 1. Find today's birthday persons (real data only, not demo) ──
-        all_persons = (
-            Person.objects.filter(is_deleted=False, is_demo=False, flag_show=True)
-            .select_related("surname", "samaj")
-            .only(
-                "id", "first_name", "middle_name", "date_of_birth",
-                "mobile_number1", "mobile_number2",
-                "surname", "samaj",
-            )
-        )
-
-        birthday_persons = [
-            p for p in all_persons
-            if (p.date_of_birth or "").strip()[5:10] == today_md
-        ]
-
-        append_to_log(
-            log_file,
-            f"[{now}] Found {len(birthday_persons)} birthday person(s) today.",
-        )
+    @staticmethod
+    def run_payload(run, message):
+        return {
+            "message": message,
+            "run_id": run.id,
+            "run_date": run.run_date,
+            "state": run.state,
+            "birthday_persons_found": run.birthday_count,
+            "samaj_count": run.samaj_count,
+            "notifications_sent": run.pushes_sent,
+        }
 
-        if not birthday_persons:
+    def get(self, request):
+        run, _ = BirthdayDigestService.start()
+        if run.state == BirthdayNotificationRun.STATE_COMPLETED:
             return Response(
-                {
-                    "message": "No birthdays today.",
-                    "birthday_persons_found": 0,
-                    "notifications_sent": 0,
-                },
+                self.run_payload(run, "Birthday notifications already sent today."),
                 status=status.HTTP_200_OK,
             )
-
-        # ── 2. For each birthday person, notify their samaj members ──────
-        notifications_sent = 0
-
-        for bday_person in birthday_persons:
-            if not bday_person.samaj_id:
-                append_to_log(
-                    log_file,
-                    f"  Skipped person id={bday_person.id} — no samaj assigned.",
-                )
-                continue
-
-            # ── Eligibility check ─────────────────────────────────────────
-            # Rule: if age >= 30 AND no mobile number → skip (adult with no app).
-            # Under 30 with no mobile → still notify (family will see it).
-            # Anyone WITH a mobile → always notify.
-            has_mobile = bool(
-                (bday_person.mobile_number1 or "").strip()
-                or (bday_person.mobile_number2 or "").strip()
-            )
-            if not has_mobile:
-                dob_str = (bday_person.date_of_birth or "").strip()[:10]  # YYYY-MM-DD
-                try:
-                    from datetime import date as _date
-                    birth_date = _date.fromisoformat(dob_str)
-                    today_d = _date.today()
-                    age = (
-                        today_d.year - birth_date.year
-                        - ((today_d.month, today_d.day) < (birth_date.month, birth_date.day))
-                    )
-                except Exception:
-                    age = 0  # can't compute age, assume eligible
-
-                if age >= 30:
-                    append_to_log(
-                        log_file,
-                        f"  Skipped person id={bday_person.pk} — age {age} >= 30, no mobile.",
-                    )
-                    continue
-            # ─────────────────────────────────────────────────────────────
-
-            # Build notification title & body
-            surname_name = bday_person.surname.name if bday_person.surname else ""
-            title = "🎂 Today's Birthday!"
-            body = (
-                f"Wish {bday_person.first_name} {bday_person.middle_name or ''} "
-                f"{surname_name} a very Happy Birthday! 🎉"
-            ).strip()
-
-            # Collect samaj members' player IDs (exclude the birthday person)
-            android_ids = list(
-                PersonPlayerId.objects.filter(
-                    person__samaj_id=bday_person.samaj_id,
-                    person__is_deleted=False,
-                    person__flag_show=True,
-                    platform="Android",
-                )
-                .exclude(person_id=bday_person.pk)
-                .values_list("player_id", flat=True)
-            )
-
-            ios_ids = list(
-                PersonPlayerId.objects.filter(
-                    person__samaj_id=bday_person.samaj_id,
-                    person__is_deleted=False,
-                    person__flag_show=True,
-                    platform="Ios",
-                )
-                .exclude(person_id=bday_person.pk)
-                .values_list("player_id", flat=True)
+        if not BirthdayDigestService.can_run(run):
+            return Response(
+                self.run_payload(run, "Birthday notifications are being sent."),
+                status=status.HTTP_200_OK,
             )
 
-            if not android_ids and not ios_ids:
-                append_to_log(
-                    log_file,
-                    f"  Skipped person id={bday_person.pk} — no registered devices in samaj.",
-                )
-                continue
-
-            # Dispatch via existing Celery task.
-            # Falls back to synchronous execution when Redis/Celery is not
-            # running (e.g. local dev), so the endpoint never 500s.
-            task_args = (
-                "BirthdayNotification",  # sender
-                title,
-                body,
-                None,                    # no image
-                "false",                 # is_all_segment = false (targeted)
-                android_ids,
-                ios_ids,
-            )
+        # Falls back to synchronous execution when Redis/Celery is not
+        # running (e.g. local dev), so the endpoint never 500s.
+        try:
+            send_birthday_notifications.delay(run.id)
+        except Exception:
+            # Redis unavailable — run synchronously (local dev / no broker)
             try:
-                notification_created.delay(*task_args)
-            except Exception:
-                # Redis unavailable — run synchronously (local dev / no broker)
-                notification_created(*task_args)
-
-            notifications_sent += 1
-            append_to_log(
-                log_file,
-                f"  Sent for person id={bday_person.pk} "
-                f"({len(android_ids)} Android, {len(ios_ids)} iOS devices).",
+                send_birthday_notifications(run.id)
+            except Exception as e:
+                run.refresh_from_db()
+                return Response(
+                    {**self.run_payload(run, "Birthday notifications failed."), "error": str(e)},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
+            run.refresh_from_db()
+            return Response(
+                self.run_payload(run, f"Birthday notifications sent to {run.pushes_sent} samaj."),
+                status=status.HTTP_200_OK,
             )
 
-        # ── 3. Summary log & response ─────────────────────────────────────
-        end_time = datetime.now()
-        append_to_log(
-            log_file,
-            f"[{end_time}] Birthday cron done — "
-            f"{notifications_sent}/{len(birthday_persons)} notifications dispatched.\n",
-        )
-
         return Response(
-            {
-                "message": f"Birthday notifications dispatched for {notifications_sent} person(s).",
-                "birthday_persons_found": len(birthday_persons),
-                "notifications_sent": notifications_sent,
-            },
-            status=status.HTTP_200_OK,
+            self.run_payload(run, "Birthday notifications queued."),
+            status=status.HTTP_202_ACCEPTED,
         )
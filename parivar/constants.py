@@ -5,6 +5,11 @@ LANGUAGE_CHOICES = [
         ("guj", "Gujarati"),
     ]
 
+# PostgreSQL ICU collations of the stored name sort keys (Surname and
+# SurnameMember ``sort_name`` / ``guj_sort_name``)
+COLLATION_EN = "en-x-icu"
+COLLATION_GUJ = "gu-x-icu"
+
 _tokenKey = "FJrIfWHGHgl%#&#4844hiuh#%$#FJQTd756jsa%hK%^*skdj"
 _algorithm = "HS256"
 
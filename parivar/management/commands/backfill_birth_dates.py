@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from parivar.models import Person
+
+
+class Command(BaseCommand):
+    help = "Fill Person.birth_date / birth_md from the date_of_birth strings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Only process persons whose birth_md is still empty.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        queryset = Person.objects.order_by("id").only("id", "date_of_birth", "birth_date", "birth_md")
+        if options["missing_only"]:
+            queryset = queryset.filter(birth_md__isnull=True)
+
+        last_id = 0
+        updated = 0
+        unparsed = 0
+        while True:
+            persons = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not persons:
+                break
+            changed = []
+            for person in persons:
+                birth_date, birth_md = Person.parse_birth_fields(person.date_of_birth)
+                if birth_md is None and (person.date_of_birth or "").strip():
+                    unparsed += 1
+                if (birth_date, birth_md) != (person.birth_date, person.birth_md):
+                    person.birth_date, person.birth_md = birth_date, birth_md
+                    changed.append(person)
+            Person.objects.bulk_update(changed, ["birth_date", "birth_md"])
+            updated += len(changed)
+            last_id = persons[-1].id
+
+        if unparsed:
+            self.stdout.write(self.style.WARNING(f"{unparsed} persons have a date_of_birth that could not be parsed."))
+        self.stdout.write(self.style.SUCCESS(f"Updated birth fields of {updated} persons."))
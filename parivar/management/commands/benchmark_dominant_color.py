@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from parivar.thumbnails import get_dominant_color
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def unique_dominant_color(image):
+    """Previous implementation: exact counts via a row-wise np.unique over every pixel."""
+    image = image.convert("RGB")
+    pixels = np.array(image).reshape(-1, 3)
+    colors, count = np.unique(pixels, axis=0, return_counts=True)
+    return tuple(int(c) for c in colors[np.argmax(count)])
+
+
+def synthetic_corpus(count, size):
+    """Photo-like images: noisy gradient with a flat backdrop covering a third of the frame."""
+    rng = np.random.default_rng(0)
+    width, height = size
+    for index in range(count):
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack(
+            [(x * 255 // width), (y * 255 // height), np.full_like(x, 40 * index % 256)], axis=-1
+        )
+        noise = rng.integers(-12, 12, size=base.shape)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        backdrop = rng.integers(0, 256, size=3, dtype=np.uint8)
+        pixels[:, : width // 3] = backdrop
+        yield f"synthetic-{index}", Image.fromarray(pixels, "RGB")
+
+
+class Command(BaseCommand):
+    help = "Compare the bincount dominant-colour engine with the np.unique implementation."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Image files or directories to use as the corpus. Synthetic images are used if omitted.",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per image (best is kept).")
+        parser.add_argument("--synthetic", type=int, default=5, help="Number of synthetic images.")
+        parser.add_argument(
+            "--size", type=int, nargs=2, default=(4000, 3000), metavar=("W", "H"),
+            help="Synthetic image size (default 12 MP).",
+        )
+
+    def corpus(self, options):
+        if not options["paths"]:
+            yield from synthetic_corpus(options["synthetic"], tuple(options["size"]))
+            return
+        for path in options["paths"]:
+            files = [path]
+            if os.path.isdir(path):
+                files = sorted(
+                    os.path.join(path, name)
+                    for name in os.listdir(path)
+                    if name.lower().endswith(IMAGE_EXTENSIONS)
+                )
+            for file_path in files:
+                with Image.open(file_path) as image:
+                    image.load()
+                    yield os.path.basename(file_path), image.convert("RGB")
+
+    def best_time(self, func, image, repeat):
+        best, result = None, None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            result = func(image)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        total_old = total_new = 0.0
+        worst = 0.0
+        count = 0
+        for name, image in self.corpus(options):
+            old_time, old_color = self.best_time(unique_dominant_color, image, options["repeat"])
+            new_time, new_color = self.best_time(get_dominant_color, image, options["repeat"])
+            distance = float(np.linalg.norm(np.subtract(old_color, new_color, dtype=float)))
+            worst = max(worst, distance)
+            total_old += old_time
+            total_new += new_time
+            count += 1
+            self.stdout.write(
+                f"{name} {image.width}x{image.height}: np.unique {old_time * 1000:.1f} ms {old_color}, "
+                f"bincount {new_time * 1000:.1f} ms {new_color}, distance {distance:.1f}"
+            )
+
+        if not count:
+            self.stdout.write(self.style.WARNING("No images found."))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{count} images: np.unique {total_old * 1000:.1f} ms, bincount {total_new * 1000:.1f} ms "
+                f"({total_old / total_new:.1f}x faster), worst RGB distance {worst:.1f}"
+            )
+        )
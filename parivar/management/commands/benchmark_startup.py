@@ -0,0 +1,88 @@
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so every module is timed from a cold import.
+PROBE = """
+import json, os, sys, time, importlib
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - start
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"setup": setup, "import": elapsed, "heavy": [m for m in ("cv2", "numpy") if m in sys.modules]}))
+"""
+
+SKIPPED_PACKAGES = ("migrations", "management", "tests", "templatetags")
+
+
+def project_modules():
+    """Modules of the apps that live inside this project (not site-packages)."""
+    base_dir = str(settings.BASE_DIR)
+    for app_config in apps.get_app_configs():
+        if not app_config.path.startswith(base_dir):
+            continue
+        yield app_config.name
+        for module in pkgutil.walk_packages([app_config.path], prefix=f"{app_config.name}."):
+            if any(part in SKIPPED_PACKAGES for part in module.name.split(".")[1:]):
+                continue
+            yield module.name
+
+
+class Command(BaseCommand):
+    help = "Report the cold import time of every project app module (each in a fresh interpreter)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            action="append",
+            dest="modules",
+            help="Only time this module (repeatable). Defaults to every module of the project apps.",
+        )
+        parser.add_argument("--repeat", type=int, default=1, help="Runs per module; the fastest is kept.")
+
+    def probe(self, module):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE, module],
+            capture_output=True,
+            text=True,
+            cwd=str(settings.BASE_DIR),
+            env=os.environ.copy(),
+        )
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+            return None, error
+        return json.loads(result.stdout.strip().splitlines()[-1]), None
+
+    def handle(self, *args, **options):
+        rows = []
+        setup_times = []
+        for module in options["modules"] or list(project_modules()):
+            best = None
+            for _ in range(max(options["repeat"], 1)):
+                data, error = self.probe(module)
+                if error:
+                    self.stdout.write(self.style.WARNING(f"{module}: import failed: {error}"))
+                    break
+                if best is None or data["import"] < best["import"]:
+                    best = data
+            if best:
+                rows.append((module, best))
+                setup_times.append(best["setup"])
+
+        if not rows:
+            return
+        self.stdout.write(f"django.setup(): {min(setup_times) * 1000:.0f} ms")
+        for module, data in sorted(rows, key=lambda row: row[1]["import"], reverse=True):
+            heavy = f"  (loads {', '.join(data['heavy'])})" if data["heavy"] else ""
+            self.stdout.write(f"{data['import'] * 1000:8.0f} ms  {module}{heavy}")
+        slowest = max(rows, key=lambda row: row[1]["import"])[0]
+        self.stdout.write(self.style.SUCCESS(f"Timed {len(rows)} modules; slowest: {slowest}"))
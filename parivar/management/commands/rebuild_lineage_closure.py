@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from parivar.services import LineageService
+
+
+class Command(BaseCommand):
+    help = "Backfill the ParentChildClosure table from ParentChildRelation, or check it for consistency."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the stored closure with a fresh computation; do not write.",
+        )
+        parser.add_argument(
+            "--demo",
+            action="store_true",
+            help="Process demo relations instead of real ones.",
+        )
+
+    def handle(self, *args, **options):
+        is_demo = options["demo"]
+        label = "demo" if is_demo else "real"
+
+        if options["check"]:
+            missing, extra, wrong_depth = LineageService.check(is_demo)
+            if not (missing or extra or wrong_depth):
+                self.stdout.write(self.style.SUCCESS(f"Closure for {label} data is consistent."))
+                return
+            self.stdout.write(self.style.WARNING(f"Missing rows: {len(missing)}"))
+            self.stdout.write(self.style.WARNING(f"Extra rows: {len(extra)}"))
+            self.stdout.write(self.style.WARNING(f"Wrong depth: {len(wrong_depth)}"))
+            for ancestor_id, descendant_id in (missing + extra + wrong_depth)[:20]:
+                self.stdout.write(f"  ancestor={ancestor_id} descendant={descendant_id}")
+            self.stdout.write("Run without --check to rebuild.")
+            return
+
+        count = LineageService.rebuild_all(is_demo)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {label} closure: {count} rows."))
@@ -0,0 +1,20 @@
+from parivar.services import LoginPersonService
+from parivar.utils import is_demo_login
+
+
+class LoginPersonMiddleware:
+    """
+    Resolves the caller from the X-Mobile-Number header once per request and
+    exposes it as ``request.login_person`` (None when the header is missing or
+    matches nobody). ``samaj`` and ``samaj.village`` are already loaded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mobile = request.headers.get("X-Mobile-Number")
+        request.login_person = (
+            LoginPersonService.resolve(mobile, is_demo_login(request)) if mobile else None
+        )
+        return self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0077_country_mobile_number_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FamilyTreeSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lang', models.CharField(default='en', max_length=10)),
+                ('is_demo', models.BooleanField(default=False)),
+                ('top_member', models.IntegerField(blank=True, null=True)),
+                ('nodes', models.JSONField(default=dict)),
+                ('edges', models.JSONField(default=dict)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('is_stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('surname', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tree_snapshots', to='parivar.surname')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_stale'], name='parivar_fam_is_stal_04359f_idx')],
+                'unique_together': {('surname', 'lang', 'is_demo')},
+            },
+        ),
+    ]
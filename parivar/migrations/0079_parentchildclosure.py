@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0078_familytreesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParentChildClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('is_demo', models.BooleanField(default=False)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='parivar.person')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='parivar.person')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='parivar_par_descend_967782_idx')],
+                'unique_together': {('ancestor', 'descendant', 'is_demo')},
+            },
+        ),
+    ]
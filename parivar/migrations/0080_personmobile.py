@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_mobile(value):
+    return "".join(ch for ch in str(value or "") if ch.isdigit())
+
+
+def backfill_person_mobiles(apps, schema_editor):
+    Person = apps.get_model("parivar", "Person")
+    PersonMobile = apps.get_model("parivar", "PersonMobile")
+    rows = []
+    persons = Person.objects.filter(is_deleted=False).values_list(
+        "id", "mobile_number1", "mobile_number2", "is_demo"
+    )
+    for person_id, mobile1, mobile2, is_demo in persons.iterator():
+        for mobile in {normalize_mobile(mobile1), normalize_mobile(mobile2)} - {""}:
+            rows.append(PersonMobile(person_id=person_id, mobile=mobile, is_demo=is_demo))
+        if len(rows) >= 2000:
+            PersonMobile.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    PersonMobile.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0079_parentchildclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonMobile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mobile', models.CharField(max_length=20)),
+                ('is_demo', models.BooleanField(default=False)),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mobile_links', to='parivar.person')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mobile', 'is_demo'], name='parivar_per_mobile_a599be_idx')],
+                'unique_together': {('person', 'mobile')},
+            },
+        ),
+        migrations.RunPython(backfill_person_mobiles, migrations.RunPython.noop),
+    ]
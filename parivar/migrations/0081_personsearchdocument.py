@@ -0,0 +1,97 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:41
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def search_text(*parts):
+    return " ".join(" ".join(str(part).split()) for part in parts if part).lower()
+
+
+def digits(value):
+    return "".join(ch for ch in str(value or "") if ch.isdigit())
+
+
+def backfill_search_documents(apps, schema_editor):
+    Person = apps.get_model("parivar", "Person")
+    Surname = apps.get_model("parivar", "Surname")
+    TranslatePerson = apps.get_model("parivar", "TranslatePerson")
+    PersonSearchDocument = apps.get_model("parivar", "PersonSearchDocument")
+
+    top_member_ids = {
+        int(value)
+        for value in Surname.objects.values_list("top_member", flat=True)
+        if str(value).isdigit()
+    }
+    translations = {}
+    for person_id, first_name, middle_name in (
+        TranslatePerson.objects.filter(language="guj", is_deleted=False)
+        .order_by("id")
+        .values_list("person_id_id", "first_name", "middle_name")
+        .iterator()
+    ):
+        translations.setdefault(person_id, (first_name, middle_name))
+
+    rows = []
+    for person in Person.objects.select_related("surname").iterator():
+        guj_first_name, guj_middle_name = translations.get(
+            person.id, (person.guj_first_name, person.guj_middle_name)
+        )
+        surname = person.surname
+        rows.append(
+            PersonSearchDocument(
+                person_id=person.id,
+                samaj_id=person.samaj_id,
+                is_demo=person.is_demo,
+                is_listed=bool(
+                    person.flag_show and not person.is_deleted and person.id not in top_member_ids
+                ),
+                name_key=search_text(person.first_name)[:100],
+                guj_name_key=search_text(guj_first_name)[:500],
+                document=search_text(
+                    person.first_name,
+                    person.middle_name,
+                    surname.name if surname else "",
+                    guj_first_name,
+                    guj_middle_name,
+                    surname.guj_name if surname else "",
+                    digits(person.mobile_number1),
+                    digits(person.mobile_number2),
+                    person.date_of_birth,
+                ),
+            )
+        )
+        if len(rows) >= 2000:
+            PersonSearchDocument.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    PersonSearchDocument.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0080_personmobile'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='PersonSearchDocument',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='parivar.person')),
+                ('is_demo', models.BooleanField(default=False)),
+                ('is_listed', models.BooleanField(default=False)),
+                ('name_key', models.CharField(blank=True, default='', max_length=100)),
+                ('guj_name_key', models.CharField(blank=True, default='', max_length=500)),
+                ('document', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('samaj', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.samaj')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['samaj', 'is_demo', 'is_listed'], name='parivar_per_samaj_i_165b8c_idx'), django.contrib.postgres.indexes.GinIndex(fields=['document'], name='person_search_doc_trgm', opclasses=['gin_trgm_ops'])],
+            },
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0081_personsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(max_length=512, upload_to='uploads/original/')),
+                ('original_filename', models.CharField(max_length=255)),
+                ('is_demo', models.BooleanField(default=False)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('bug_count', models.PositiveIntegerField(default=0)),
+                ('bug_file', models.CharField(blank=True, default='', max_length=512)),
+                ('error', models.TextField(blank=True, default='')),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('checkpoint', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.person')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state'], name='parivar_imp_state_ca553d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0082_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='thumb_status',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('thumb_status', 'pending')), fields=['thumb_status'], name='person_thumb_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0083_person_thumb_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='birth_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='birth_md',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['samaj', 'birth_md'], name='person_samaj_birth_md_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('flag_show', True), ('is_deleted', False)), fields=['birth_md'], name='person_listed_birth_md_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_surname_members(apps, schema_editor):
+    Person = apps.get_model("parivar", "Person")
+    Surname = apps.get_model("parivar", "Surname")
+    TranslatePerson = apps.get_model("parivar", "TranslatePerson")
+    ParentChildRelation = apps.get_model("parivar", "ParentChildRelation")
+    SurnameMember = apps.get_model("parivar", "SurnameMember")
+
+    configured = {
+        int(value)
+        for value in Surname.objects.values_list("top_member", flat=True)
+        if str(value).isdigit()
+    }
+    translations = {}
+    for person_id, first_name, middle_name in (
+        TranslatePerson.objects.filter(language="guj", is_deleted=False)
+        .order_by("id")
+        .values_list("person_id_id", "first_name", "middle_name")
+        .iterator()
+    ):
+        translations.setdefault(person_id, (first_name, middle_name))
+
+    # Listed persons per (surname, samaj, is_demo) scope
+    scope_of = {}
+    rows = []
+    for person in Person.objects.iterator():
+        guj_first_name, guj_middle_name = translations.get(
+            person.id, (person.guj_first_name, person.guj_middle_name)
+        )
+        is_listed = bool(person.flag_show and not person.is_deleted)
+        if is_listed and person.surname_id:
+            scope_of[person.id] = (person.surname_id, person.samaj_id, person.is_demo)
+        rows.append(
+            SurnameMember(
+                person_id=person.id,
+                surname_id=person.surname_id,
+                samaj_id=person.samaj_id,
+                is_demo=person.is_demo,
+                is_listed=is_listed,
+                has_mobile=(
+                    person.mobile_number1 is not None or person.mobile_number2 is not None
+                ) and person.mobile_number1 != "",
+                guj_first_name=guj_first_name,
+                guj_middle_name=guj_middle_name,
+            )
+        )
+
+    # Roots: listed parents that are nobody's child within the same scope
+    parents, children = defaultdict(set), defaultdict(set)
+    for parent_id, child_id, is_demo in (
+        ParentChildRelation.objects.filter(is_deleted=False)
+        .values_list("parent_id", "child_id", "is_demo")
+        .iterator()
+    ):
+        scope = scope_of.get(parent_id)
+        if scope and scope == scope_of.get(child_id) and scope[2] == is_demo:
+            parents[scope].add(parent_id)
+            children[scope].add(child_id)
+    top_ids = {person_id for person_id in configured if person_id in scope_of}
+    for scope, parent_ids in parents.items():
+        top_ids |= parent_ids - children[scope]
+
+    for row in rows:
+        row.is_top_member = row.person_id in top_ids
+    SurnameMember.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0084_person_birth_md'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurnameMember',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='surname_member', serialize=False, to='parivar.person')),
+                ('is_demo', models.BooleanField(default=False)),
+                ('is_listed', models.BooleanField(default=False)),
+                ('is_top_member', models.BooleanField(default=False)),
+                ('has_mobile', models.BooleanField(default=False)),
+                ('guj_first_name', models.CharField(blank=True, max_length=500, null=True)),
+                ('guj_middle_name', models.CharField(blank=True, max_length=500, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('samaj', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.samaj')),
+                ('surname', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.surname')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_listed', True), ('is_top_member', False)), fields=['surname', 'samaj', 'is_demo'], name='surname_member_pick_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_surname_members, migrations.RunPython.noop),
+    ]
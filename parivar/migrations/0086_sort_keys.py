@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:15
+
+from django.db import migrations, models
+
+from parivar.utils import name_sort_key
+
+
+def backfill_sort_keys(apps, schema_editor):
+    Surname = apps.get_model("parivar", "Surname")
+    SurnameMember = apps.get_model("parivar", "SurnameMember")
+
+    surnames = list(Surname.objects.all())
+    for surname in surnames:
+        surname.sort_name = name_sort_key(surname.name)[:255]
+        surname.guj_sort_name = name_sort_key(surname.guj_name or surname.name)[:255]
+    Surname.objects.bulk_update(surnames, ["sort_name", "guj_sort_name"], batch_size=1000)
+
+    rows = []
+    for row in SurnameMember.objects.select_related("person").iterator():
+        first_name, middle_name = row.person.first_name, row.person.middle_name
+        row.sort_name = name_sort_key(first_name, middle_name)
+        row.guj_sort_name = name_sort_key(row.guj_first_name or first_name, row.guj_middle_name or middle_name)
+        rows.append(row)
+    SurnameMember.objects.bulk_update(rows, ["sort_name", "guj_sort_name"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0085_surnamemember'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surname',
+            name='guj_sort_name',
+            field=models.CharField(blank=True, db_collation='gu-x-icu', default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='surname',
+            name='sort_name',
+            field=models.CharField(blank=True, db_collation='en-x-icu', default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='surnamemember',
+            name='guj_sort_name',
+            field=models.TextField(blank=True, db_collation='gu-x-icu', default=''),
+        ),
+        migrations.AddField(
+            model_name='surnamemember',
+            name='sort_name',
+            field=models.TextField(blank=True, db_collation='en-x-icu', default=''),
+        ),
+        migrations.RunPython(backfill_sort_keys, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='surnamemember',
+            name='surname_member_pick_idx',
+        ),
+        migrations.AddIndex(
+            model_name='surname',
+            index=models.Index(fields=['samaj', 'sort_name'], name='surname_samaj_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='surname',
+            index=models.Index(fields=['samaj', 'guj_sort_name'], name='surname_samaj_guj_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='surnamemember',
+            index=models.Index(condition=models.Q(('is_listed', True), ('is_top_member', False)), fields=['surname', 'is_demo', 'sort_name'], name='surname_member_pick_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='surnamemember',
+            index=models.Index(condition=models.Q(('is_listed', True), ('is_top_member', False)), fields=['surname', 'is_demo', 'guj_sort_name'], name='surname_member_guj_pick_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_pending_approvals(apps, schema_editor):
+    Person = apps.get_model("parivar", "Person")
+    PendingApproval = apps.get_model("parivar", "PendingApproval")
+
+    PendingApproval.objects.bulk_create(
+        (
+            PendingApproval(
+                person_id=person["id"],
+                surname_id=person["surname_id"],
+                samaj_id=person["samaj_id"],
+                is_demo=person["is_demo"],
+                child_flag=person["child_flag"],
+            )
+            for person in Person.objects.filter(flag_show=False, is_deleted=False)
+            .values("id", "surname_id", "samaj_id", "is_demo", "child_flag")
+            .iterator()
+        ),
+        batch_size=1000,
+    )
+    # Queue position of existing requests is their registration time
+    PendingApproval.objects.update(
+        queued_at=models.Subquery(
+            Person.objects.filter(pk=models.OuterRef("person_id")).values("created_time")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0086_sort_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingApproval',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pending_approval', serialize=False, to='parivar.person')),
+                ('is_demo', models.BooleanField(default=False)),
+                ('child_flag', models.BooleanField(default=False)),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+                ('samaj', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.samaj')),
+                ('surname', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parivar.surname')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_demo', 'queued_at', 'person'], name='pending_approval_queue_idx'), models.Index(fields=['samaj', 'surname', 'is_demo'], name='pending_approval_scope_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_pending_approvals, migrations.RunPython.noop),
+    ]
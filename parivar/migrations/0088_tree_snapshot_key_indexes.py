@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:36
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parivar', '0087_pendingapproval'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='familytreesnapshot',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nodes'], name='tree_snapshot_nodes_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='familytreesnapshot',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['edges'], name='tree_snapshot_edges_gin'),
+        ),
+    ]
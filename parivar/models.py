@@ -1,14 +1,16 @@
 from typing import Any
 from django.db import models
 from django.contrib.auth.models import AbstractUser, User
+from django.contrib.postgres.indexes import GinIndex
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from parivar.constants import LANGUAGE_CHOICES
+from parivar.constants import COLLATION_EN, COLLATION_GUJ, LANGUAGE_CHOICES
+from parivar.utils import name_sort_key
 import boto3
 from django.conf import settings
 
 # from rest_framework.authtoken.models import TokenManager
-from datetime import datetime
+from datetime import date, datetime
 import os
 
 
@@ -29,6 +31,9 @@ class Surname(models.Model):
     samaj = models.ForeignKey(
         "Samaj", on_delete=models.CASCADE, null=True, blank=True, related_name="surnames"
     )
+    # Maintained by save(); ORDER BY these instead of sorting names in Python
+    sort_name = models.CharField(max_length=255, blank=True, default="", db_collation=COLLATION_EN)
+    guj_sort_name = models.CharField(max_length=255, blank=True, default="", db_collation=COLLATION_GUJ)
 
     def __str__(self):
         if self.samaj:
@@ -38,8 +43,27 @@ class Surname(models.Model):
             return f"{self.name} - {self.samaj.name}"
         return f"{self.name} - No Samaj"
 
+    def set_sort_names(self):
+        self.sort_name = name_sort_key(self.name)[:255]
+        self.guj_sort_name = name_sort_key(self.guj_name or self.name)[:255]
+
+    @staticmethod
+    def sort_field(lang):
+        return "guj_sort_name" if lang == "guj" else "sort_name"
+
+    def save(self, *args, **kwargs):
+        self.set_sort_names()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"name", "guj_name"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "sort_name", "guj_sort_name"}
+        super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ("name", "samaj")
+        indexes = [
+            models.Index(fields=["samaj", "sort_name"], name="surname_samaj_sort_idx"),
+            models.Index(fields=["samaj", "guj_sort_name"], name="surname_samaj_guj_sort_idx"),
+        ]
 
 
 class BloodGroup(models.Model):
@@ -182,6 +206,16 @@ class Samaj(models.Model):
 # new model added ended. 
 
 class Person(models.Model):
+    THUMB_PENDING = "pending"
+    THUMB_READY = "ready"
+    THUMB_FAILED = "failed"
+    THUMB_STATUS_CHOICES = (
+        ("", "None"),
+        (THUMB_PENDING, "Pending"),
+        (THUMB_READY, "Ready"),
+        (THUMB_FAILED, "Failed"),
+    )
+
     id = models.AutoField(primary_key=True)
     first_name = models.CharField(max_length=100, blank=True, null=True)
     middle_name = models.CharField(max_length=100, blank=True, null=True)
@@ -189,6 +223,10 @@ class Person(models.Model):
         Surname, on_delete=models.CASCADE, blank=True, null=True
     )
     date_of_birth = models.CharField(max_length=100, null=True, blank=True)
+    # Parsed from date_of_birth by set_birth_fields() on every save
+    birth_date = models.DateField(null=True, blank=True)
+    # month * 100 + day (224 = 24 February), for indexed birthday lookups
+    birth_md = models.PositiveSmallIntegerField(null=True, blank=True)
     mobile_number1 = models.CharField(max_length=20, blank=True, null=True)
     mobile_number2 = models.CharField(max_length=20, blank=True, null=True)
     address = models.CharField(max_length=255, blank=True, null=True)
@@ -224,6 +262,10 @@ class Person(models.Model):
     thumb_profile = models.ImageField(
         upload_to="compress_img/", blank=True, null=True, max_length=512
     )
+    # Face-cropped thumb_profile generation state (parivar.thumbnails)
+    thumb_status = models.CharField(
+        max_length=10, choices=THUMB_STATUS_CHOICES, blank=True, default=""
+    )
     status = models.CharField(max_length=50, blank=True, null=True)
     is_admin = models.BooleanField(default=False)
     is_same_as_father_address = models.BooleanField(default=False)
@@ -266,6 +308,17 @@ class Person(models.Model):
             models.Index(fields=["surname"]),
             models.Index(fields=["flag_show"]),
             models.Index(fields=["mobile_number1"]),
+            models.Index(
+                fields=["thumb_status"],
+                condition=models.Q(thumb_status="pending"),
+                name="person_thumb_pending_idx",
+            ),
+            models.Index(fields=["samaj", "birth_md"], name="person_samaj_birth_md_idx"),
+            models.Index(
+                fields=["birth_md"],
+                condition=models.Q(is_deleted=False, flag_show=True),
+                name="person_listed_birth_md_idx",
+            ),
         ]
 
     def delete(self, *args, **kwargs):
@@ -275,7 +328,37 @@ class Person(models.Model):
             os.remove(self.thumb_profile.path)
         super(Person, self).delete(*args, **kwargs)
 
+    @staticmethod
+    def parse_birth_fields(date_of_birth):
+        """
+        ``(birth_date, birth_md)`` from a "YYYY-MM-DD ..." date_of_birth.
+        birth_md is kept even when the year is unusable, as long as the
+        month and day form a real calendar day.
+        """
+        value = (date_of_birth or "").strip()
+        if len(value) < 10 or value[4] != "-" or value[7] != "-":
+            return None, None
+        try:
+            month, day = int(value[5:7]), int(value[8:10])
+            # 2000 is a leap year, so 29 February is accepted
+            date(2000, month, day)
+        except ValueError:
+            return None, None
+        try:
+            birth_date = date(int(value[:4]), month, day)
+        except ValueError:
+            birth_date = None
+        return birth_date, month * 100 + day
+
+    def set_birth_fields(self):
+        self.birth_date, self.birth_md = self.parse_birth_fields(self.date_of_birth)
+
     def save(self, *args, **kwargs):
+        self.set_birth_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "date_of_birth" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "birth_date", "birth_md"}
+
         # Handle soft delete timestamp
         if self.is_deleted == True:
             self.deleted_at = datetime.now()
@@ -377,6 +460,143 @@ class Person(models.Model):
 #         super(Person, self).save(*args, **kwargs)
 
 
+class PersonMobile(models.Model):
+    """
+    Normalized mobile number -> person lookup (one row per number of an
+    active person). Lets the X-Mobile-Number header resolve with one indexed
+    equality instead of an OR over mobile_number1/mobile_number2.
+    """
+    person = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="mobile_links"
+    )
+    mobile = models.CharField(max_length=20)
+    is_demo = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.mobile} -> {self.person_id}"
+
+    class Meta:
+        unique_together = ("person", "mobile")
+        indexes = [
+            models.Index(fields=["mobile", "is_demo"]),
+        ]
+
+
+class PersonSearchDocument(models.Model):
+    """
+    Denormalized, lower-cased search text of one person (English and
+    Gujarati names, surname, digits-only mobiles, date of birth).
+
+    ``document`` carries a pg_trgm GIN index so substring and fuzzy matches
+    do not scan Person; ``is_listed`` is false for hidden, deleted and
+    surname top-member rows. Maintained by PersonSearchService.
+    """
+    person = models.OneToOneField(
+        Person, on_delete=models.CASCADE, primary_key=True, related_name="search_document"
+    )
+    samaj = models.ForeignKey(
+        Samaj, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    is_demo = models.BooleanField(default=False)
+    is_listed = models.BooleanField(default=False)
+    name_key = models.CharField(max_length=100, blank=True, default="")
+    guj_name_key = models.CharField(max_length=500, blank=True, default="")
+    document = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.person_id} - {self.name_key}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["samaj", "is_demo", "is_listed"]),
+            GinIndex(
+                fields=["document"],
+                name="person_search_doc_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
+
+class SurnameMember(models.Model):
+    """
+    One person as the v4 person-by-surname list sees it: the scope it is
+    listed in (surname, samaj, demo flag), whether it is a top member of
+    that scope (the configured Surname.top_member or a root of the scope's
+    relation graph), whether it has a mobile number and its preferred
+    Gujarati names. Maintained by SurnameMemberService.
+    """
+    person = models.OneToOneField(
+        Person, on_delete=models.CASCADE, primary_key=True, related_name="surname_member"
+    )
+    surname = models.ForeignKey(
+        Surname, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    samaj = models.ForeignKey(
+        Samaj, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    is_demo = models.BooleanField(default=False)
+    is_listed = models.BooleanField(default=False)
+    is_top_member = models.BooleanField(default=False)
+    has_mobile = models.BooleanField(default=False)
+    guj_first_name = models.CharField(max_length=500, blank=True, null=True)
+    guj_middle_name = models.CharField(max_length=500, blank=True, null=True)
+    # Display-name sort keys ("first middle") per language, ICU-collated
+    sort_name = models.TextField(blank=True, default="", db_collation=COLLATION_EN)
+    guj_sort_name = models.TextField(blank=True, default="", db_collation=COLLATION_GUJ)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.person_id} - {self.surname_id}"
+
+    @staticmethod
+    def sort_field(lang):
+        return "guj_sort_name" if lang == "guj" else "sort_name"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["surname", "is_demo", "sort_name"],
+                condition=models.Q(is_listed=True, is_top_member=False),
+                name="surname_member_pick_idx",
+            ),
+            models.Index(
+                fields=["surname", "is_demo", "guj_sort_name"],
+                condition=models.Q(is_listed=True, is_top_member=False),
+                name="surname_member_guj_pick_idx",
+            ),
+        ]
+
+
+class PendingApproval(models.Model):
+    """
+    Approval queue: one row per person waiting for an admin (flag_show off,
+    not deleted) with its (samaj, surname, demo flag) scope, in the order
+    it entered the queue. Maintained by PendingApprovalService.
+    """
+    person = models.OneToOneField(
+        Person, on_delete=models.CASCADE, primary_key=True, related_name="pending_approval"
+    )
+    surname = models.ForeignKey(
+        Surname, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    samaj = models.ForeignKey(
+        Samaj, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    is_demo = models.BooleanField(default=False)
+    child_flag = models.BooleanField(default=False)
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.person_id} - {self.samaj_id} - {self.surname_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_demo", "queued_at", "person"], name="pending_approval_queue_idx"),
+            models.Index(fields=["samaj", "surname", "is_demo"], name="pending_approval_scope_idx"),
+        ]
+
+
 class TranslatePerson(models.Model):
     person_id = models.ForeignKey(
         Person, on_delete=models.CASCADE, blank=True, null=True, related_name="translateperson"
@@ -437,6 +657,31 @@ class ParentChildRelation(models.Model):
         ]
 
 
+class ParentChildClosure(models.Model):
+    """
+    Transitive closure of active ParentChildRelation rows: one row per
+    (ancestor, descendant) pair with the number of generations between them.
+    Maintained by LineageService from parivar.signals.
+    """
+    ancestor = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="descendant_links"
+    )
+    descendant = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="ancestor_links"
+    )
+    depth = models.PositiveIntegerField()
+    is_demo = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    class Meta:
+        unique_together = ("ancestor", "descendant", "is_demo")
+        indexes = [
+            models.Index(fields=["descendant", "depth"]),
+        ]
+
+
 class AdsSetting(models.Model):
     app_title = models.CharField(max_length=200)
     samaj = models.ManyToManyField(
@@ -500,3 +745,83 @@ class PersonUpdateLog(models.Model):
     is_deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
  
+
+
+class FamilyTreeSnapshot(models.Model):
+    """
+    Materialized family tree for one (surname, lang, is_demo) combination.
+
+    ``nodes`` maps person id -> pre-rendered node, ``edges`` maps relation
+    id -> [parent_id, child_id]. Kept up to date by parivar.signals through
+    FamilyTreeSnapshotService so the relation API is served from one row.
+    """
+    surname = models.ForeignKey(
+        Surname, on_delete=models.CASCADE, related_name="tree_snapshots"
+    )
+    lang = models.CharField(max_length=10, default="en")
+    is_demo = models.BooleanField(default=False)
+    top_member = models.IntegerField(null=True, blank=True)
+    nodes = models.JSONField(default=dict)
+    edges = models.JSONField(default=dict)
+    version = models.PositiveIntegerField(default=0)
+    is_stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.surname_id} - {self.lang} - v{self.version}"
+
+    class Meta:
+        unique_together = ("surname", "lang", "is_demo")
+        indexes = [
+            models.Index(fields=["is_stale"]),
+            # Serve the ?/?| key probes of FamilyTreeSnapshotService
+            GinIndex(fields=["nodes"], name="tree_snapshot_nodes_gin"),
+            GinIndex(fields=["edges"], name="tree_snapshot_edges_gin"),
+        ]
+
+
+class ImportJob(models.Model):
+    """
+    Background CSV/XLSX member import started from api/v4/upload-csv.
+
+    ``checkpoint`` records the sheet/row after the last committed chunk plus
+    the pending 'Name of Father' links, so a restarted worker resumes there.
+    """
+    STATE_PENDING = "pending"
+    STATE_RUNNING = "running"
+    STATE_COMPLETED = "completed"
+    STATE_FAILED = "failed"
+    STATE_CHOICES = (
+        (STATE_PENDING, "Pending"),
+        (STATE_RUNNING, "Running"),
+        (STATE_COMPLETED, "Completed"),
+        (STATE_FAILED, "Failed"),
+    )
+
+    file = models.FileField(upload_to="uploads/original/", max_length=512)
+    original_filename = models.CharField(max_length=255)
+    is_demo = models.BooleanField(default=False)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_PENDING)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    bug_count = models.PositiveIntegerField(default=0)
+    bug_file = models.CharField(max_length=512, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    stats = models.JSONField(default=dict, blank=True)
+    checkpoint = models.JSONField(default=dict, blank=True)
+    created_by = models.ForeignKey(
+        Person, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.original_filename} - {self.state}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state"]),
+        ]
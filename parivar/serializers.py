@@ -6,6 +6,49 @@ import re
 import ast
 from datetime import datetime, date
 from concurrent.futures import ThreadPoolExecutor
+from django.db.models.manager import BaseManager
+from .utils import load_guj_translations
+
+
+class GujTranslationMixin:
+    """
+    Looks up a person's guj TranslatePerson without a query per object.
+
+    Uses the ``guj_translations`` list added by prefetch_guj_translations()
+    when present; otherwise loads the translations of every instance of the
+    enclosing ``many=True`` serializer in one query and reuses them.
+    """
+
+    def get_guj_translation(self, obj):
+        prefetched = getattr(obj, "guj_translations", None)
+        if prefetched is not None:
+            return prefetched[0] if prefetched else None
+
+        owner = self.parent if isinstance(self.parent, serializers.ListSerializer) else self
+        loaded = owner.__dict__.setdefault("_guj_translations", {})
+        if obj.id not in loaded:
+            person_ids = {obj.id}
+            if owner is not self and owner.instance is not None:
+                instances = owner.instance
+                if isinstance(instances, BaseManager):
+                    instances = instances.all()
+                person_ids.update(getattr(item, "id", None) for item in instances)
+                person_ids.discard(None)
+            loaded.update(load_guj_translations(person_ids - set(loaded)))
+        return loaded.get(obj.id)
+
+    def get_trans_first_name(self, obj):
+        translate_data = self.get_guj_translation(obj)
+        if translate_data and translate_data.first_name:
+            return translate_data.first_name
+        return obj.guj_first_name if hasattr(obj, 'guj_first_name') and obj.guj_first_name else obj.first_name
+
+    def get_trans_middle_name(self, obj):
+        translate_data = self.get_guj_translation(obj)
+        if translate_data and translate_data.middle_name:
+            return translate_data.middle_name
+        return obj.guj_middle_name if hasattr(obj, 'guj_middle_name') and obj.guj_middle_name else obj.middle_name
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -173,7 +216,7 @@ class SamajSerializer(serializers.ModelSerializer):
 
 
 
-class PersonV4Serializer(serializers.ModelSerializer):
+class PersonV4Serializer(GujTranslationMixin, serializers.ModelSerializer):
     surname = serializers.SerializerMethodField(source='surname.name', read_only=True)
     village_name = serializers.SerializerMethodField(source='samaj.village.name', read_only=True)
     taluka_name = serializers.SerializerMethodField()
@@ -219,6 +262,7 @@ class PersonV4Serializer(serializers.ModelSerializer):
             "village_name",
             "profile",
             "thumb_profile",
+            "thumb_status",
             "status",
             "flag_show",
             "is_admin",
@@ -242,6 +286,7 @@ class PersonV4Serializer(serializers.ModelSerializer):
             "trans_middle_name",
             "is_demo",
         ]
+        read_only_fields = ["thumb_status"]
 
     def get_surname(self, obj):
         lang = self.context.get("lang", "en")
@@ -311,22 +356,6 @@ class PersonV4Serializer(serializers.ModelSerializer):
             return obj.out_of_country.name
         return ""
 
-    def get_trans_first_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.first_name:
-            return translate_data.first_name
-        return obj.guj_first_name if hasattr(obj, 'guj_first_name') and obj.guj_first_name else obj.first_name
-
-    def get_trans_middle_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.middle_name:
-            return translate_data.middle_name
-        return obj.guj_middle_name if hasattr(obj, 'guj_middle_name') and obj.guj_middle_name else obj.middle_name
-
     def get_relations(self, obj):
         # is_demo = self.context.get("is_demo", False)
         # if is_demo:
@@ -481,9 +510,7 @@ class PersonV4Serializer(serializers.ModelSerializer):
                 data["address"] = source_instance.address
                 data["out_of_address"] = source_instance.out_of_address
             else:
-                translate_data = TranslatePerson.objects.filter(
-                    person_id=source_instance.id, language="guj", is_deleted=False
-                ).first()
+                translate_data = self.get_guj_translation(source_instance)
                 if translate_data:
                     data["first_name"] = translate_data.first_name or source_instance.first_name
                     data["middle_name"] = translate_data.middle_name or source_instance.middle_name
@@ -527,7 +554,7 @@ class CountrySummarySerializer(serializers.Serializer):
 
 # new serializer added ended. 
 
-class PersonSerializer(serializers.ModelSerializer):
+class PersonSerializer(GujTranslationMixin, serializers.ModelSerializer):
     class Meta:
         model = Person
         fields = [
@@ -569,22 +596,6 @@ class PersonSerializer(serializers.ModelSerializer):
     taluka = serializers.SerializerMethodField(read_only=True, required=False)
     village = serializers.SerializerMethodField(read_only=True, required=False)
 
-    def get_trans_first_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.first_name:
-            return translate_data.first_name
-        return obj.guj_first_name if hasattr(obj, 'guj_first_name') and obj.guj_first_name else obj.first_name
-
-    def get_trans_middle_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.middle_name:
-            return translate_data.middle_name
-        return obj.guj_middle_name if hasattr(obj, 'guj_middle_name') and obj.guj_middle_name else obj.middle_name
-
     def get_surname(self, obj):
         lang = self.context.get("lang", "en")
         if obj.surname:
@@ -843,7 +854,7 @@ class PersonSerializer(serializers.ModelSerializer):
 
 #         return data
 
-class PersonSerializerV2(serializers.ModelSerializer):
+class PersonSerializerV2(GujTranslationMixin, serializers.ModelSerializer):
     class Meta:
         model = Person
         fields = [
@@ -880,22 +891,6 @@ class PersonSerializerV2(serializers.ModelSerializer):
     trans_first_name = serializers.SerializerMethodField(read_only=True, required=False)
     trans_middle_name = serializers.SerializerMethodField(read_only=True, required=False)
 
-    def get_trans_first_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.first_name:
-            return translate_data.first_name
-        return obj.guj_first_name if hasattr(obj, 'guj_first_name') and obj.guj_first_name else obj.first_name
-
-    def get_trans_middle_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.middle_name:
-            return translate_data.middle_name
-        return obj.guj_middle_name if hasattr(obj, 'guj_middle_name') and obj.guj_middle_name else obj.middle_name
-
     def validate(self, data):
 
         first_name = data.get("first_name")
@@ -1298,7 +1293,7 @@ class CountryWiseMemberSerializer(serializers.ModelSerializer):
     def get_trans_middle_name(self, obj):
         return self.get_guj_middle_name(obj) or (obj.guj_middle_name if hasattr(obj, 'guj_middle_name') and obj.guj_middle_name else obj.middle_name)
 
-class PersonGetV4Serializer(serializers.ModelSerializer):
+class PersonGetV4Serializer(GujTranslationMixin, serializers.ModelSerializer):
 
     city = serializers.SerializerMethodField(read_only=True, required=False)
     state = serializers.SerializerMethodField(read_only=True, required=False)
@@ -1501,22 +1496,6 @@ class PersonGetV4Serializer(serializers.ModelSerializer):
             return obj.out_of_country.name
         return ""
 
-    def get_trans_first_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.first_name:
-            return translate_data.first_name
-        return obj.guj_first_name if hasattr(obj, 'guj_first_name') and obj.guj_first_name else obj.first_name
-
-    def get_trans_middle_name(self, obj):
-        translate_data = TranslatePerson.objects.filter(
-            person_id=obj.id, language="guj", is_deleted=False
-        ).first()
-        if translate_data and translate_data.middle_name:
-            return translate_data.middle_name
-        return obj.guj_middle_name if hasattr(obj, 'guj_middle_name') and obj.guj_middle_name else obj.middle_name
-
     def to_representation(self, instance):
         # Handle missing fields for DemoPerson before serialization
         if self.context.get("is_demo", False):
@@ -1541,9 +1520,7 @@ class PersonGetV4Serializer(serializers.ModelSerializer):
                  representation["middle_name"] = instance.guj_middle_name or instance.middle_name
                  # DemoPerson has no guj_address, keep default
             else:
-                translate_data = TranslatePerson.objects.filter(
-                    person_id=int(instance.id), is_deleted=False
-                ).first()
+                translate_data = self.get_guj_translation(instance)
                 if translate_data:
                     representation["first_name"] = (
                         translate_data.first_name
@@ -2086,7 +2063,8 @@ class GetTreeRelationSerializer(serializers.ModelSerializer):
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Person
-        fields = ["profile", "thumb_profile", "id"]
+        fields = ["profile", "thumb_profile", "thumb_status", "id"]
+        read_only_fields = ["thumb_status"]
 
 class ChildPersonSerializer(serializers.ModelSerializer):
     profile = serializers.SerializerMethodField(read_only=True, required=False)
@@ -2382,3 +2360,42 @@ class V4RelationTreeSerializer(serializers.ModelSerializer):
     class Meta:
         model = ParentChildRelation
         fields = ["id", "parent", "child"]
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField(read_only=True)
+    bug_file_url = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id",
+            "original_filename",
+            "state",
+            "total_rows",
+            "rows_processed",
+            "progress",
+            "created_count",
+            "updated_count",
+            "bug_count",
+            "bug_file_url",
+            "error",
+            "stats",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        ]
+
+    def get_progress(self, obj):
+        if obj.state == ImportJob.STATE_COMPLETED:
+            return 100
+        if not obj.total_rows:
+            return 0
+        return min(99, int(obj.rows_processed * 100 / obj.total_rows))
+
+    def get_bug_file_url(self, obj):
+        if not obj.bug_file:
+            return None
+        url = settings.MEDIA_URL + obj.bug_file
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
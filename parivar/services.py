@@ -1,8 +1,18 @@
 import csv
 import io
+import logging
 import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain, islice
+
 import openpyxl
 from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, Q
 from django.core.files.storage import FileSystemStorage
 from django.utils import timezone
 from django.core.files.base import ContentFile
@@ -16,7 +26,63 @@ from .models import (
     ParentChildRelation,
     Samaj,
     TranslatePerson,
+    FamilyTreeSnapshot,
+    ParentChildClosure,
+    PersonMobile,
+    PersonSearchDocument,
+    SurnameMember,
+    PendingApproval,
+    PersonUpdateLog,
+    ImportJob,
 )
+from .constants import LANGUAGE_CHOICES
+from notifications.models import PersonPlayerId
+from notifications.services import AudienceService
+
+logger = logging.getLogger(__name__)
+
+class ImportStats:
+    """Rows handled and wall time spent per stage of a bulk import."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def _add(self, name, rows, seconds):
+        stage = self.stages.setdefault(name, {"rows": 0, "seconds": 0.0})
+        stage["rows"] += rows
+        stage["seconds"] += seconds
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, rows, time.perf_counter() - start)
+
+    def timed(self, rows, name):
+        """Yield from ``rows``, charging the time spent producing each one to ``name``."""
+        iterator = iter(rows)
+        while True:
+            start = time.perf_counter()
+            try:
+                row = next(iterator)
+            except StopIteration:
+                self._add(name, 0, time.perf_counter() - start)
+                return
+            self._add(name, 1, time.perf_counter() - start)
+            yield row
+
+    def as_dict(self):
+        return {
+            name: {
+                "rows": stage["rows"],
+                "seconds": round(stage["seconds"], 3),
+                "rows_per_second": round(stage["rows"] / stage["seconds"]) if stage["seconds"] else None,
+            }
+            for name, stage in self.stages.items()
+        }
+
 
 class LocationResolverService:
     @staticmethod
@@ -173,427 +239,1984 @@ class CSVImportService:
         new_surname = Surname.objects.create(name=name, samaj=samaj)
         return new_surname, "created"
 
+    # Rows per Person upsert statement
+    PERSON_BATCH_SIZE = 500
+    # Columns written when an imported row lands on an existing person
+    PERSON_UPSERT_FIELDS = [
+        "first_name",
+        "middle_name",
+        "guj_first_name",
+        "guj_middle_name",
+        "surname",
+        "date_of_birth",
+        "birth_date",
+        "birth_md",
+        "mobile_number1",
+        "mobile_number2",
+        "is_out_of_country",
+        "out_of_country",
+        "international_mobile_number",
+        "samaj",
+        "flag_show",
+        "is_demo",
+        "profile",
+        "thumb_profile",
+    ]
+    COLUMN_KEYWORDS = {
+        'first_name': ['Firstname (In English)', 'Firstname', 'First name', 'In English', 'In emglish', 'In rmglish'],
+        'guj_first_name': ['Firstname (In Gujarati)', 'In Gujarati', 'In Gujaratio', 'In Gujaration', 'In Gujaral', 'In Gujaralt', 'In Gujarai'],
+        # 'Name of Father' deliberately removed here — it belongs to link_father, not middle_name
+        'middle_name': ['Father name (In English)', 'Father name', 'In English', 'In emglish', 'In rmglish'],
+        'guj_middle_name': ['Father name (In Gujarati)', 'Father name Gujarati', 'In Gujarati', 'In Gujaratio', 'In Gujaration', 'In Gujaral', 'In Gujaralt', 'In Gujarai'],
+        'surname': ['Surname', 'Sirname'],
+        'mobile1': ['Mobile Number Main', 'Main', 'Mobile'],
+        'mobile2': ['Mobile Number (Optional)', 'Secondary', 'Optional'],
+        'dob': ['Birth Date', 'Birt Date', 'DOB'],
+        'country': ['Country Name', 'Outside India', 'Country'],
+        'int_mobile': ['International Mobile', 'International'],
+        'profile': ['Profile', 'Profile Pic', 'Image'],
+        'thumb_profile': ['Thumb profile', 'Thumb', 'Thumbnail'],
+        'link_father': ['Name of Father'],
+        'link_son': ['Name of Son'],
+    }
+
     @classmethod
     def process_file(cls, uploaded_file, request=None, is_demo=False):
         """
         Core logic for processing CSV/XLSX files.
         Mirrored from DemoCSVUploadAPIView with added surname policy.
         """
-        # Always reset class-level link_map to avoid cross-request pollution
-        cls._link_map = {}
-        # 1. Save original file
-        fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, 'uploads', 'original'))
-        filename = fs.save(uploaded_file.name, uploaded_file)
-        
-        # Rewind file for processing
-        uploaded_file.seek(0)
-        
-        ext = uploaded_file.name.lower().split('.')[-1]
-        all_sheets_data = {}
+        # Row-by-row snapshot patching is wasteful here; rebuild touched trees lazily.
+        with FamilyTreeSnapshotService.deferred():
+            return cls._process_file(uploaded_file, request=request, is_demo=is_demo)
 
-        # 2. Extract Data
-        if ext in ['xlsx', 'xls']:
-            try:
-                wb = openpyxl.load_workbook(uploaded_file, data_only=True)
-                for sheet_name in wb.sheetnames:
-                    sheet = wb[sheet_name]
-                    rows = []
-                    for row in sheet.iter_rows(values_only=True):
-                        rows.append(list(row))
-                    all_sheets_data[sheet_name] = rows
-            except Exception as e:
-                return {"error": f"Failed to read XLSX: {str(e)}"}
+    @classmethod
+    def detect_columns(cls, rows):
+        """
+        Smart header detection over the first rows of a person sheet.
+        Returns (header_row_idx, col_map); header_row_idx is -1 if not found.
+        """
+        col_map = {}
+        header_row_idx = -1
+        for i in range(min(10, len(rows))):
+            row = rows[i]
+            row_str = " ".join([str(c).strip() if c else "" for c in row]).lower()
+            if any(x in row_str for x in ['firstname', 'surname', 'mobile']):
+                header_row_idx = i
+                current_parent = ""
+                for j, cell in enumerate(row):
+                    cell_val = str(cell).strip() if cell else ""
+                    if cell_val:
+                        current_parent = cell_val
+
+                    next_cell_val = ""
+                    if i + 1 < len(rows) and j < len(rows[i+1]):
+                        next_cell_val = str(rows[i+1][j]).strip() if rows[i+1][j] else ""
+
+                    combined_col_str = f"{current_parent} {next_cell_val}".strip().lower()
+
+                    if any(k in combined_col_str for k in ['firstname', 'first name']):
+                        if any(k in combined_col_str for k in ['gujarati', 'gujrai', 'gujara', 'gujal', 'gujalt']):
+                            col_map['guj_first_name'] = j
+                        elif 'english' in combined_col_str or 'first_name' not in col_map:
+                            col_map['first_name'] = j
+                    elif any(k in combined_col_str for k in ['father', 'middle', 'parent']):
+                        # Guard: if this column is the 'Name of Father' LINK column, skip it here
+                        # The secondary keywords loop below will correctly assign it to link_father
+                        is_link_father_col = 'name of father' in combined_col_str
+                        if is_link_father_col:
+                            pass  # handled in link_father keyword below
+                        elif any(k in combined_col_str for k in ['gujarati', 'gujrai', 'gujara', 'gujal', 'gujalt']):
+                            col_map['guj_middle_name'] = j
+                        elif 'english' in combined_col_str or 'middle_name' not in col_map:
+                            col_map['middle_name'] = j
+
+                    # 2. Other Fields
+                    for key, keys in cls.COLUMN_KEYWORDS.items():
+                        if key in ['gender', 'mobile1', 'mobile2', 'dob', 'country', 'int_mobile', 'surname', 'profile', 'thumb_profile', 'link_father', 'link_son']:
+                            if any(k.lower() in combined_col_str for k in keys):
+                                if key == 'mobile1':
+                                    if "main" in combined_col_str: col_map['mobile1'] = j
+                                    elif "optional" in combined_col_str: col_map['mobile2'] = j
+                                    elif 'mobile1' not in col_map: col_map['mobile1'] = j
+                                else:
+                                    if key not in col_map:
+                                        col_map[key] = j
+                break
+        return header_row_idx, col_map
+
+    @staticmethod
+    def normalize_dob(dob_raw):
+        """DOB Normalization — always output YYYY-MM-DD 00:00:00 (or "" if unrecognized)."""
+        dob = str(dob_raw).strip() if dob_raw else ""
+        if not dob:
+            return ""
+        # Strip off any time component — we always force 00:00:00
+        if ' ' in dob:
+            dob = dob.split(' ', 1)[0]
+
+        # Replace / with -
+        parts = dob.replace('/', '-').split('-')
+        if len(parts) != 3:
+            return ""  # Unrecognized format — clear it
+
+        a, b, c = parts[0].strip(), parts[1].strip(), parts[2].strip()
+        # Determine order: YYYY-MM-DD vs DD-MM-YYYY
+        if len(a) == 4:          # YYYY-MM-DD
+            year, month, day = a, b, c
+        elif len(c) == 4:        # DD-MM-YYYY or MM-DD-YYYY
+            year, month, day = c, b, a
         else:
-            try:
-                file_data = uploaded_file.read()
-                try:
-                    decoded = file_data.decode('utf-8-sig')
-                except:
-                    decoded = file_data.decode('latin-1')
-                normalized = "\n".join(decoded.splitlines())
-                reader = csv.reader(io.StringIO(normalized))
-                rows = [row for row in reader]
-                all_sheets_data['default'] = rows
-            except Exception as e:
-                return {"error": f"Failed to read CSV: {str(e)}"}
-
-        total_created = 0
-        total_updated = 0
-        bug_rows = []
-        
-        # 3. Process Sheets
-        global_village = None
-        global_samaj = None
-        global_d_name, global_t_name, global_v_name = "", "", ""
-
-        for s_idx, (sheet_name, rows) in enumerate(all_sheets_data.items()):
-            # 3. Tab Processing Policy
-            if s_idx == 0: # 1st Tab: Dashboard
-                header_row_idx = -1
-                for i in range(min(5, len(rows))):
-                    row_str = " ".join([str(c) for c in rows[i] if c]).lower()
-                    if 'district' in row_str and 'village' in row_str:
-                        header_row_idx = i
-                        break
-                
-                if header_row_idx != -1 and len(rows) > header_row_idx + 1:
-                    data_row = rows[header_row_idx + 1]
-                    # Assuming standard layout for Dashboard: District (0), Taluka (1), Village (2), Samaj (3), RefCode (Last)
-                    global_d_name = cls.clean_val(data_row[0]) if len(data_row) > 0 else ""
-                    global_t_name = cls.clean_val(data_row[1]) if len(data_row) > 1 else ""
-                    global_v_name = cls.clean_val(data_row[2]) if len(data_row) > 2 else ""
-                    
-                    global_village, loc_status = LocationResolverService.resolve_location(global_d_name, global_t_name, global_v_name)
-                    if not global_village:
-                        return {"error": f"Dashboard Location Error: {loc_status} for {global_d_name}/{global_t_name}/{global_v_name}"}
-                    
-                    # Extract Samaj from column 3
-                    samaj_name = cls.clean_val(data_row[3]) if len(data_row) > 3 else ""
-                    if samaj_name:
-                        global_samaj = Samaj.objects.filter(name__iexact=samaj_name, village=global_village).first()
-                        if not global_samaj:
-                            global_samaj, _ = Samaj.objects.get_or_create(name=samaj_name, defaults={'village': global_village})
-                    else:
-                        # Default to 'Patel' samaj if not specified
-                        global_samaj = Samaj.objects.filter(name__iexact='Patel', village=global_village).first()
-                        if not global_samaj:
-                            global_samaj, _ = Samaj.objects.get_or_create(name='Patel', defaults={'village': global_village})
-                    
-                    # Update Referral Code (always last column)
-                    ref_code = cls.clean_val(data_row[-1]) if len(data_row) > 0 else ""
-                    if ref_code:
-                        global_village.referral_code = ref_code
-                        global_village.save()
-                continue
+            # Ambiguous short year — skip
+            return ""
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)} 00:00:00"
 
-            if s_idx == 1: # 2nd Tab: Dummy
-                continue
+    @classmethod
+    def _open_sheets(cls, uploaded_file, ext):
+        """
+        Return (sheets, workbook): ``sheets`` yields (sheet_name, row iterator)
+        lazily so only the rows being processed are held in memory.
+        """
+        if ext in ['xlsx', 'xls']:
+            wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+            return ((ws.title, ws.iter_rows(values_only=True)) for ws in wb.worksheets), wb
 
-            # 3rd Tab & Onwards: Person Data (Surname Tabs as Master)
-            if not global_village:
-                continue
-            
-            if not global_samaj:
-                bug_rows.append([f"Sheet: {sheet_name}", "Skipped: No Samaj configured for this village"])
-                continue
+        file_data = uploaded_file.read()
+        try:
+            decoded = file_data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            decoded = file_data.decode('latin-1')
+        normalized = "\n".join(decoded.splitlines())
+        return [('default', csv.reader(io.StringIO(normalized)))], None
 
-            # Master Tab Rule: Sheet name must exactly match a Surname in DB linked to this Samaj
-            sheet_surname_obj = Surname.objects.filter(
-                name__iexact=sheet_name.strip(),
-                samaj=global_samaj
-            ).first()
-            
-            if not sheet_surname_obj:
-                # If not found, create new surname linked to this samaj
-                sheet_surname_obj, status_msg = cls.resolve_surname(sheet_name, samaj=global_samaj)
-            
-            if not sheet_surname_obj:
-                bug_rows.append([f"Sheet: {sheet_name}", "Skipped: Could not resolve or create Surname for Samaj: {global_samaj.name}"])
-                continue
+    @classmethod
+    def _read_dashboard(cls, rows):
+        """
+        1st Tab: Dashboard. Returns (village, samaj, error).
+        Assuming standard layout: District (0), Taluka (1), Village (2), Samaj (3), RefCode (Last)
+        """
+        rows = [list(row) for row in islice(rows, 6)]
+        header_row_idx = -1
+        for i in range(min(5, len(rows))):
+            row_str = " ".join([str(c) for c in rows[i] if c]).lower()
+            if 'district' in row_str and 'village' in row_str:
+                header_row_idx = i
+                break
 
-            col_map = {}
-            keywords = {
-                'first_name': ['Firstname (In English)', 'Firstname', 'First name', 'In English', 'In emglish', 'In rmglish'],
-                'guj_first_name': ['Firstname (In Gujarati)', 'In Gujarati', 'In Gujaratio', 'In Gujaration', 'In Gujaral', 'In Gujaralt', 'In Gujarai'],
-                # 'Name of Father' deliberately removed here — it belongs to link_father, not middle_name
-                'middle_name': ['Father name (In English)', 'Father name', 'In English', 'In emglish', 'In rmglish'],
-                'guj_middle_name': ['Father name (In Gujarati)', 'Father name Gujarati', 'In Gujarati', 'In Gujaratio', 'In Gujaration', 'In Gujaral', 'In Gujaralt', 'In Gujarai'],
-                'surname': ['Surname', 'Sirname'],
-                'mobile1': ['Mobile Number Main', 'Main', 'Mobile'],
-                'mobile2': ['Mobile Number (Optional)', 'Secondary', 'Optional'],
-                'dob': ['Birth Date', 'Birt Date', 'DOB'],
-                'country': ['Country Name', 'Outside India', 'Country'],
-                'int_mobile': ['International Mobile', 'International'],
-                'profile': ['Profile', 'Profile Pic', 'Image'],
-                'thumb_profile': ['Thumb profile', 'Thumb', 'Thumbnail'],
-                'link_father': ['Name of Father'],
-                'link_son': ['Name of Son'],
-            }
+        if header_row_idx == -1 or len(rows) <= header_row_idx + 1:
+            return None, None, None
 
-            # Smart Header Detection
-            header_row_idx = -1
-            for i in range(min(10, len(rows))):
-                row = rows[i]
-                row_str = " ".join([str(c).strip() if c else "" for c in row]).lower()
-                if any(x in row_str for x in ['firstname', 'surname', 'mobile']):
-                    header_row_idx = i
-                    current_parent = ""
-                    for j, cell in enumerate(row):
-                        cell_val = str(cell).strip() if cell else ""
-                        if cell_val:
-                            current_parent = cell_val
-                        
-                        next_cell_val = ""
-                        if i + 1 < len(rows) and j < len(rows[i+1]):
-                            next_cell_val = str(rows[i+1][j]).strip() if rows[i+1][j] else ""
-                        
-                        combined_col_str = f"{current_parent} {next_cell_val}".strip().lower()
-
-                        if any(k in combined_col_str for k in ['firstname', 'first name']):
-                            if any(k in combined_col_str for k in ['gujarati', 'gujrai', 'gujara', 'gujal', 'gujalt']):
-                                col_map['guj_first_name'] = j
-                            elif 'english' in combined_col_str or 'first_name' not in col_map:
-                                col_map['first_name'] = j
-                        elif any(k in combined_col_str for k in ['father', 'middle', 'parent']):
-                            # Guard: if this column is the 'Name of Father' LINK column, skip it here
-                            # The secondary keywords loop below will correctly assign it to link_father
-                            is_link_father_col = 'name of father' in combined_col_str
-                            if is_link_father_col:
-                                pass  # handled in link_father keyword below
-                            elif any(k in combined_col_str for k in ['gujarati', 'gujrai', 'gujara', 'gujal', 'gujalt']):
-                                col_map['guj_middle_name'] = j
-                            elif 'english' in combined_col_str or 'middle_name' not in col_map:
-                                col_map['middle_name'] = j
-                        
-                        # 2. Other Fields
-                        for key, keys in keywords.items():
-                            if key in ['gender', 'mobile1', 'mobile2', 'dob', 'country', 'int_mobile', 'surname', 'profile', 'thumb_profile', 'link_father', 'link_son']:
-                                if any(k.lower() in combined_col_str for k in keys):
-                                    if key == 'mobile1':
-                                        if "main" in combined_col_str: col_map['mobile1'] = j
-                                        elif "optional" in combined_col_str: col_map['mobile2'] = j
-                                        elif 'mobile1' not in col_map: col_map['mobile1'] = j
-                                    else:
-                                        if key not in col_map:
-                                           if any(k.lower() in combined_col_str for k in keys):
-                                            col_map[key] = j
-                    break
-            print(col_map)
-
-            if header_row_idx == -1:
-                continue
+        data_row = rows[header_row_idx + 1]
+        d_name = cls.clean_val(data_row[0]) if len(data_row) > 0 else ""
+        t_name = cls.clean_val(data_row[1]) if len(data_row) > 1 else ""
+        v_name = cls.clean_val(data_row[2]) if len(data_row) > 2 else ""
 
-            start_row = header_row_idx + 1
-            if start_row < len(rows):
-                sub_row_str = " ".join([str(x) for x in rows[start_row]]).lower()
-                if any(x in sub_row_str for x in ["english", "gujarati", "main", "optional"]):
-                    start_row += 1
+        village, loc_status = LocationResolverService.resolve_location(d_name, t_name, v_name)
+        if not village:
+            return None, None, f"Dashboard Location Error: {loc_status} for {d_name}/{t_name}/{v_name}"
 
-            for idx, row in enumerate(rows[start_row:]):
-                if not any(row): continue
-                
-                try:
-                    # Person Data Extraction
-                    f_name = cls.clean_val(row[col_map['first_name']]) if 'first_name' in col_map else ""
-                    m_name = cls.clean_val(row[col_map['middle_name']]) if 'middle_name' in col_map else ""
-                    guj_f_name = cls.clean_val(row[col_map['guj_first_name']]) if 'guj_first_name' in col_map else ""
-                    guj_m_name = cls.clean_val(row[col_map['guj_middle_name']]) if 'guj_middle_name' in col_map else ""
-                    s_name = cls.clean_val(row[col_map['surname']]) if 'surname' in col_map else ""
-                    mob1 = cls.clean_val(row[col_map['mobile1']]) if 'mobile1' in col_map else ""
-                    mob2 = cls.clean_val(row[col_map['mobile2']]) if 'mobile2' in col_map else ""
-                    dob_raw = cls.clean_val(row[col_map['dob']]) if 'dob' in col_map else ""
-                    country_name = cls.clean_val(row[col_map['country']]) if 'country' in col_map else ""
-                    int_mob = cls.clean_val(row[col_map['int_mobile']]) if 'int_mobile' in col_map else ""
-                    profile_path = cls.clean_val(row[col_map['profile']]) if 'profile' in col_map else ""
-                    thumb_profile_path = cls.clean_val(row[col_map['thumb_profile']]) if 'thumb_profile' in col_map else ""
-                    link_father_name = cls.clean_val(row[col_map['link_father']]) if 'link_father' in col_map and col_map['link_father'] < len(row) else ""
-                    
-                    # 1. Empty Row Check: Skip silently if the row has absolutely no data
-                    # This avoids false "Surname Mismatch" bugs for blank rows.
-                    if not any([f_name, m_name, guj_f_name, guj_m_name, s_name, mob1, mob2, dob_raw, country_name, int_mob]):
-                        continue
+        # Extract Samaj from column 3, default to 'Patel' samaj if not specified
+        samaj_name = (cls.clean_val(data_row[3]) if len(data_row) > 3 else "") or 'Patel'
+        samaj = Samaj.objects.filter(name__iexact=samaj_name, village=village).first()
+        if not samaj:
+            samaj, _ = Samaj.objects.get_or_create(name=samaj_name, defaults={'village': village})
 
-                    # 2. Strict Surname Mismatch: Check if row data belongs in this Master Tab
-                    # Rows with data but a different surname are logged to the bug file.
-                    if s_name.strip().lower() != sheet_name.strip().lower():
-                        bug_rows.append(list(row) + [f"Surname mismatch: Sheet is '{sheet_name}', but row says '{s_name}'"])
-                        continue
+        # Update Referral Code (always last column)
+        ref_code = cls.clean_val(data_row[-1]) if len(data_row) > 0 else ""
+        if ref_code:
+            village.referral_code = ref_code
+            village.save()
+        return village, samaj, None
 
-                    # 3. Proceed with record creation/update (Partial data is allowed if identifying info exists)
-                    surname_obj = sheet_surname_obj
-
-                    # DOB Normalization — always output YYYY-MM-DD 00:00:00
-                    dob = str(dob_raw).strip() if dob_raw else ""
-                    if dob:
-                        # Strip off any time component — we always force 00:00:00
-                        if ' ' in dob:
-                            dob = dob.split(' ', 1)[0]
-
-                        # Replace / with -
-                        dob = dob.replace('/', '-')
-
-                        parts = dob.split('-')
-                        if len(parts) == 3:
-                            a, b, c = parts[0].strip(), parts[1].strip(), parts[2].strip()
-                            # Determine order: YYYY-MM-DD vs DD-MM-YYYY
-                            if len(a) == 4:          # YYYY-MM-DD
-                                year, month, day = a, b, c
-                            elif len(c) == 4:        # DD-MM-YYYY or MM-DD-YYYY
-                                year, month, day = c, b, a
-                            else:
-                                # Ambiguous short year — skip
-                                dob = ""
-                                year, month, day = None, None, None
-
-                            if year:
-                                # Zero-pad month and day
-                                month = month.zfill(2)
-                                day = day.zfill(2)
-                                dob = f"{year}-{month}-{day} 00:00:00"
-                        else:
-                            dob = ""  # Unrecognized format — clear it
-
-                    # Country Handling
-                    c_name = country_name if country_name else "India"
-                    country_obj, _ = Country.objects.get_or_create(name=c_name)
-                    is_out = country_obj.name.lower() != 'india'
-
-                    person_defaults = {
-                        'first_name': f_name,
-                        'middle_name': m_name,
-                        'guj_first_name': guj_f_name,
-                        'guj_middle_name': guj_m_name,
-                        'surname': surname_obj,
-                        'date_of_birth': dob,
-                        'mobile_number2': mob2,
-                        'is_out_of_country': is_out,
-                        'out_of_country': country_obj,
-                        'international_mobile_number': int_mob,
-                        'samaj': global_samaj,
-                        'flag_show': True,
-                        'is_demo': is_demo
-                    }
-
-                    # Handle profile image path
-                    if profile_path:
-                        profile_value, profile_error = cls.resolve_image_path(profile_path, 'profile')
-                        if profile_value:
-                            person_defaults['profile'] = profile_value
-
-                    # Handle thumbnail profile image path
-                    if thumb_profile_path:
-                        thumb_value, thumb_error = cls.resolve_image_path(thumb_profile_path, 'thumb_profile')
-                        if thumb_value:
-                            person_defaults['thumb_profile'] = thumb_value
-                    
-                    if mob1:
-                        # Update or create if mobile is present
-                        # Include surname in lookup to allow same mobile across different surnames/samaj
-                        person, created = Person.objects.update_or_create(
-                            mobile_number1=mob1, 
-                            surname=surname_obj,
-                            is_demo=is_demo, 
-                            is_deleted=False, 
-                            defaults=person_defaults
-                        )
-                    else:
-                        # Create new if no mobile - always create fresh record
-                        person_defaults['mobile_number1'] = mob1
-                        person = Person.objects.create(**person_defaults)
-                        created = True
+    @staticmethod
+    def _existing_by_mobile(surname, is_demo):
+        """mobile_number1 -> [(id, profile, thumb_profile)] of live persons of ``surname``."""
+        existing = defaultdict(list)
+        rows = (
+            Person.objects.filter(surname=surname, is_demo=is_demo, is_deleted=False)
+            .exclude(mobile_number1__isnull=True)
+            .exclude(mobile_number1="")
+            .values_list("id", "mobile_number1", "profile", "thumb_profile")
+        )
+        for pk, mobile, profile, thumb_profile in rows:
+            existing[mobile].append((pk, profile, thumb_profile))
+        return existing
+
+    @classmethod
+    def _sync_gujarati_translations(cls, entries):
+        """Batch form of upsert_gujarati_translation for (person, guj_first, guj_middle) entries."""
+        wanted = {}
+        for person, guj_first_name, guj_middle_name in entries:
+            first_name = (guj_first_name or "").strip()
+            middle_name = (guj_middle_name or "").strip()
+            if first_name or middle_name:
+                wanted[person.id] = (person, first_name, middle_name)
+        if not wanted:
+            return 0
+
+        existing = {}
+        for translation in TranslatePerson.objects.filter(
+            person_id__in=list(wanted), language="guj", is_deleted=False
+        ).order_by("id"):
+            existing.setdefault(translation.person_id_id, translation)
+
+        to_update, to_create = [], []
+        for person_id, (person, first_name, middle_name) in wanted.items():
+            translation = existing.get(person_id)
+            if translation:
+                translation.first_name = first_name or (translation.first_name or "")
+                translation.middle_name = middle_name or (translation.middle_name or "")
+                to_update.append(translation)
+            else:
+                to_create.append(
+                    TranslatePerson(
+                        person_id=person,
+                        first_name=first_name,
+                        middle_name=middle_name,
+                        address=person.address or "",
+                        out_of_address=person.out_of_address or "",
+                        language="guj",
+                        is_deleted=False,
+                    )
+                )
+        TranslatePerson.objects.bulk_update(to_update, ["first_name", "middle_name"])
+        TranslatePerson.objects.bulk_create(to_create)
+        return len(wanted)
+
+    @classmethod
+    def _flush_persons(cls, pending, bug_rows, stats):
+        """
+        Upsert one batch of parsed rows. ``pending`` holds dicts with the
+        source row, the unsaved Person (pk set when it already exists) and
+        its Gujarati names. Returns the entries that were saved.
+        """
+        if not pending:
+            return []
 
-                    # Keep Gujarati name fields synced in TranslatePerson (language='guj')
-                    cls.upsert_gujarati_translation(person, guj_f_name, guj_m_name)
+        # bulk_create bypasses Person.save()
+        for entry in pending:
+            entry["person"].set_birth_fields()
 
-                    if created: total_created += 1
-                    else: total_updated += 1
+        with stats.stage("persons", rows=len(pending)):
+            try:
+                with transaction.atomic():
+                    Person.objects.bulk_create(
+                        [entry["person"] for entry in pending],
+                        update_conflicts=True,
+                        unique_fields=["id"],
+                        update_fields=cls.PERSON_UPSERT_FIELDS,
+                    )
+                saved = pending
+            except IntegrityError:
+                # One bad row must not sink the batch: retry row by row so
+                # the offending rows end up in the bug file.
+                saved = []
+                for entry in pending:
+                    person = entry["person"]
+                    try:
+                        with transaction.atomic():
+                            if entry["created"]:
+                                person.pk = None
+                                person.save()
+                            else:
+                                person.save(update_fields=cls.PERSON_UPSERT_FIELDS)
+                        saved.append(entry)
+                    except Exception as e:
+                        bug_rows.append(list(entry["row"]) + [str(e)])
 
-                    # Store the link for relation-building phase
-                    if link_father_name:
-                        if not hasattr(cls, '_link_map'):
-                            cls._link_map = {}
-                        cls._link_map[person.id] = link_father_name.strip()
+        with stats.stage("translations", rows=len(saved)):
+            cls._sync_gujarati_translations(
+                [(entry["person"], entry["guj_first_name"], entry["guj_middle_name"]) for entry in saved]
+            )
 
-                except Exception as e:
-                    bug_rows.append(list(row) + [str(e)])
+        # bulk_create skips signals, so refresh the derived lookups explicitly
+        with stats.stage("lookups", rows=len(saved)):
+            persons = [entry["person"] for entry in saved]
+            LoginPersonService.sync_persons(persons)
+            PersonSearchService.refresh([person.id for person in persons])
+            SurnameMemberService.refresh([person.id for person in persons])
+            PendingApprovalService.sync([person.id for person in persons])
+            AudienceService.refresh_persons([person.id for person in persons])
+        return saved
 
-        # 4. Process Relations using 'Name of Father' link column
-        # Priority: use link_map (full name match) if available, else fallback to middle_name match
+    @classmethod
+    def _link_fathers(cls, link_map, samaj, is_demo, stats):
+        """
+        Create father -> child relations from the 'Name of Father' column.
+        ``link_map`` is {child_id: (father full name, child surname_id)}; fathers
+        are only looked up among persons of the sheet's samaj.
+        """
         system_admin = Person.objects.filter(is_super_admin=True, is_demo=is_demo, is_deleted=False).first()
         if not system_admin:
             system_admin = Person.objects.filter(is_admin=True, is_demo=is_demo, is_deleted=False).first()
         if not system_admin:
             system_admin = Person.objects.filter(is_demo=is_demo, is_deleted=False).first()
+        if not system_admin or not link_map:
+            return 0
 
-        if system_admin:
-            person_query = Person.objects.filter(is_demo=is_demo, is_deleted=False)
-            all_persons = list(person_query.select_related('surname'))
-
-            # Build full-name lookup: "firstname middlename" → person
-            # Key: (full_name_lower, samaj_id, surname_id) — surname_id prevents cross-surname false matches
+        with stats.stage("relations", rows=len(link_map)):
+            # "firstname middlename" -> (id, mobile); prefer entries with a mobile.
+            # Keyed with the surname first, then by name only for cross-surname links.
             fullname_map = {}
-            for p in all_persons:
-                if p.first_name and p.middle_name:
-                    full = f"{p.first_name.strip()} {p.middle_name.strip()}".lower()
-                    key = (full, p.samaj_id, p.surname_id)
-                    if key not in fullname_map or (p.mobile_number1 and not fullname_map[key].mobile_number1):
-                        fullname_map[key] = p
+            name_map = {}
+            candidates = Person.objects.filter(
+                samaj=samaj, is_demo=is_demo, is_deleted=False
+            ).values_list("id", "first_name", "middle_name", "surname_id", "mobile_number1")
+            for pk, first_name, middle_name, surname_id, mobile in candidates.iterator():
+                if not (first_name and middle_name):
+                    continue
+                full = f"{first_name.strip()} {middle_name.strip()}".lower()
+                for lookup, key in ((fullname_map, (full, surname_id)), (name_map, full)):
+                    current = lookup.get(key)
+                    if current is None or (mobile and not current[1]):
+                        lookup[key] = (pk, mobile)
 
+            existing_pairs = set(
+                ParentChildRelation.objects.filter(
+                    child_id__in=list(link_map), is_demo=is_demo
+                ).values_list("parent_id", "child_id")
+            )
 
-            link_map = getattr(cls, '_link_map', {})
             relations_to_create = []
-            created_relation_pairs = set()
-
-            for child in all_persons:
-                father = None
-
-                # Match only via 'Name of Father' link column (full name)
-                # If no link provided, no relation is created
-                link_father_name = link_map.get(child.id, "")
-                if not link_father_name or not child.samaj_id:
+            for child_id, (father_name, surname_id) in link_map.items():
+                father_name = father_name.strip().lower()
+                father = fullname_map.get((father_name, surname_id)) or name_map.get(father_name)
+                if not father or father[0] == child_id:
+                    continue
+                relation_key = (father[0], child_id)
+                if relation_key in existing_pairs:
                     continue
-                lookup_key = (link_father_name.strip().lower(), child.samaj_id, child.surname_id)
-                father = fullname_map.get(lookup_key)
-
-                # Fallback: if not found with surname match, try without surname constraint
-                # (handles rare cross-surname family links)
-                if not father:
-                    fallback_key = (link_father_name.strip().lower(), child.samaj_id, None)
-                    # Search all entries for samaj+name match ignoring surname
-                    for k, v in fullname_map.items():
-                        if k[0] == link_father_name.strip().lower() and k[1] == child.samaj_id:
-                            father = v
-                            break
-
-                if father and father.id != child.id:
-                    relation_key = (father.id, child.id)
-                    if relation_key not in created_relation_pairs:
-                        if not ParentChildRelation.objects.filter(
-                            parent_id=father.id,
-                            child_id=child.id,
-                            is_demo=is_demo
-                        ).exists():
-                            relations_to_create.append(
-                                ParentChildRelation(
-                                    parent=father,
-                                    child=child,
-                                    is_demo=is_demo,
-                                    created_user=system_admin
-                                )
-                            )
-                            created_relation_pairs.add(relation_key)
+                existing_pairs.add(relation_key)
+                relations_to_create.append(
+                    ParentChildRelation(
+                        parent_id=father[0],
+                        child_id=child_id,
+                        is_demo=is_demo,
+                        created_user=system_admin,
+                    )
+                )
 
             if relations_to_create:
                 ParentChildRelation.objects.bulk_create(relations_to_create, ignore_conflicts=True)
+                # bulk_create skips signals, so refresh the closure explicitly
+                LineageService.rebuild_for(
+                    [relation.child_id for relation in relations_to_create], is_demo
+                )
+                SurnameMemberService.refresh_relations(
+                    chain.from_iterable(
+                        (relation.parent_id, relation.child_id) for relation in relations_to_create
+                    )
+                )
+        return len(relations_to_create)
 
-            # Cleanup class-level link map after processing
-            if hasattr(cls, '_link_map'):
-                del cls._link_map
+    @classmethod
+    def _process_file(cls, uploaded_file, request=None, is_demo=False):
+        stats = ImportStats()
 
+        # 1. Save original file
+        fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, 'uploads', 'original'))
+        filename = fs.save(uploaded_file.name, uploaded_file)
+
+        # Rewind file for processing
+        uploaded_file.seek(0)
+
+        ext = uploaded_file.name.lower().split('.')[-1]
+        result = cls._run_import(uploaded_file, ext, is_demo, stats)
+        if "error" in result:
+            return result
 
         # 5. Generate Bug CSV if needed
+        bug_rows = result["bug_rows"]
         bug_url = None
         if bug_rows:
-            bug_fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, 'uploads', 'bugs'))
-            bug_filename = f"bug_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(["Row Data", "Error Message"])
-            for bug in bug_rows:
-                writer.writerow(bug)
-            
-            bug_fs.save(bug_filename, io.BytesIO(output.getvalue().encode('utf-8')))
-            
+            with stats.stage("bug_file", rows=len(bug_rows)):
+                bug_filename = f"bug_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                bug_filename = cls._write_bug_rows(bug_filename, bug_rows)
+
             if request:
                 bug_url = request.build_absolute_uri(settings.MEDIA_URL + f"uploads/bugs/{bug_filename}")
             else:
                 bug_url = settings.MEDIA_URL + f"uploads/bugs/{bug_filename}"
 
+        stats_data = stats.as_dict()
+        logger.info("CSV import %s: %s", filename, stats_data)
+
         return {
-            "created": total_created,
-            "updated": total_updated,
+            "created": result["state"]["created"],
+            "updated": result["state"]["updated"],
             "bug_file_url": bug_url,
             "bug_count": len(bug_rows),
-            "original_filename": filename
+            "original_filename": filename,
+            "stats": stats_data,
         }
+
+    @staticmethod
+    def _write_bug_rows(bug_filename, bug_rows, append=False):
+        """Write (or append) rows to uploads/bugs/<bug_filename>; returns the stored name."""
+        if not append:
+            bug_fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, 'uploads', 'bugs'))
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(["Row Data", "Error Message"])
+            for bug in bug_rows:
+                writer.writerow(bug)
+            return bug_fs.save(bug_filename, io.BytesIO(output.getvalue().encode('utf-8')))
+
+        path = os.path.join(settings.MEDIA_ROOT, 'uploads', 'bugs', bug_filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as bug_file:
+            writer = csv.writer(bug_file)
+            if is_new:
+                writer.writerow(["Row Data", "Error Message"])
+            for bug in bug_rows:
+                writer.writerow(bug)
+        return bug_filename
+
+    @classmethod
+    def count_rows(cls, uploaded_file, ext):
+        """Upper bound of person rows (sheets 3+ for XLSX), used for job progress."""
+        if ext in ['xlsx', 'xls']:
+            wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+            try:
+                return sum(ws.max_row or 0 for ws in wb.worksheets[2:])
+            finally:
+                wb.close()
+        return sum(1 for _ in uploaded_file)
+
+    @classmethod
+    def _run_import(cls, uploaded_file, ext, is_demo, stats, state=None, on_chunk=None):
+        """
+        Stream ``uploaded_file`` and import it chunk by chunk.
+
+        ``state`` tracks the position after the last committed chunk (sheet
+        index, data row within the sheet), running totals and the father
+        links collected so far; pass a saved state to resume. ``on_chunk`` is
+        called with the state and the chunk's new bug rows inside each
+        chunk's transaction. Returns {"state": ..., "bug_rows": [...]} or
+        {"error": ...}.
+        """
+        state = {
+            "sheet": 0, "row": 0, "rows": 0, "created": 0, "updated": 0, "links": {},
+            **(state or {}),
+        }
+
+        # 2. Open sheets; rows are streamed, never loaded as a whole
+        try:
+            sheets, workbook = cls._open_sheets(uploaded_file, ext)
+        except Exception as e:
+            kind = "XLSX" if ext in ['xlsx', 'xls'] else "CSV"
+            return {"error": f"Failed to read {kind}: {str(e)}"}
+
+        bug_rows = []
+        bug_cursor = 0
+
+        # 3. Process Sheets
+        global_village = None
+        global_samaj = None
+        surnames = {}
+        countries = {country.name: country for country in Country.objects.all()}
+
+        try:
+            for s_idx, (sheet_name, rows) in enumerate(sheets):
+                # 3. Tab Processing Policy
+                if s_idx == 0: # 1st Tab: Dashboard
+                    with stats.stage("read"):
+                        global_village, global_samaj, error = cls._read_dashboard(rows)
+                    if error:
+                        return {"error": error}
+                    if global_samaj:
+                        surnames = {
+                            surname.name.strip().lower(): surname
+                            for surname in Surname.objects.filter(samaj=global_samaj)
+                        }
+                    continue
+
+                if s_idx == 1: # 2nd Tab: Dummy
+                    continue
+
+                # 3rd Tab & Onwards: Person Data (Surname Tabs as Master)
+                if not global_village:
+                    continue
+
+                # Already committed by an earlier run of this import
+                if s_idx < state["sheet"]:
+                    continue
+
+                if not global_samaj:
+                    bug_rows.append([f"Sheet: {sheet_name}", "Skipped: No Samaj configured for this village"])
+                    continue
+
+                # Master Tab Rule: Sheet name must match a Surname linked to this Samaj,
+                # if not found, create new surname linked to this samaj
+                sheet_surname_obj = surnames.get(sheet_name.strip().lower())
+                if not sheet_surname_obj:
+                    sheet_surname_obj, status_msg = cls.resolve_surname(sheet_name, samaj=global_samaj)
+                    if sheet_surname_obj:
+                        surnames[sheet_surname_obj.name.strip().lower()] = sheet_surname_obj
+
+                if not sheet_surname_obj:
+                    bug_rows.append([f"Sheet: {sheet_name}", f"Skipped: Could not resolve or create Surname for Samaj: {global_samaj.name}"])
+                    continue
+
+                # Header detection only needs the first rows (plus one lookahead)
+                with stats.stage("read"):
+                    head = [list(row) for row in islice(rows, 11)]
+                header_row_idx, col_map = cls.detect_columns(head)
+                if header_row_idx == -1:
+                    continue
+
+                start_row = header_row_idx + 1
+                if start_row < len(head):
+                    sub_row_str = " ".join([str(x) for x in head[start_row]]).lower()
+                    if any(x in sub_row_str for x in ["english", "gujarati", "main", "optional"]):
+                        start_row += 1
+
+                resume_row = state["row"] if s_idx == state["sheet"] else 0
+                rows_before_sheet = state["rows"] - resume_row
+                existing = cls._existing_by_mobile(sheet_surname_obj, is_demo)
+                pending = []
+                pending_mobiles = set()
+
+                def flush(position, sheet_done=False):
+                    nonlocal bug_cursor
+                    with transaction.atomic():
+                        for entry in cls._flush_persons(pending, bug_rows, stats):
+                            person = entry["person"]
+                            if entry["created"]:
+                                state["created"] += 1
+                                if person.mobile_number1:
+                                    existing[person.mobile_number1] = [
+                                        (person.id, person.profile.name, person.thumb_profile.name)
+                                    ]
+                            else:
+                                state["updated"] += 1
+                            # Store the link for relation-building phase
+                            if entry["link_father"]:
+                                state["links"][str(person.id)] = [entry["link_father"], person.surname_id]
+                        pending.clear()
+                        pending_mobiles.clear()
+
+                        state["sheet"], state["row"] = (s_idx + 1, 0) if sheet_done else (s_idx, position)
+                        state["rows"] = rows_before_sheet + position
+                        if on_chunk:
+                            on_chunk(state, bug_rows[bug_cursor:])
+                    bug_cursor = len(bug_rows)
+
+                def col(row, key):
+                    # Streamed rows are not padded to the sheet width
+                    index = col_map.get(key)
+                    return cls.clean_val(row[index]) if index is not None and index < len(row) else ""
+
+                data_rows = islice(chain(head[start_row:], rows), resume_row, None)
+                next_row = resume_row
+                for position, row in enumerate(stats.timed(data_rows, "read"), start=resume_row):
+                    next_row = position + 1
+                    if not any(row): continue
+                    row = list(row)
+
+                    try:
+                        # Person Data Extraction
+                        f_name = col(row, 'first_name')
+                        m_name = col(row, 'middle_name')
+                        guj_f_name = col(row, 'guj_first_name')
+                        guj_m_name = col(row, 'guj_middle_name')
+                        s_name = col(row, 'surname')
+                        mob1 = col(row, 'mobile1')
+                        mob2 = col(row, 'mobile2')
+                        dob_raw = col(row, 'dob')
+                        country_name = col(row, 'country')
+                        int_mob = col(row, 'int_mobile')
+                        profile_path = col(row, 'profile')
+                        thumb_profile_path = col(row, 'thumb_profile')
+                        link_father_name = col(row, 'link_father')
+
+                        # 1. Empty Row Check: Skip silently if the row has absolutely no data
+                        # This avoids false "Surname Mismatch" bugs for blank rows.
+                        if not any([f_name, m_name, guj_f_name, guj_m_name, s_name, mob1, mob2, dob_raw, country_name, int_mob]):
+                            continue
+
+                        # 2. Strict Surname Mismatch: Check if row data belongs in this Master Tab
+                        # Rows with data but a different surname are logged to the bug file.
+                        if s_name.strip().lower() != sheet_name.strip().lower():
+                            bug_rows.append(row + [f"Surname mismatch: Sheet is '{sheet_name}', but row says '{s_name}'"])
+                            continue
+
+                        # Country Handling
+                        c_name = country_name if country_name else "India"
+                        country_obj = countries.get(c_name)
+                        if country_obj is None:
+                            country_obj, _ = Country.objects.get_or_create(name=c_name)
+                            countries[c_name] = country_obj
+
+                        person = Person(
+                            first_name=f_name,
+                            middle_name=m_name,
+                            guj_first_name=guj_f_name,
+                            guj_middle_name=guj_m_name,
+                            surname=sheet_surname_obj,
+                            date_of_birth=cls.normalize_dob(dob_raw),
+                            mobile_number1=mob1,
+                            mobile_number2=mob2,
+                            is_out_of_country=country_obj.name.lower() != 'india',
+                            out_of_country=country_obj,
+                            international_mobile_number=int_mob,
+                            samaj=global_samaj,
+                            flag_show=True,
+                            is_demo=is_demo,
+                        )
+
+                        # Update if mobile is present (same mobile may repeat across surnames/samaj),
+                        # create new if no mobile - always create fresh record
+                        created = True
+                        if mob1:
+                            if mob1 in pending_mobiles:
+                                # The same mobile repeats in this sheet: the later row updates the earlier one
+                                flush(position)
+                            matches = existing.get(mob1, [])
+                            if len(matches) > 1:
+                                bug_rows.append(row + [f"Multiple persons found for mobile {mob1}"])
+                                continue
+                            if matches:
+                                person.pk, person.profile, person.thumb_profile = matches[0]
+                                created = False
+                            pending_mobiles.add(mob1)
+
+                        # Handle profile / thumbnail image paths
+                        if profile_path:
+                            profile_value, profile_error = cls.resolve_image_path(profile_path, 'profile')
+                            if profile_value:
+                                person.profile = profile_value
+                        if thumb_profile_path:
+                            thumb_value, thumb_error = cls.resolve_image_path(thumb_profile_path, 'thumb_profile')
+                            if thumb_value:
+                                person.thumb_profile = thumb_value
+
+                        pending.append({
+                            "row": row,
+                            "person": person,
+                            "created": created,
+                            "guj_first_name": guj_f_name,
+                            "guj_middle_name": guj_m_name,
+                            "link_father": link_father_name.strip(),
+                        })
+                        if len(pending) >= cls.PERSON_BATCH_SIZE:
+                            flush(next_row)
+
+                    except Exception as e:
+                        bug_rows.append(row + [str(e)])
+
+                flush(next_row, sheet_done=True)
+
+            # Sheets skipped after the last chunk still report to the bug file
+            if on_chunk and len(bug_rows) > bug_cursor:
+                with transaction.atomic():
+                    on_chunk(state, bug_rows[bug_cursor:])
+        finally:
+            if workbook is not None:
+                workbook.close()
+
+        # 4. Process Relations using 'Name of Father' link column (full name match)
+        if global_samaj:
+            link_map = {
+                int(child_id): (father_name, surname_id)
+                for child_id, (father_name, surname_id) in state["links"].items()
+            }
+            cls._link_fathers(link_map, global_samaj, is_demo, stats)
+            FamilyTreeSnapshotService.mark_stale(
+                surname_ids=[surname.id for surname in surnames.values()]
+            )
+
+        return {"state": state, "bug_rows": bug_rows}
+
+    @classmethod
+    def run_job(cls, job_id):
+        """
+        Run (or resume) an ImportJob. Every committed chunk updates the job's
+        counters and checkpoint, and appends its bug rows to the job's bug file.
+        """
+        job = ImportJob.objects.filter(pk=job_id).first()
+        if not job or job.state == ImportJob.STATE_COMPLETED:
+            return job
+
+        ext = job.original_filename.lower().split('.')[-1]
+        bug_filename = f"bug_import_job_{job.id}.csv"
+        stats = ImportStats()
+
+        if job.total_rows is None:
+            try:
+                with job.file.open("rb") as source:
+                    job.total_rows = cls.count_rows(source, ext)
+            except Exception:
+                logger.warning("Could not count rows of import job %s", job.id, exc_info=True)
+        job.state = ImportJob.STATE_RUNNING
+        job.error = ""
+        job.save(update_fields=["state", "error", "total_rows", "updated_at"])
+
+        def save_chunk(state, new_bug_rows):
+            update_fields = ["checkpoint", "rows_processed", "created_count", "updated_count", "updated_at"]
+            if new_bug_rows:
+                cls._write_bug_rows(bug_filename, new_bug_rows, append=True)
+                job.bug_file = f"uploads/bugs/{bug_filename}"
+                job.bug_count += len(new_bug_rows)
+                update_fields += ["bug_file", "bug_count"]
+            job.checkpoint = state
+            job.rows_processed = state["rows"]
+            job.created_count = state["created"]
+            job.updated_count = state["updated"]
+            job.save(update_fields=update_fields)
+
+        try:
+            with FamilyTreeSnapshotService.deferred(), job.file.open("rb") as source:
+                result = cls._run_import(
+                    source, ext, job.is_demo, stats, state=job.checkpoint, on_chunk=save_chunk
+                )
+        except Exception as e:
+            logger.exception("Import job %s failed", job.id)
+            job.state = ImportJob.STATE_FAILED
+            job.error = str(e)
+            job.stats = stats.as_dict()
+            job.save(update_fields=["state", "error", "stats", "updated_at"])
+            raise
+
+        if "error" in result:
+            job.state = ImportJob.STATE_FAILED
+            job.error = result["error"]
+        else:
+            job.state = ImportJob.STATE_COMPLETED
+        job.stats = stats.as_dict()
+        job.finished_at = timezone.now()
+        job.save(update_fields=["state", "error", "stats", "finished_at", "updated_at"])
+        logger.info("Import job %s: %s", job.id, job.stats)
+        return job
+
+
+class FamilyTreeSnapshotService:
+    """
+    Builds and maintains FamilyTreeSnapshot rows for the v4 relation API.
+
+    A snapshot holds every active person of a surname as a pre-rendered node
+    (translated names, resolved profile paths, village/samaj names) plus the
+    parent/child edge list. Person and relation changes patch the affected
+    snapshots in place; bulk paths that bypass signals call ``mark_stale`` and
+    the next read rebuilds.
+    """
+
+    # Keys returned to the client for every node, in response order.
+    NODE_FIELDS = (
+        "id",
+        "translated_first_name",
+        "translated_middle_name",
+        "date_of_birth",
+        "profile",
+        "thumb_profile",
+        "mobile_number1",
+        "mobile_number2",
+        "out_of_country",
+        "flag_show",
+        "village_name",
+        "samaj_name",
+        "emoji",
+    )
+
+    _local = threading.local()
+
+    @staticmethod
+    def normalize_lang(lang):
+        return lang if lang in dict(LANGUAGE_CHOICES) else "en"
+
+    @staticmethod
+    def _default_profile_path():
+        return os.path.join(
+            settings.MEDIA_ROOT, os.getenv("DEFAULT_PROFILE_PATH_WITHOUT_MEDIA", "")
+        )
+
+    @classmethod
+    def _resolve_image(cls, path):
+        if not path or path == "null":
+            return cls._default_profile_path()
+        if not os.path.exists(os.path.join(settings.MEDIA_ROOT, path)):
+            return cls._default_profile_path()
+        return path
+
+    @classmethod
+    def _person_queryset(cls, langs):
+        return Person.objects.select_related("samaj__village").prefetch_related(
+            Prefetch(
+                "translateperson",
+                queryset=TranslatePerson.objects.filter(
+                    language__in=set(langs) | {"guj"}
+                ).order_by("is_deleted", "id"),
+            )
+        )
+
+    @classmethod
+    def _build_node(cls, person, lang):
+        translations = list(person.translateperson.all())
+        lang_trans = next((t for t in translations if t.language == lang), None)
+        guj_trans = next(
+            (t for t in translations if t.language == "guj" and not t.is_deleted),
+            None,
+        )
+        village = person.samaj.village if person.samaj else None
+
+        first_name = person.first_name
+        if lang_trans and lang_trans.first_name is not None:
+            first_name = lang_trans.first_name
+        middle_name = person.middle_name
+        if lang_trans and lang_trans.middle_name is not None:
+            middle_name = lang_trans.middle_name
+
+        # Names used on the edge itself (mirrors GetTreeRelationSerializer).
+        tree_first_name = (
+            (guj_trans.first_name if guj_trans else None)
+            or person.guj_first_name
+            or person.first_name
+        )
+        tree_middle_name = (
+            (guj_trans.middle_name if guj_trans else None)
+            or person.guj_middle_name
+            or person.middle_name
+        )
+
+        return {
+            "id": person.id,
+            "translated_first_name": first_name,
+            "translated_middle_name": middle_name,
+            "date_of_birth": person.date_of_birth,
+            "profile": cls._resolve_image(person.profile.name if person.profile else ""),
+            "thumb_profile": cls._resolve_image(
+                person.thumb_profile.name if person.thumb_profile else ""
+            ),
+            "mobile_number1": person.mobile_number1,
+            "mobile_number2": person.mobile_number2,
+            "out_of_country": person.out_of_country_id,
+            "flag_show": person.flag_show,
+            "village_name": village.name if village else None,
+            "samaj_name": person.samaj.name if person.samaj else None,
+            "emoji": person.emoji,
+            "village_id": village.id if village else None,
+            "tree_first_name": tree_first_name,
+            "tree_middle_name": tree_middle_name,
+        }
+
+    @staticmethod
+    def _load_edges(surname_id, is_demo):
+        relations = ParentChildRelation.objects.filter(
+            parent__surname_id=surname_id,
+            child__surname_id=surname_id,
+            is_demo=is_demo,
+            is_deleted=False,
+        ).values_list("id", "parent_id", "child_id")
+        return {str(pk): [parent_id, child_id] for pk, parent_id, child_id in relations}
+
+    @staticmethod
+    def _top_member_id(surname):
+        try:
+            return int(surname.top_member or 0) or None
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def build(cls, surname_id, lang, is_demo):
+        """Rebuild the snapshot from scratch and return it."""
+        lang = cls.normalize_lang(lang)
+        surname = Surname.objects.get(pk=surname_id)
+        persons = cls._person_queryset([lang]).filter(
+            surname_id=surname_id, is_demo=is_demo, is_deleted=False
+        )
+        values = {
+            "nodes": {str(p.id): cls._build_node(p, lang) for p in persons},
+            "edges": cls._load_edges(surname_id, is_demo),
+            "top_member": cls._top_member_id(surname),
+            "is_stale": False,
+        }
+        with transaction.atomic():
+            snapshot = (
+                FamilyTreeSnapshot.objects.select_for_update()
+                .filter(surname_id=surname_id, lang=lang, is_demo=is_demo)
+                .first()
+            )
+            if snapshot is None:
+                try:
+                    with transaction.atomic():
+                        return FamilyTreeSnapshot.objects.create(
+                            surname_id=surname_id, lang=lang, is_demo=is_demo, **values
+                        )
+                except IntegrityError:
+                    # A concurrent request built it first.
+                    snapshot = FamilyTreeSnapshot.objects.select_for_update().get(
+                        surname_id=surname_id, lang=lang, is_demo=is_demo
+                    )
+            for field, value in values.items():
+                setattr(snapshot, field, value)
+            snapshot.version += 1
+            snapshot.save()
+        return snapshot
+
+    @classmethod
+    def get_snapshot(cls, surname_id, lang, is_demo):
+        """Return an up-to-date snapshot, building it on first use."""
+        lang = cls.normalize_lang(lang)
+        snapshot = FamilyTreeSnapshot.objects.filter(
+            surname_id=surname_id, lang=lang, is_demo=is_demo
+        ).first()
+        if snapshot is None or snapshot.is_stale:
+            snapshot = cls.build(surname_id, lang, is_demo)
+        return snapshot
+
+    @staticmethod
+    def etag(snapshot, login_village_id):
+        return f'"{snapshot.pk}.{snapshot.version}.{login_village_id}"'
+
+    @classmethod
+    def render(cls, snapshot, login_village_id):
+        """
+        Produce the ``(total_count, data)`` payload of the relation API.
+
+        The only per-request part is the "(village)" suffix added to names of
+        people outside the login person's village.
+        """
+        nodes = snapshot.nodes
+        rendered = {}
+
+        def node_out(person_id):
+            key = str(person_id)
+            if key not in rendered:
+                node = nodes.get(key)
+                if node is None:
+                    rendered[key] = None
+                else:
+                    out = {field: node.get(field) for field in cls.NODE_FIELDS}
+                    if node.get("village_id") != login_village_id:
+                        out["translated_first_name"] = (
+                            f"{node['translated_first_name'] or ''} ({node['village_name'] or ''})"
+                        )
+                    rendered[key] = out
+            return rendered[key]
+
+        def dob_key(person_id):
+            node = nodes.get(str(person_id))
+            dob = node.get("date_of_birth") if node else None
+            return (dob is None, dob or "")
+
+        edges = sorted(
+            ((int(pk), parent_id, child_id) for pk, (parent_id, child_id) in snapshot.edges.items()),
+            key=lambda edge: (dob_key(edge[1]), dob_key(edge[2]), edge[0]),
+        )
+
+        data = []
+        for pk, parent_id, child_id in edges:
+            child = nodes.get(str(child_id))
+            if not child or child.get("flag_show") is not True:
+                continue
+            parent = nodes.get(str(parent_id))
+            if not parent or parent.get("flag_show") is not True:
+                parent_id = snapshot.top_member
+            data.append(
+                {
+                    "id": pk,
+                    "parent": node_out(parent_id),
+                    "child": node_out(child_id),
+                    "trans_first_name": child.get("tree_first_name"),
+                    "trans_middle_name": child.get("tree_middle_name"),
+                }
+            )
+        return len(nodes), data
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+
+    @classmethod
+    @contextmanager
+    def deferred(cls):
+        """
+        Collect changes instead of patching snapshots row by row; the touched
+        snapshots are marked stale once the block exits. Used by bulk imports.
+        """
+        if getattr(cls._local, "pending", None) is not None:
+            yield
+            return
+        cls._local.pending = {"surname_ids": set(), "person_ids": set(), "relation_ids": set()}
+        try:
+            yield
+        finally:
+            pending = cls._local.pending
+            cls._local.pending = None
+            cls.mark_stale(**{k: list(v) for k, v in pending.items()})
+
+    @classmethod
+    def _defer(cls, surname_ids=(), person_ids=(), relation_ids=()):
+        pending = getattr(cls._local, "pending", None)
+        if pending is None:
+            return False
+        pending["surname_ids"].update(s for s in surname_ids if s)
+        pending["person_ids"].update(person_ids)
+        pending["relation_ids"].update(relation_ids)
+        return True
+
+    @staticmethod
+    def mark_stale(surname_ids=(), person_ids=(), relation_ids=()):
+        """Flag snapshots for a rebuild on their next read."""
+        query = Q()
+        if surname_ids:
+            query |= Q(surname_id__in=surname_ids)
+        if person_ids:
+            query |= Q(nodes__has_any_keys=[str(pk) for pk in person_ids])
+        if relation_ids:
+            query |= Q(edges__has_any_keys=[str(pk) for pk in relation_ids])
+        if not query:
+            return 0
+        return FamilyTreeSnapshot.objects.filter(query).update(
+            is_stale=True, version=F("version") + 1
+        )
+
+    @classmethod
+    def refresh_person(cls, person_id, surname_id=None, is_demo=False):
+        """Patch (or drop) the node of one person in every affected snapshot."""
+        if cls._defer(surname_ids=[surname_id], person_ids=[person_id]):
+            return
+        with transaction.atomic():
+            snapshots = list(
+                FamilyTreeSnapshot.objects.select_for_update().filter(
+                    Q(surname_id=surname_id, is_demo=is_demo)
+                    | Q(nodes__has_key=str(person_id)),
+                    is_stale=False,
+                )
+            )
+            if not snapshots:
+                return
+            person = (
+                cls._person_queryset({s.lang for s in snapshots})
+                .filter(pk=person_id, is_deleted=False)
+                .first()
+            )
+            key = str(person_id)
+            for snapshot in snapshots:
+                belongs = (
+                    person is not None
+                    and person.surname_id == snapshot.surname_id
+                    and person.is_demo == snapshot.is_demo
+                )
+                membership_changed = belongs != (key in snapshot.nodes)
+                if belongs:
+                    snapshot.nodes[key] = cls._build_node(person, snapshot.lang)
+                else:
+                    snapshot.nodes.pop(key, None)
+                if membership_changed:
+                    snapshot.edges = cls._load_edges(snapshot.surname_id, snapshot.is_demo)
+                snapshot.version += 1
+                snapshot.save(update_fields=["nodes", "edges", "version", "updated_at"])
+
+    @classmethod
+    def refresh_edges(cls, surname_ids, is_demo, relation_ids=()):
+        """Reload the edge list of the snapshots touched by relation changes."""
+        surname_ids = [s for s in set(surname_ids) if s]
+        if cls._defer(surname_ids=surname_ids, relation_ids=relation_ids):
+            return
+        query = Q(surname_id__in=surname_ids, is_demo=is_demo)
+        if relation_ids:
+            query |= Q(edges__has_any_keys=[str(pk) for pk in relation_ids])
+        with transaction.atomic():
+            snapshots = FamilyTreeSnapshot.objects.select_for_update().filter(
+                query, is_stale=False
+            )
+            edges_cache = {}
+            for snapshot in snapshots:
+                cache_key = (snapshot.surname_id, snapshot.is_demo)
+                if cache_key not in edges_cache:
+                    edges_cache[cache_key] = cls._load_edges(*cache_key)
+                snapshot.edges = edges_cache[cache_key]
+                snapshot.version += 1
+                snapshot.save(update_fields=["edges", "version", "updated_at"])
+
+    @classmethod
+    def refresh_relation(cls, relation):
+        surname_ids = Person.objects.filter(
+            pk__in=[relation.parent_id, relation.child_id]
+        ).values_list("surname_id", flat=True)
+        cls.refresh_edges(surname_ids, relation.is_demo, relation_ids=[relation.pk])
+
+    @classmethod
+    def refresh_top_member(cls, surname):
+        FamilyTreeSnapshot.objects.filter(surname=surname).update(
+            top_member=cls._top_member_id(surname),
+            version=F("version") + 1,
+        )
+
+
+class LineageService:
+    """
+    Ancestor/descendant lookups backed by the ParentChildClosure table.
+
+    Every lookup is one indexed query (the ``*_ids`` helpers return lazy
+    querysets so they can be used as subqueries). The closure is recomputed
+    for the affected sub-tree whenever a relation is saved or soft-deleted.
+    """
+
+    BATCH_SIZE = 2000
+
+    @staticmethod
+    def ancestor_ids(person_id, is_demo=False):
+        return ParentChildClosure.objects.filter(
+            descendant_id=person_id, is_demo=is_demo
+        ).values_list("ancestor_id", flat=True)
+
+    @staticmethod
+    def descendant_ids(person_ids, is_demo=None):
+        if not isinstance(person_ids, (list, tuple, set)):
+            person_ids = [person_ids]
+        qs = ParentChildClosure.objects.filter(ancestor_id__in=person_ids)
+        if is_demo is not None:
+            qs = qs.filter(is_demo=is_demo)
+        return qs.values_list("descendant_id", flat=True)
+
+    @staticmethod
+    def root_ids(person_id):
+        """Top-most ancestors of a person (the person itself when it has none)."""
+        roots = list(
+            ParentChildClosure.objects.filter(descendant_id=person_id)
+            .exclude(
+                ancestor_id__in=ParentChildClosure.objects.values("descendant_id")
+            )
+            .values_list("ancestor_id", flat=True)
+            .distinct()
+        )
+        return roots or [person_id]
+
+    @staticmethod
+    def is_in_line(person_id, other_id, is_demo=False):
+        """True when one of the two persons descends from the other."""
+        return ParentChildClosure.objects.filter(
+            Q(ancestor_id=person_id, descendant_id=other_id)
+            | Q(ancestor_id=other_id, descendant_id=person_id),
+            is_demo=is_demo,
+        ).exists()
+
+    @staticmethod
+    def _compute(node_ids, is_demo, full=False):
+        """
+        Return ``{(ancestor_id, descendant_id): depth}`` for every node in
+        ``node_ids``. Ancestors outside the set are read from the existing
+        closure, which the change cannot have affected.
+        """
+        node_ids = set(node_ids)
+        relations = ParentChildRelation.objects.filter(is_demo=is_demo, is_deleted=False)
+        if not full:
+            relations = relations.filter(child_id__in=node_ids)
+        parents = defaultdict(set)
+        for parent_id, child_id in relations.values_list("parent_id", "child_id"):
+            if parent_id != child_id:
+                parents[child_id].add(parent_id)
+        if full:
+            node_ids |= set(parents)
+
+        known = defaultdict(dict)
+        outside = {p for ps in parents.values() for p in ps if p not in node_ids}
+        if outside and not full:
+            for ancestor_id, descendant_id, depth in ParentChildClosure.objects.filter(
+                descendant_id__in=outside, is_demo=is_demo
+            ).values_list("ancestor_id", "descendant_id", "depth"):
+                known[descendant_id][ancestor_id] = depth
+        for person_id in outside:
+            known.setdefault(person_id, {})
+
+        def ancestors_of(node, visiting):
+            if node in known:
+                return known[node]
+            visiting.add(node)
+            result = {}
+            for parent_id in parents.get(node, ()):
+                if parent_id in visiting:
+                    # Corrupt data with a cycle; stop instead of looping.
+                    continue
+                candidates = {parent_id: 0}
+                candidates.update(ancestors_of(parent_id, visiting))
+                for ancestor_id, depth in candidates.items():
+                    if ancestor_id == node:
+                        continue
+                    depth += 1
+                    if depth < result.get(ancestor_id, depth + 1):
+                        result[ancestor_id] = depth
+            visiting.discard(node)
+            known[node] = result
+            return result
+
+        rows = {}
+        for node in node_ids:
+            for ancestor_id, depth in ancestors_of(node, set()).items():
+                rows[(ancestor_id, node)] = depth
+        return rows
+
+    @classmethod
+    def _write(cls, rows, is_demo):
+        ParentChildClosure.objects.bulk_create(
+            [
+                ParentChildClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=depth,
+                    is_demo=is_demo,
+                )
+                for (ancestor_id, descendant_id), depth in rows.items()
+            ],
+            batch_size=cls.BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def rebuild_for(cls, child_ids, is_demo=False):
+        """Recompute the closure of ``child_ids`` and everything below them."""
+        child_ids = {c for c in child_ids if c}
+        if not child_ids:
+            return
+        with transaction.atomic():
+            node_ids = child_ids | set(cls.descendant_ids(child_ids, is_demo))
+            rows = cls._compute(node_ids, is_demo)
+            ParentChildClosure.objects.filter(
+                descendant_id__in=node_ids, is_demo=is_demo
+            ).delete()
+            cls._write(rows, is_demo)
+
+    @classmethod
+    def rebuild_all(cls, is_demo=False):
+        with transaction.atomic():
+            rows = cls._compute(set(), is_demo, full=True)
+            ParentChildClosure.objects.filter(is_demo=is_demo).delete()
+            cls._write(rows, is_demo)
+        return len(rows)
+
+    @classmethod
+    def check(cls, is_demo=False):
+        """Compare the stored closure with a fresh computation."""
+        expected = cls._compute(set(), is_demo, full=True)
+        stored = {
+            (a, d): depth
+            for a, d, depth in ParentChildClosure.objects.filter(is_demo=is_demo).values_list(
+                "ancestor_id", "descendant_id", "depth"
+            )
+        }
+        missing = [key for key in expected if key not in stored]
+        extra = [key for key in stored if key not in expected]
+        wrong_depth = [
+            key for key, depth in expected.items() if key in stored and stored[key] != depth
+        ]
+        return missing, extra, wrong_depth
+
+
+class LoginPersonService:
+    """
+    Resolves the caller from the X-Mobile-Number header.
+
+    Lookups go through the PersonMobile table and are cached for a few
+    seconds (LOGIN_PERSON_CACHE_TTL); Person saves drop the cached entries
+    of the numbers they touch. When the cache is down every lookup reads
+    PersonMobile directly.
+    """
+
+    _MISSING = "__missing__"
+
+    @staticmethod
+    def normalize(mobile):
+        return "".join(ch for ch in str(mobile or "") if ch.isdigit())
+
+    @staticmethod
+    def _cache_key(mobile, is_demo):
+        return f"login_person:{int(bool(is_demo))}:{mobile}"
+
+    @classmethod
+    def resolve(cls, mobile, is_demo=False):
+        """Return the active Person owning ``mobile`` (samaj/village loaded) or None."""
+        mobile = cls.normalize(mobile)
+        if not mobile:
+            return None
+        key = cls._cache_key(mobile, is_demo)
+        try:
+            person = cache.get(key)
+        except Exception:
+            # Cache unavailable — answer from PersonMobile
+            logger.warning("Login person cache unavailable", exc_info=True)
+            return cls._lookup(mobile, is_demo)
+        if person is None:
+            person = cls._lookup(mobile, is_demo)
+            try:
+                cache.set(
+                    key,
+                    person if person is not None else cls._MISSING,
+                    getattr(settings, "LOGIN_PERSON_CACHE_TTL", 30),
+                )
+            except Exception:
+                logger.warning("Could not cache login person %s", mobile, exc_info=True)
+        return person if isinstance(person, Person) else None
+
+    @staticmethod
+    def _lookup(mobile, is_demo):
+        return (
+            Person.objects.filter(
+                mobile_links__mobile=mobile,
+                mobile_links__is_demo=is_demo,
+                is_demo=is_demo,
+                is_deleted=False,
+            )
+            .select_related("samaj__village")
+            .order_by("id")
+            .first()
+        )
+
+    @staticmethod
+    def _forget(keys):
+        """Drop cached lookups; on a cache outage they expire with their TTL."""
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            logger.warning("Could not drop %s cached login persons", len(keys), exc_info=True)
+
+    @classmethod
+    def sync_person(cls, person, deleted=False):
+        """Rewrite the lookup rows of ``person`` and drop affected cache keys."""
+        old_rows = list(
+            PersonMobile.objects.filter(person_id=person.pk).values_list("mobile", "is_demo")
+        )
+        current = {
+            (mobile, person.is_demo)
+            for mobile in (
+                cls.normalize(person.mobile_number1),
+                cls.normalize(person.mobile_number2),
+            )
+            if mobile
+        }
+        new_rows = set() if deleted or person.is_deleted else current
+        if set(old_rows) != new_rows and not deleted:
+            with transaction.atomic():
+                PersonMobile.objects.filter(person_id=person.pk).delete()
+                PersonMobile.objects.bulk_create(
+                    [
+                        PersonMobile(person_id=person.pk, mobile=mobile, is_demo=is_demo)
+                        for mobile, is_demo in new_rows
+                    ]
+                )
+        cls._forget(
+            [cls._cache_key(mobile, is_demo) for mobile, is_demo in set(old_rows) | current]
+        )
+
+    @classmethod
+    def sync_persons(cls, persons):
+        """Batch form of sync_person for bulk writes that bypass model signals."""
+        persons = [person for person in persons if person.pk]
+        if not persons:
+            return
+        person_ids = [person.pk for person in persons]
+        old_rows = set(
+            PersonMobile.objects.filter(person_id__in=person_ids).values_list(
+                "person_id", "mobile", "is_demo"
+            )
+        )
+        new_rows = {
+            (person.pk, mobile, person.is_demo)
+            for person in persons
+            if not person.is_deleted
+            for mobile in (
+                cls.normalize(person.mobile_number1),
+                cls.normalize(person.mobile_number2),
+            )
+            if mobile
+        }
+        if old_rows != new_rows:
+            with transaction.atomic():
+                PersonMobile.objects.filter(person_id__in=person_ids).delete()
+                PersonMobile.objects.bulk_create(
+                    [
+                        PersonMobile(person_id=person_id, mobile=mobile, is_demo=is_demo)
+                        for person_id, mobile, is_demo in new_rows
+                    ]
+                )
+        cls._forget(
+            list({cls._cache_key(mobile, is_demo) for _, mobile, is_demo in old_rows | new_rows})
+        )
+
+
+
+class LoginBundleService:
+    """
+    Builds the v4 login response with a fixed number of queries.
+
+    The caller's row is read once with its relations; the admin contacts of
+    a (surname, samaj) or village scope and the pending-approval count are
+    cached for LOGIN_BUNDLE_CACHE_TTL seconds, so app cold starts of the
+    same samaj mostly skip those queries. While the cache is down they are
+    read from the database on every login.
+    """
+
+    PERSON_RELATED = (
+        "surname",
+        "samaj__village__taluka__district",
+        "city",
+        "state",
+        "out_of_country",
+    )
+
+    @staticmethod
+    def _ttl():
+        return getattr(settings, "LOGIN_BUNDLE_CACHE_TTL", 10)
+
+    @classmethod
+    def _cached(cls, key, load):
+        try:
+            value = cache.get(key)
+        except Exception:
+            # Cache unavailable — read straight through
+            logger.warning("Login bundle cache unavailable", exc_info=True)
+            return load()
+        if value is None:
+            value = load()
+            try:
+                cache.set(key, value, cls._ttl())
+            except Exception:
+                logger.warning("Could not cache %s", key, exc_info=True)
+        return value
+
+    @classmethod
+    def find_person(cls, mobile, is_demo=False):
+        return (
+            Person.objects.filter(
+                Q(mobile_number1=mobile) | Q(mobile_number2=mobile),
+                is_demo=is_demo,
+                is_deleted=False,
+            )
+            .select_related(*cls.PERSON_RELATED)
+            .order_by("id")
+            .first()
+        )
+
+    @staticmethod
+    def register_player(person, player_id, platform):
+        # One row per device; a device that logs in as someone else moves over
+        PersonPlayerId.objects.update_or_create(
+            player_id=player_id, defaults={"person": person, "platform": platform}
+        )
+
+    @classmethod
+    def _admins(cls, key, lang, **scope):
+        """Serialized admins of a scope, cached; the caller removes itself."""
+        from .serializers import PersonGetV4Serializer
+
+        def load():
+            queryset = (
+                Person.objects.filter(is_admin=True, flag_show=True, is_deleted=False, **scope)
+                .select_related(*cls.PERSON_RELATED)
+                .order_by("id")
+            )
+            return list(PersonGetV4Serializer(queryset, many=True, context={"lang": lang}).data)
+
+        return cls._cached(key, load)
+
+    @classmethod
+    def admin_contacts(cls, person, lang="en"):
+        """
+        Admins of the person's surname within its samaj or, when that has
+        none besides the person, the admins of its village.
+        """
+        admins = cls._admins(
+            f"login_bundle:admins:{int(person.is_demo)}:{person.samaj_id}:{person.surname_id}:{lang}",
+            lang,
+            is_demo=person.is_demo,
+            samaj_id=person.samaj_id,
+            surname_id=person.surname_id,
+        )
+        admins = [admin for admin in admins if admin["id"] != person.id]
+        if admins:
+            return admins
+
+        village_id = person.samaj.village_id if person.samaj else None
+        admins = cls._admins(
+            f"login_bundle:village_admins:{int(person.is_demo)}:{village_id}:{lang}",
+            lang,
+            is_demo=person.is_demo,
+            samaj__village_id=village_id,
+        )
+        return [admin for admin in admins if admin["id"] != person.id]
+
+    @staticmethod
+    def pending_key(is_demo):
+        return f"login_bundle:pending:{int(bool(is_demo))}"
+
+    @classmethod
+    def pending_count(cls, person):
+        """Persons waiting for approval, as shown to admins; 0 for everyone else."""
+        if not person.is_admin:
+            return 0
+        return cls._cached(
+            cls.pending_key(person.is_demo),
+            lambda: PendingApprovalService.count(is_demo=person.is_demo),
+        )
+
+    @classmethod
+    def forget_pending(cls, is_demo):
+        """Drop the cached pending count; on a cache outage it expires with the TTL."""
+        try:
+            cache.delete(cls.pending_key(is_demo))
+        except Exception:
+            logger.warning("Could not drop the cached pending count", exc_info=True)
+
+    @classmethod
+    def build(cls, person, lang="en", player_id=None, platform="Android"):
+        from .serializers import PersonV4Serializer
+
+        if player_id:
+            cls.register_player(person, player_id, platform)
+        return {
+            "pending-data": cls.pending_count(person),
+            "person": PersonV4Serializer(
+                person, context={"lang": lang, "person_id": person.id}
+            ).data,
+            "admin_data": cls.admin_contacts(person, lang),
+        }
+
+
+class PersonSearchService:
+    """
+    Keeps PersonSearchDocument rows in sync and answers the v4 person search.
+
+    Every keyword must occur in the document (substring, served by the
+    trigram index); longer alphabetic keywords may also match fuzzily.
+    Results rank prefix hits on the first name above plain and fuzzy matches.
+    """
+
+    FUZZY_MIN_LENGTH = 3
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def _text(*parts):
+        return " ".join(" ".join(str(part).split()) for part in parts if part).lower()
+
+    @staticmethod
+    def _top_member_ids(surname_ids):
+        ids = set()
+        for value in Surname.objects.filter(id__in=set(surname_ids) - {None}).values_list(
+            "top_member", flat=True
+        ):
+            if str(value).isdigit():
+                ids.add(int(value))
+        return ids
+
+    @classmethod
+    def build_document(cls, person, translation=None, top_member_ids=()):
+        surname = person.surname
+        guj_first_name = translation.first_name if translation else person.guj_first_name
+        guj_middle_name = translation.middle_name if translation else person.guj_middle_name
+        return PersonSearchDocument(
+            person_id=person.id,
+            samaj_id=person.samaj_id,
+            is_demo=person.is_demo,
+            is_listed=bool(
+                person.flag_show and not person.is_deleted and person.id not in top_member_ids
+            ),
+            name_key=cls._text(person.first_name)[:100],
+            guj_name_key=cls._text(guj_first_name)[:500],
+            document=cls._text(
+                person.first_name,
+                person.middle_name,
+                surname.name if surname else "",
+                guj_first_name,
+                guj_middle_name,
+                surname.guj_name if surname else "",
+                LoginPersonService.normalize(person.mobile_number1),
+                LoginPersonService.normalize(person.mobile_number2),
+                person.date_of_birth,
+            ),
+        )
+
+    @classmethod
+    def refresh(cls, person_ids):
+        """Rebuild the documents of ``person_ids`` in batches."""
+        from .utils import load_guj_translations
+
+        person_ids = list(set(person_ids) - {None})
+        for start in range(0, len(person_ids), cls.BATCH_SIZE):
+            persons = list(
+                Person.objects.filter(id__in=person_ids[start:start + cls.BATCH_SIZE])
+                .select_related("surname")
+            )
+            translations = load_guj_translations(person.id for person in persons)
+            top_member_ids = cls._top_member_ids(person.surname_id for person in persons)
+            PersonSearchDocument.objects.bulk_create(
+                [
+                    cls.build_document(person, translations[person.id], top_member_ids)
+                    for person in persons
+                ],
+                update_conflicts=True,
+                unique_fields=["person"],
+                update_fields=[
+                    "samaj", "is_demo", "is_listed", "name_key", "guj_name_key",
+                    "document", "updated_at",
+                ],
+            )
+
+    @classmethod
+    def refresh_surnames(cls, surname_ids):
+        cls.refresh(Person.objects.filter(surname_id__in=surname_ids).values_list("id", flat=True))
+
+    @classmethod
+    def rebuild_all(cls):
+        person_ids = list(Person.objects.values_list("id", flat=True))
+        cls.refresh(person_ids)
+        return len(person_ids)
+
+    @classmethod
+    def search(cls, text, samaj_id, is_demo=False):
+        """Return listed persons of ``samaj_id`` matching ``text``, best match first."""
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models import Case, FloatField, Value, When
+
+        keywords = cls._text(text).split()
+        if not keywords:
+            return Person.objects.none()
+
+        match = Q()
+        rank = Value(0.0, output_field=FloatField())
+        for keyword in keywords:
+            keyword_q = Q(search_document__document__contains=keyword)
+            if len(keyword) >= cls.FUZZY_MIN_LENGTH and not keyword.isdigit():
+                keyword_q |= Q(search_document__document__trigram_word_similar=keyword)
+            match &= keyword_q
+            rank = rank + TrigramWordSimilarity(keyword, "search_document__document") + Case(
+                When(search_document__name_key__startswith=keyword, then=Value(1.0)),
+                When(search_document__guj_name_key__startswith=keyword, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+
+        return (
+            Person.objects.filter(
+                match,
+                search_document__samaj_id=samaj_id,
+                search_document__is_demo=is_demo,
+                search_document__is_listed=True,
+            )
+            .annotate(search_rank=rank)
+            .select_related("surname")
+            .order_by("-search_rank", "search_document__name_key", "middle_name", "id")
+        )
+
+
+class SurnameMemberService:
+    """
+    Keeps SurnameMember rows in sync and serves the v4 person-by-surname list.
+
+    A scope is (surname, samaj, is_demo). Its top members are the configured
+    Surname.top_member and every listed parent that is nobody's child within
+    the scope; the list leaves them out.
+    """
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def has_mobile(person):
+        # Same rule as the list filter it replaces: some mobile set, first one not blank
+        return (
+            person.mobile_number1 is not None or person.mobile_number2 is not None
+        ) and person.mobile_number1 != ""
+
+    @classmethod
+    def build_row(cls, person, translation=None):
+        from .utils import name_sort_key
+
+        guj_first_name = translation.first_name if translation else person.guj_first_name
+        guj_middle_name = translation.middle_name if translation else person.guj_middle_name
+        return SurnameMember(
+            person_id=person.id,
+            surname_id=person.surname_id,
+            samaj_id=person.samaj_id,
+            is_demo=person.is_demo,
+            is_listed=bool(person.flag_show and not person.is_deleted),
+            has_mobile=cls.has_mobile(person),
+            guj_first_name=guj_first_name,
+            guj_middle_name=guj_middle_name,
+            sort_name=name_sort_key(person.first_name, person.middle_name),
+            # The Gujarati list shows each name part translated when it can
+            guj_sort_name=name_sort_key(
+                guj_first_name or person.first_name, guj_middle_name or person.middle_name
+            ),
+        )
+
+    @classmethod
+    def refresh(cls, person_ids):
+        """Rebuild the rows of ``person_ids``, then the top members of every scope they left or joined."""
+        from .utils import load_guj_translations
+
+        person_ids = list(set(person_ids) - {None})
+        scopes = set()
+        for start in range(0, len(person_ids), cls.BATCH_SIZE):
+            batch = person_ids[start:start + cls.BATCH_SIZE]
+            scopes.update(
+                SurnameMember.objects.filter(person_id__in=batch).values_list(
+                    "surname_id", "samaj_id", "is_demo"
+                )
+            )
+            persons = list(Person.objects.filter(id__in=batch))
+            translations = load_guj_translations(person.id for person in persons)
+            SurnameMember.objects.bulk_create(
+                [cls.build_row(person, translations[person.id]) for person in persons],
+                update_conflicts=True,
+                unique_fields=["person"],
+                update_fields=[
+                    "surname", "samaj", "is_demo", "is_listed", "has_mobile",
+                    "guj_first_name", "guj_middle_name", "sort_name", "guj_sort_name",
+                    "updated_at",
+                ],
+            )
+            scopes.update((person.surname_id, person.samaj_id, person.is_demo) for person in persons)
+        cls.refresh_top_members(scopes)
+
+    @classmethod
+    def refresh_top_members(cls, scopes):
+        """Recompute ``is_top_member`` of every (surname, samaj, is_demo) scope."""
+        scopes = {scope for scope in scopes if scope[0] is not None}
+        configured = PersonSearchService._top_member_ids(surname_id for surname_id, _, _ in scopes)
+        for surname_id, samaj_id, is_demo in scopes:
+            rows = SurnameMember.objects.filter(surname_id=surname_id, samaj_id=samaj_id, is_demo=is_demo)
+            listed_ids = set(rows.filter(is_listed=True).values_list("person_id", flat=True))
+            top_ids = configured & listed_ids
+            if listed_ids:
+                parent_ids, child_ids = set(), set()
+                for parent_id, child_id in ParentChildRelation.objects.filter(
+                    is_demo=is_demo,
+                    is_deleted=False,
+                    parent_id__in=listed_ids,
+                    child_id__in=listed_ids,
+                ).values_list("parent_id", "child_id"):
+                    parent_ids.add(parent_id)
+                    child_ids.add(child_id)
+                top_ids |= parent_ids - child_ids
+            rows.filter(is_top_member=True).exclude(person_id__in=top_ids).update(is_top_member=False)
+            if top_ids:
+                rows.filter(person_id__in=top_ids, is_top_member=False).update(is_top_member=True)
+
+    @classmethod
+    def refresh_relations(cls, person_ids):
+        """Relations between ``person_ids`` changed: recompute the top members of their scopes."""
+        cls.refresh_top_members(
+            SurnameMember.objects.filter(person_id__in=set(person_ids) - {None})
+            .values_list("surname_id", "samaj_id", "is_demo")
+            .distinct()
+        )
+
+    @classmethod
+    def refresh_surnames(cls, surname_ids):
+        cls.refresh_top_members(
+            SurnameMember.objects.filter(surname_id__in=surname_ids)
+            .values_list("surname_id", "samaj_id", "is_demo")
+            .distinct()
+        )
+
+    @classmethod
+    def rebuild_all(cls):
+        person_ids = list(Person.objects.values_list("id", flat=True))
+        cls.refresh(person_ids)
+        return len(person_ids)
+
+    @classmethod
+    def members(cls, surname_id, is_demo=False, samaj_id=None, lang="en", mobile_only=False):
+        """
+        Listed, non-top members of a surname (optionally of one samaj) as
+        value dicts, sorted by the stored sort key of ``lang``. One query.
+        """
+        queryset = SurnameMember.objects.filter(
+            surname_id=surname_id, is_demo=is_demo, is_listed=True, is_top_member=False
+        )
+        if samaj_id:
+            queryset = queryset.filter(samaj_id=samaj_id)
+        if mobile_only:
+            queryset = queryset.filter(has_mobile=True)
+
+        return queryset.order_by(SurnameMember.sort_field(lang), "person_id").values(
+            "person_id",
+            "person__first_name",
+            "person__middle_name",
+            "guj_first_name",
+            "guj_middle_name",
+            "person__date_of_birth",
+            "person__mobile_number1",
+            "person__mobile_number2",
+            "person__flag_show",
+            "person__profile",
+            "person__is_admin",
+            "person__surname__name",
+            "person__surname__guj_name",
+            "person__thumb_profile",
+        )
+
+
+class PendingApprovalService:
+    """
+    Keeps the PendingApproval queue in sync with Person.flag_show /
+    is_deleted and answers the admin badge and approval list from it.
+    """
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def is_pending(person):
+        return not person.flag_show and not person.is_deleted
+
+    @staticmethod
+    def _enqueue(persons):
+        PendingApproval.objects.bulk_create(
+            [
+                PendingApproval(
+                    person_id=person.id,
+                    surname_id=person.surname_id,
+                    samaj_id=person.samaj_id,
+                    is_demo=person.is_demo,
+                    child_flag=person.child_flag,
+                )
+                for person in persons
+            ],
+            update_conflicts=True,
+            unique_fields=["person"],
+            update_fields=["surname", "samaj", "is_demo", "child_flag"],
+        )
+
+    @classmethod
+    def sync_person(cls, person):
+        """Queue or dequeue one saved person; a queued person keeps its position."""
+        if cls.is_pending(person):
+            cls._enqueue([person])
+        else:
+            PendingApproval.objects.filter(person_id=person.id).delete()
+
+    @classmethod
+    def sync(cls, person_ids):
+        """``sync_person`` for many ids, read back in batches."""
+        person_ids = list(set(person_ids) - {None})
+        for start in range(0, len(person_ids), cls.BATCH_SIZE):
+            batch = person_ids[start:start + cls.BATCH_SIZE]
+            persons = Person.objects.filter(id__in=batch).only(
+                "id", "surname_id", "samaj_id", "is_demo", "child_flag", "flag_show", "is_deleted"
+            )
+            pending = [person for person in persons if cls.is_pending(person)]
+            PendingApproval.objects.filter(person_id__in=batch).exclude(
+                person_id__in=[person.id for person in pending]
+            ).delete()
+            cls._enqueue(pending)
+
+    @classmethod
+    def rebuild_all(cls):
+        person_ids = list(
+            Person.objects.filter(flag_show=False, is_deleted=False).values_list("id", flat=True)
+        )
+        PendingApproval.objects.exclude(person_id__in=person_ids).delete()
+        cls.sync(person_ids)
+        return len(person_ids)
+
+    @staticmethod
+    def queue(is_demo=False, samaj_id=None, surname_id=None):
+        """Queue rows of a demo/live split, optionally of one samaj / surname, oldest first."""
+        queryset = PendingApproval.objects.filter(is_demo=is_demo)
+        if samaj_id:
+            queryset = queryset.filter(samaj_id=samaj_id)
+        if surname_id:
+            queryset = queryset.filter(surname_id=surname_id)
+        return queryset.order_by("queued_at", "person_id")
+
+    @classmethod
+    def count(cls, is_demo=False, samaj_id=None, surname_id=None):
+        return cls.queue(is_demo, samaj_id, surname_id).count()
+
+    APPROVE = "approve"
+    REJECT = "reject"
+    ACTIONS = (APPROVE, REJECT)
+
+    @classmethod
+    def review(cls, admin, person_ids, action):
+        """
+        Approve or reject the queued persons among ``person_ids`` in one
+        transaction, the way the single pending-approve put / delete does.
+        Only persons queued in the admin's demo/live split and, unless the
+        admin is a super admin, in the admin's samaj are touched.
+        Returns ``(reviewed_ids, skipped_ids)``.
+        """
+        person_ids = {int(person_id) for person_id in person_ids}
+        admin_name = f"{admin.first_name} {admin.surname.name if admin.surname_id else ''}".strip()
+        verb = "Approved" if action == cls.APPROVE else "Rejected"
+        relinked_child_ids = set()
+
+        scope = PendingApproval.objects.filter(is_demo=admin.is_demo, person_id__in=person_ids)
+        if not admin.is_super_admin:
+            if not admin.samaj_id:
+                return [], sorted(person_ids)
+            scope = scope.filter(samaj_id=admin.samaj_id)
+
+        with transaction.atomic():
+            queued = dict(scope.select_for_update().values_list("person_id", "surname_id"))
+            reviewed_ids = sorted(queued)
+            if not reviewed_ids:
+                return [], sorted(person_ids)
+
+            persons = Person.objects.filter(id__in=reviewed_ids)
+            if action == cls.APPROVE:
+                persons.update(flag_show=True)
+            else:
+                relinked_child_ids = cls._detach(queued, admin.is_demo)
+                persons.update(flag_show=False, is_deleted=True)
+            PersonUpdateLog.objects.bulk_create(
+                [
+                    PersonUpdateLog(
+                        person_id=person_id,
+                        updated_history=f" This Person is {verb} by {admin_name}",
+                        created_person_id=admin.id,
+                    )
+                    for person_id in reviewed_ids
+                ]
+            )
+            PendingApproval.objects.filter(person_id__in=reviewed_ids).delete()
+            cls._refresh_reviewed(reviewed_ids, set(queued.values()), relinked_child_ids, admin.is_demo)
+
+        if action == cls.REJECT:
+            # After commit, like the relation signal: the moved links change the closure
+            is_demo, lineage_ids = admin.is_demo, set(reviewed_ids) | relinked_child_ids
+            transaction.on_commit(lambda: LineageService.rebuild_for(lineage_ids, is_demo))
+        return reviewed_ids, sorted(person_ids - set(reviewed_ids))
+
+    @staticmethod
+    def _detach(queued, is_demo):
+        """
+        Drop rejected persons from the family graph: their children move to
+        the surname's top member, their own parent link is soft-deleted and
+        their translations are soft-deleted. Returns the moved children.
+        """
+        person_ids = list(queued)
+        top_members = {
+            surname_id: int(top_member)
+            for surname_id, top_member in Surname.objects.filter(
+                id__in=set(queued.values())
+            ).values_list("id", "top_member")
+            if str(top_member).isdigit()
+        }
+        existing = set(
+            Person.objects.filter(id__in=top_members.values()).values_list("id", flat=True)
+        )
+        children = ParentChildRelation.objects.filter(is_demo=is_demo, is_deleted=False)
+        moved_child_ids = set()
+        for surname_id, top_member_id in top_members.items():
+            if top_member_id not in existing:
+                continue
+            parents = [person_id for person_id, surname in queued.items() if surname == surname_id]
+            moved = children.filter(parent_id__in=parents)
+            moved_child_ids.update(moved.values_list("child_id", flat=True))
+            moved.update(parent_id=top_member_id)
+        children.filter(child_id__in=person_ids).update(is_deleted=True)
+        TranslatePerson.objects.filter(person_id__in=person_ids, is_deleted=False).update(is_deleted=True)
+        return moved_child_ids
+
+    @staticmethod
+    def _refresh_reviewed(person_ids, surname_ids, relinked_child_ids, is_demo):
+        """Queryset updates skip signals: refresh every derived lookup once for the batch."""
+        persons = list(Person.objects.filter(id__in=person_ids))
+        LoginPersonService.sync_persons(persons)
+        PersonSearchService.refresh(person_ids)
+        SurnameMemberService.refresh([*person_ids, *relinked_child_ids])
+        AudienceService.refresh_persons(person_ids)
+        FamilyTreeSnapshotService.mark_stale(surname_ids=surname_ids, person_ids=person_ids)
+        LoginBundleService.forget_pending(is_demo)
@@ -1,8 +1,17 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
  
 from parivar.serializers import PersonSerializer, TranslatePersonSerializer
-from .models import Person, Surname
+from parivar.services import (
+    FamilyTreeSnapshotService,
+    LineageService,
+    LoginPersonService,
+    PendingApprovalService,
+    PersonSearchService,
+    SurnameMemberService,
+)
+from .models import Person, Surname, TranslatePerson, ParentChildRelation, Samaj, Village
  
  
 @receiver(post_save, sender=Surname)
@@ -68,4 +77,162 @@ def surname_save(sender, created, instance, **kwargs):
                     person_translate_instance = person_translate_serializer.save()
  
             except Exception as e:
-                pass
\ No newline at end of file
+                pass
+
+
+# ---------------------------------------------------------------------------
+# Family tree snapshot maintenance
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def person_tree_snapshot(sender, instance, **kwargs):
+    FamilyTreeSnapshotService.refresh_person(
+        instance.id, instance.surname_id, instance.is_demo
+    )
+
+
+@receiver(post_save, sender=TranslatePerson)
+@receiver(post_delete, sender=TranslatePerson)
+def translate_person_tree_snapshot(sender, instance, **kwargs):
+    person = Person.objects.filter(pk=instance.person_id_id).first()
+    if person:
+        FamilyTreeSnapshotService.refresh_person(
+            person.id, person.surname_id, person.is_demo
+        )
+
+
+@receiver(post_save, sender=ParentChildRelation)
+@receiver(post_delete, sender=ParentChildRelation)
+def relation_tree_snapshot(sender, instance, **kwargs):
+    FamilyTreeSnapshotService.refresh_relation(instance)
+
+
+@receiver(post_save, sender=Surname)
+def surname_tree_snapshot(sender, instance, created, **kwargs):
+    if not created:
+        FamilyTreeSnapshotService.refresh_top_member(instance)
+
+
+@receiver(post_save, sender=Samaj)
+def samaj_tree_snapshot(sender, instance, created, **kwargs):
+    if not created:
+        FamilyTreeSnapshotService.mark_stale(
+            surname_ids=list(instance.surnames.values_list("id", flat=True))
+        )
+
+
+@receiver(post_save, sender=Village)
+def village_tree_snapshot(sender, instance, created, **kwargs):
+    if not created:
+        FamilyTreeSnapshotService.mark_stale(
+            surname_ids=list(
+                Surname.objects.filter(samaj__village=instance).values_list("id", flat=True)
+            )
+        )
+
+
+# ---------------------------------------------------------------------------
+# Ancestor/descendant closure maintenance
+# ---------------------------------------------------------------------------
+
+@receiver(post_init, sender=ParentChildRelation)
+def relation_remember_lineage(sender, instance, **kwargs):
+    instance._lineage_original = (instance.child_id, instance.is_demo)
+
+
+@receiver(post_save, sender=ParentChildRelation)
+@receiver(post_delete, sender=ParentChildRelation)
+def relation_lineage(sender, instance, **kwargs):
+    # Run after commit so cascaded person deletes are fully applied first.
+    targets = {(instance.child_id, instance.is_demo)}
+    targets.add(getattr(instance, "_lineage_original", (instance.child_id, instance.is_demo)))
+    instance._lineage_original = (instance.child_id, instance.is_demo)
+
+    def rebuild():
+        for child_id, is_demo in targets:
+            LineageService.rebuild_for([child_id], is_demo)
+
+    transaction.on_commit(rebuild)
+
+
+# ---------------------------------------------------------------------------
+# Login person lookup maintenance
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Person)
+def person_mobile_lookup(sender, instance, **kwargs):
+    LoginPersonService.sync_person(instance)
+
+
+@receiver(post_delete, sender=Person)
+def person_mobile_lookup_delete(sender, instance, **kwargs):
+    LoginPersonService.sync_person(instance, deleted=True)
+
+
+
+# ---------------------------------------------------------------------------
+# Person search document maintenance
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Person)
+def person_search_document(sender, instance, **kwargs):
+    PersonSearchService.refresh([instance.id])
+
+
+@receiver(post_save, sender=TranslatePerson)
+@receiver(post_delete, sender=TranslatePerson)
+def translate_person_search_document(sender, instance, **kwargs):
+    # Deferred so a cascaded person delete does not resurrect its document.
+    person_id = instance.person_id_id
+    if person_id:
+        transaction.on_commit(lambda: PersonSearchService.refresh([person_id]))
+
+
+@receiver(post_save, sender=Surname)
+def surname_search_document(sender, instance, created, **kwargs):
+    # Name, Gujarati name or top member may have changed for the whole family.
+    if not created:
+        PersonSearchService.refresh_surnames([instance.id])
+
+
+# ---------------------------------------------------------------------------
+# Surname member list maintenance
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Person)
+def person_surname_member(sender, instance, **kwargs):
+    SurnameMemberService.refresh([instance.id])
+
+
+@receiver(post_save, sender=TranslatePerson)
+@receiver(post_delete, sender=TranslatePerson)
+def translate_person_surname_member(sender, instance, **kwargs):
+    # Deferred so a cascaded person delete does not resurrect its row.
+    person_id = instance.person_id_id
+    if person_id:
+        transaction.on_commit(lambda: SurnameMemberService.refresh([person_id]))
+
+
+@receiver(post_save, sender=ParentChildRelation)
+@receiver(post_delete, sender=ParentChildRelation)
+def relation_surname_member(sender, instance, **kwargs):
+    person_ids = [instance.parent_id, instance.child_id]
+    transaction.on_commit(lambda: SurnameMemberService.refresh_relations(person_ids))
+
+
+@receiver(post_save, sender=Surname)
+def surname_surname_member(sender, instance, created, **kwargs):
+    # The configured top member may have changed
+    if not created:
+        SurnameMemberService.refresh_surnames([instance.id])
+
+
+# ---------------------------------------------------------------------------
+# Pending approval queue maintenance
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Person)
+def person_pending_approval(sender, instance, **kwargs):
+    # Same transaction as the save; a hard delete cascades the queue row
+    PendingApprovalService.sync_person(instance)
@@ -0,0 +1,20 @@
+from celery import shared_task
+
+from parivar.services import CSVImportService
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_import_job(job_id):
+    # acks_late: a worker that dies mid-import leaves the message queued, and
+    # the next run resumes from the job's last committed chunk.
+    job = CSVImportService.run_job(job_id)
+    return job.state if job else None
+
+
+@shared_task(acks_late=True)
+def generate_pending_thumbnails():
+    # Routed to the "thumbnails" queue (CELERY_TASK_ROUTES); run that queue on
+    # its own worker pool so the face model is loaded once per process there.
+    from parivar.thumbnails import generate_pending
+
+    return generate_pending()
@@ -1,3 +1,136 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import (
+    City, Country, District, Person, Samaj, State, Surname, Taluka,
+    TranslatePerson, Village,
+)
+from .serializers import PersonSerializer, PersonSerializerV2, PersonV4Serializer
+from .utils import prefetch_guj_translations
+
+
+class TranslationQueryCountTests(TestCase):
+    """Serializing a list must not cost a TranslatePerson query per person."""
+
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(id=1, name="Gujarat")
+        City.objects.create(id=1, name="Bhavnagar", state=state)
+        Country.objects.create(id=1, name="India")
+        district = District.objects.create(name="Bhavnagar")
+        taluka = Taluka.objects.create(name="Mahuva", district=district)
+        village = Village.objects.create(name="Bila", taluka=taluka)
+        cls.samaj = Samaj.objects.create(name="Patel", village=village)
+        cls.surname = Surname.objects.create(name="Patel", samaj=cls.samaj)
+        cls.admin = Person.objects.create(
+            first_name="Admin",
+            middle_name="Admin",
+            surname=cls.surname,
+            samaj=cls.samaj,
+            mobile_number1="9000000000",
+            flag_show=True,
+            is_admin=True,
+        )
+
+    def create_pending(self, count, offset=0):
+        for index in range(offset, offset + count):
+            person = Person.objects.create(
+                first_name=f"Member{index}",
+                middle_name="Father",
+                surname=self.surname,
+                samaj=self.samaj,
+                mobile_number1=f"91000{index:05d}",
+                flag_show=False,
+                child_flag=index % 2 == 0,
+            )
+            TranslatePerson.objects.create(
+                person_id=person,
+                first_name=f"સભ્ય{index}",
+                middle_name="પિતા",
+                language="guj",
+            )
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def pending_list_queries(self):
+        client = APIClient()
+        return self.count_queries(
+            lambda: client.post(
+                "/api/v4/person/pending-approve-new-member",
+                {"admin_user_id": self.admin.id, "lang": "guj"},
+                format="json",
+                HTTP_X_MOBILE_NUMBER=self.admin.mobile_number1,
+            )
+        )
+
+    def test_pending_approve_list_is_constant(self):
+        self.create_pending(3)
+        small = self.pending_list_queries()
+        self.create_pending(12, offset=3)
+        self.assertEqual(self.pending_list_queries(), small)
+
+    def admin_access_queries(self):
+        # Pending mobiles are not promoted, so the response serializes them all
+        mobiles = list(
+            Person.objects.filter(flag_show=False).values_list("mobile_number1", flat=True)
+        )
+        client = APIClient()
+        cache.clear()  # both sizes pay the cached X-Mobile-Number lookup
+        return self.count_queries(
+            lambda: client.post(
+                "/api/v4/admin-access",
+                {"admin_user_id": self.admin.id, "mobile": mobiles, "lang": "guj"},
+                format="json",
+                HTTP_X_MOBILE_NUMBER=self.admin.mobile_number1,
+            )
+        )
+
+    def test_admin_access_list_is_constant(self):
+        self.create_pending(3)
+        small = self.admin_access_queries()
+        self.create_pending(12, offset=3)
+        self.assertEqual(self.admin_access_queries(), small)
+
+    def assert_serializer_constant(self, serializer_class, prefetch):
+        def serialize():
+            queryset = Person.objects.filter(flag_show=False).select_related(
+                "surname", "samaj__village__taluka__district", "city", "state", "out_of_country"
+            )
+            if prefetch:
+                queryset = prefetch_guj_translations(queryset)
+            return serializer_class(queryset, many=True, context={"lang": "guj"}).data
+
+        self.create_pending(3)
+        small = self.count_queries(serialize)
+        self.create_pending(12, offset=3)
+        self.assertEqual(self.count_queries(serialize), small)
+        self.assertTrue(all(item["trans_first_name"].startswith("સભ્ય") for item in serialize()))
+
+    def test_person_v4_serializer_list(self):
+        self.assert_serializer_constant(PersonV4Serializer, prefetch=True)
+
+    def test_person_v4_serializer_bulk_loader(self):
+        self.assert_serializer_constant(PersonV4Serializer, prefetch=False)
+
+    def test_person_serializer_list(self):
+        self.assert_serializer_constant(PersonSerializer, prefetch=True)
+
+    def test_person_serializer_v2_translations(self):
+        # PersonSerializerV2 declares village/taluka/district, which Person
+        # lacks, so only its translation lookups can be exercised on a list
+        def translate():
+            persons = list(Person.objects.filter(flag_show=False))
+            serializer = PersonSerializerV2(persons, many=True, context={"lang": "guj"})
+            return [serializer.child.get_trans_first_name(person) for person in persons]
+
+        self.create_pending(3)
+        small = self.count_queries(translate)
+        self.create_pending(12, offset=3)
+        self.assertEqual(self.count_queries(translate), small)
+        self.assertTrue(all(name.startswith("સભ્ય") for name in translate()))
@@ -0,0 +1,219 @@
+"""
+Face-centred profile thumbnails.
+
+OpenCV and the Caffe face detector are loaded lazily, once per process
+and thread-safely, the first time a face is detected; importing this module
+stays cheap for web workers and management commands. Detection runs on
+batches of images with a single forward pass. Views mark a person as ``thumb_status="pending"`` and queue
+``parivar.tasks.generate_pending_thumbnails``; the worker drains pending
+persons in batches and flips them to ``ready`` or ``failed``.
+"""
+import logging
+import os
+import threading
+from io import BytesIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.db import transaction
+from PIL import Image, ImageFile
+
+from .models import Person
+
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = (300, 300)
+# Pending persons handled per forward pass
+BATCH_SIZE = 16
+CONFIDENCE = 0.5
+# Long side of the sample used to find the dominant background colour
+DOMINANT_SAMPLE_SIDE = 128
+
+_net = None
+_net_lock = threading.Lock()
+
+
+def get_net():
+    """Return the process-wide face detection network, reading the model on first use."""
+    global _net
+    if _net is None:
+        with _net_lock:
+            if _net is None:
+                prototxt_path = os.getenv("PROTO_TXT_PATH")
+                model_path = os.getenv("MODEL_PATH")
+                if not prototxt_path or not model_path:
+                    raise ImproperlyConfigured(
+                        "PROTO_TXT_PATH and MODEL_PATH must be set for face detection."
+                    )
+                import cv2
+
+                _net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+    return _net
+
+
+def detect_faces(images):
+    """
+    Run the detector once over ``images`` (PIL, RGB) and return, per image,
+    the list of face boxes (startX, startY, endX, endY) in pixel coordinates.
+    """
+    if not images:
+        return []
+    import cv2
+    import numpy as np
+
+    net = get_net()
+    cv_images = [cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR) for image in images]
+    blob = cv2.dnn.blobFromImages(cv_images, 1.0, (300, 300), (104.0, 177.0, 123.0))
+    net.setInput(blob)
+    # Shape (1, 1, N, 7): [image_index, label, confidence, x1, y1, x2, y2]
+    detections = net.forward()[0, 0]
+
+    boxes = [[] for _ in images]
+    for image_index, _, confidence, *box in detections:
+        if confidence <= CONFIDENCE:
+            continue
+        index = int(image_index)
+        w, h = images[index].size
+        boxes[index].append(tuple((np.array(box) * np.array([w, h, w, h])).astype("int")))
+    return boxes
+
+
+def crop_face(image, box, aspect_ratio=(1, 1), padding_ratio=50):
+    """Crop ``image`` around one face box, keeping room for neck and hair."""
+    (startX, startY, endX, endY) = box
+    w, h = image.size
+
+    # Calculate the center of the face
+    centerX, centerY = (startX + endX) // 2, (startY + endY) // 2
+
+    # Calculate the width and height based on the desired aspect ratio
+    face_width = endX - startX
+    face_height = face_width * aspect_ratio[1] // aspect_ratio[0]
+
+    # Add padding to include neck and hair
+    padding = int(padding_ratio)
+    crop_top = max(centerY - face_height - padding // 2, 0)
+    crop_bottom = min(centerY + face_height + padding // 2, h)
+    crop_left = max(centerX - face_width - padding // 2, 0)
+    crop_right = min(centerX + face_width + padding // 2, w)
+
+    return image.crop((crop_left, crop_top, crop_right, crop_bottom))
+
+
+def get_dominant_color(image, num_colors=1, sample_side=DOMINANT_SAMPLE_SIDE):
+    """
+    Returns the dominant color in the image.
+
+    The image is sampled down to ``sample_side`` pixels on its long side
+    (nearest neighbour, so no blended colours appear), pixels are packed into
+    one uint32 each and counted per 15-bit colour bucket with ``np.bincount``.
+    The most frequent exact colour of the winning bucket is returned.
+    """
+    import numpy as np
+
+    image = image.convert("RGB")
+    if max(image.size) > sample_side:
+        sample = image.copy()
+        sample.thumbnail((sample_side, sample_side), Image.Resampling.NEAREST)
+        image = sample
+
+    pixels = np.asarray(image, dtype=np.uint32).reshape(-1, 3)
+    packed = (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+    # 5 bits per channel -> 32768 buckets
+    buckets = ((packed >> 9) & 0x7C00) | ((packed >> 6) & 0x3E0) | ((packed >> 3) & 0x1F)
+    counts = np.bincount(buckets, minlength=1 << 15)
+
+    dominant_colors = []
+    for bucket in np.argsort(counts)[::-1][:num_colors]:
+        if not counts[bucket]:
+            break
+        values, value_counts = np.unique(packed[buckets == bucket], return_counts=True)
+        value = int(values[np.argmax(value_counts)])
+        dominant_colors.append((value >> 16, (value >> 8) & 0xFF, value & 0xFF))
+    return dominant_colors[0]
+
+
+def compose_thumbnail(face, size=THUMB_SIZE):
+    """Fit the cropped face into ``size`` on a background of its dominant colour."""
+    face.thumbnail(size, Image.Resampling.LANCZOS)
+    new_img = Image.new("RGB", size, get_dominant_color(face))
+    new_img.paste(face, ((size[0] - face.width) // 2, (size[1] - face.height) // 2))
+    return new_img
+
+
+def save_thumbnail(person, thumbnail):
+    """Store ``thumbnail`` as the person's thumb_profile and mark it ready."""
+    file_name = f"{os.path.splitext(os.path.basename(person.profile.name))[0]}.jpg"
+    buffer = BytesIO()
+    thumbnail.save(buffer, format="JPEG")
+    person.thumb_profile.save(file_name, File(buffer, name=file_name), save=False)
+    person.thumb_status = Person.THUMB_READY
+    person.save(update_fields=["thumb_profile", "thumb_status"])
+
+
+def mark_pending(person):
+    person.thumb_status = Person.THUMB_PENDING
+    person.save(update_fields=["thumb_status"])
+
+
+def process_batch(persons):
+    """Detect, crop and store thumbnails for ``persons``; returns the number made."""
+    loaded = []
+    for person in persons:
+        try:
+            if not person.profile:
+                raise ValueError("no profile image")
+            with person.profile.open("rb") as source:
+                image = Image.open(source)
+                image.load()
+            loaded.append((person, image.convert("RGB")))
+        except Exception:
+            logger.warning("Could not open profile of person %s", person.id, exc_info=True)
+            person.thumb_status = Person.THUMB_FAILED
+            person.save(update_fields=["thumb_status"])
+
+    made = 0
+    boxes = detect_faces([image for _, image in loaded])
+    for (person, image), faces in zip(loaded, boxes):
+        if not faces:
+            # No face found: the app keeps showing the default profile image
+            person.thumb_status = Person.THUMB_FAILED
+            person.save(update_fields=["thumb_status"])
+            continue
+        try:
+            # Savepoint per person: a failed write only fails this row, not the batch
+            with transaction.atomic():
+                save_thumbnail(person, compose_thumbnail(crop_face(image, faces[0])))
+        except Exception:
+            logger.exception("Could not store the thumbnail of person %s", person.id)
+            person.thumb_status = Person.THUMB_FAILED
+            person.save(update_fields=["thumb_status"])
+            continue
+        made += 1
+    return made
+
+
+def generate_pending(limit=None):
+    """
+    Drain pending thumbnails batch by batch. Rows are locked with SKIP
+    LOCKED for the duration of their batch, so parallel workers never pick
+    the same person. A person whose image cannot be read or stored is
+    marked failed; the rest of its batch is still committed.
+    """
+    made = 0
+    handled = 0
+    while limit is None or handled < limit:
+        with transaction.atomic():
+            persons = list(
+                Person.objects.select_for_update(skip_locked=True)
+                .filter(thumb_status=Person.THUMB_PENDING)
+                .order_by("id")[:BATCH_SIZE]
+            )
+            if not persons:
+                break
+            made += process_batch(persons)
+            handled += len(persons)
+    return made
+
@@ -89,6 +89,11 @@ urlpatterns = [
         V4Views.V4PendingApproveDetailView.as_view(),
         name="pending-approve-new-member",
     ),
+    path(
+        "api/v4/person/pending-approve-new-member/bulk",
+        V4Views.V4PendingApproveBulkView.as_view(),
+        name="pending-approve-new-member-bulk",
+    ),
     
     path(
         "api/v4/admin-person",
@@ -203,6 +208,11 @@ urlpatterns = [
         V4Views.CSVUploadAPIView.as_view(),
         name="v4-upload-csv",
     ),
+    path(
+        "api/v4/upload-csv/<int:job_id>",
+        V4Views.CSVUploadJobAPIView.as_view(),
+        name="v4-upload-csv-job",
+    ),
 
     path(
         "api/v4/out-of-country-summary",
@@ -17,3 +17,38 @@ def get_relation_queryset(request):
     from .models import ParentChildRelation
     is_demo = is_demo_login(request)
     return ParentChildRelation.objects.filter(is_demo=is_demo, is_deleted=False)
+
+def load_guj_translations(person_ids):
+    """Return {person_id: guj TranslatePerson or None} in a single query."""
+    from .models import TranslatePerson
+    person_ids = list(person_ids)
+    translations = {}
+    if person_ids:
+        for translation in TranslatePerson.objects.filter(
+            person_id__in=person_ids, language="guj", is_deleted=False
+        ).order_by("id"):
+            translations.setdefault(translation.person_id_id, translation)
+    return {person_id: translations.get(person_id) for person_id in person_ids}
+
+def prefetch_guj_translations(queryset):
+    """Attach ``guj_translations`` to every person of *queryset* with one extra query."""
+    from django.db.models import Prefetch
+    from .models import TranslatePerson
+    return queryset.prefetch_related(
+        Prefetch(
+            "translateperson",
+            queryset=TranslatePerson.objects.filter(language="guj", is_deleted=False).order_by("id"),
+            to_attr="guj_translations",
+        )
+    )
+
+
+def name_sort_key(*parts):
+    """
+    Sort key of a display name: NFC-normalized (so precomposed and combining
+    matras compare equal) with whitespace collapsed. The column collation
+    does the language-aware ordering.
+    """
+    import unicodedata
+    text = " ".join(" ".join(str(part).split()) for part in parts if part)
+    return unicodedata.normalize("NFC", text)
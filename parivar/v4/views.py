@@ -7,6 +7,7 @@ from django.db import transaction, IntegrityError
 from django.db.models.functions import Cast, Coalesce
 from django.core import signing
 from django.urls import reverse
+from django.utils.http import parse_etags
 from PIL import Image, ImageFile
 from django.core.files import File
 from django.http import HttpResponse, JsonResponse, Http404
@@ -14,22 +15,29 @@ from django.shortcuts import get_object_or_404, render
 from django.db.models.functions import Concat
 from django.db import transaction, IntegrityError
 from datetime import datetime, timedelta
-import numpy as np
-import cv2
 import string
 import random
 
-from parivar.services import CSVImportService
+from parivar.services import (
+    CSVImportService,
+    FamilyTreeSnapshotService,
+    LineageService,
+    PersonSearchService,
+    SurnameMemberService,
+    LoginBundleService,
+    PendingApprovalService,
+)
 from ..models import (
     Person, District, Taluka, User, Village, Samaj, State, City,
     TranslatePerson, Surname, ParentChildRelation, Country,
-    BloodGroup, Banner, AdsSetting, PersonUpdateLog, RandomBanner,
+    BloodGroup, Banner, AdsSetting, PersonUpdateLog, RandomBanner, ImportJob, SurnameMember,
     # DemoPerson, DemoParentChildRelation, DemoSurname
 )
 # from ..services import LocationResolverService, CSVImportService
 from django.conf import settings
-from notifications.models import PersonPlayerId
-from ..utils import get_person_queryset, get_relation_queryset, is_demo_login
+from ..tasks import generate_pending_thumbnails, run_import_job
+from ..thumbnails import mark_pending
+from ..utils import get_person_queryset, get_relation_queryset, is_demo_login, prefetch_guj_translations
 from ..serializers import (
     CountryWiseMemberSerializer,
     DistrictSerializer,
@@ -63,6 +71,7 @@ from ..serializers import (
     CountrySerializer,
     CountryDetailSerializer,
     V4RelationTreeSerializer,
+    ImportJobSerializer,
     # DemoPersonSerializer,
     # DemoPersonSerializerV2,
     # DemoParentChildRelationSerializer,
@@ -80,93 +89,23 @@ logger = logging.getLogger(__name__)
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
+# Relations read by PersonV4Serializer; select them up front for list responses
+PENDING_PERSON_RELATED = (
+    "surname",
+    "samaj__village__taluka__district",
+    "city",
+    "state",
+    "out_of_country",
+)
 
-prototxt_path = os.getenv("PROTO_TXT_PATH")
-model_path = os.getenv("MODEL_PATH")
-net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-
-
-def find_faces_and_crop(image, aspect_ratio=(1, 1), padding_ratio=50):
-    # Convert PIL Image to an OpenCV Image
-    cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
-    # Get the image dimensions
-    (h, w) = cv_image.shape[:2]
-
-    # Preprocess the image: mean subtraction, scaling, and swapping Red and Blue channels
-    blob = cv2.dnn.blobFromImage(cv_image, 1.0, (300, 300), (104.0, 177.0, 123.0))
-
-    # Pass the blob through the network to detect faces
-    net.setInput(blob)
-    detections = net.forward()
-
-    cropped_images = []
-
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > 0.5:
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-            (startX, startY, endX, endY) = box.astype("int")
-
-            # Calculate the center of the face
-            centerX, centerY = (startX + endX) // 2, (startY + endY) // 2
-
-            # Calculate the width and height based on the desired aspect ratio
-            face_width = endX - startX
-            face_height = face_width * aspect_ratio[1] // aspect_ratio[0]
-
-            # Add padding to include neck and hair
-            padding = int(padding_ratio)
-            crop_top = max(centerY - face_height - padding // 2, 0)
-            crop_bottom = min(centerY + face_height + padding // 2, h)
-
-            # Ensure the dimensions do not exceed the image boundaries
-            crop_left = max(centerX - face_width - padding // 2, 0)
-            crop_right = min(centerX + face_width + padding // 2, w)
-
-            # Crop the image to the calculated dimensions
-            img_cropped = image.crop((crop_left, crop_top, crop_right, crop_bottom))
-            cropped_images.append(img_cropped)
-
-    return cropped_images
-
-
-def get_dominant_color(image, num_colors=1):
-    """Returns the dominant color(s) in the image."""
-    image = image.convert("RGB")
-    pixels = np.array(image).reshape(-1, 3)
-    colors, count = np.unique(pixels, axis=0, return_counts=True)
-    sorted_indices = np.argsort(count)[::-1]
-    dominant_colors = colors[sorted_indices][:num_colors]
-    return tuple(dominant_colors[0])
-
-
-def compress_image(input_path, output_folder, size=(300, 300), quality=40):
-    img = Image.open(input_path)
-    cropped_images = find_faces_and_crop(img)  # Crop image to center each face if found
-    for idx, img_cropped in enumerate(cropped_images):
-        img_cropped.thumbnail(size, Image.Resampling.LANCZOS)
-
-        dominant_color = get_dominant_color(img_cropped)
-
-        new_img = Image.new("RGB", size, dominant_color)
+# Default and maximum page sizes of api/v4/search-by-person
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 100
 
-        paste_x = (size[0] - img_cropped.width) // 2
-        paste_y = (size[1] - img_cropped.height) // 2
+# Default and maximum page sizes of the paginated pending-approval queue
+PENDING_PAGE_SIZE = 50
+PENDING_MAX_PAGE_SIZE = 100
 
-        new_img.paste(img_cropped, (paste_x, paste_y))
-        fileName = f"{os.path.splitext(os.path.basename(input_path.path))[0]}.jpg"
-        try:
-            output_path = os.path.join(output_folder.path, fileName)
-        except Exception as e:
-            output_path = os.path.join("compress_img", fileName)
-            pass
-        # new_img.save(output_path, optimize=True, quality=quality)  # Save with compression
-        buffer = BytesIO()
-        new_img.save(buffer, format="JPEG")
-        django_file = File(buffer, name=fileName)
-        output_folder.save(fileName, django_file, save=True)
-        return output_path
 
 def getadmincontact(flag_show=False, lang="en", surname=None):
     if flag_show == False:
@@ -194,24 +133,20 @@ def getadmincontact(flag_show=False, lang="en", surname=None):
         else:
             admin_data = []
 
+        # Admins of the login surname first, then by surname and name
+        surname_field = "surname__guj_name" if lang == "guj" else "surname__name"
         super_admin = Person.objects.filter(
             flag_show=True, is_admin=True, is_deleted=False
+        ).order_by(
+            Case(When(**{surname_field: surname}, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            f"surname__{Surname.sort_field(lang)}",
+            f"surname_member__{SurnameMember.sort_field(lang)}",
+            "id",
         )
         admin_serializer1 = PersonGetSerializer(
             super_admin, context={"lang": lang}, many=True
         )
-        super_admin_data = admin_serializer1.data
-        combined_data = sorted(
-            super_admin_data,
-            key=lambda x: (
-                x["surname"],  # Primary sorting by surname
-                x["first_name"],  # Secondary sorting by first name
-            ),
-        )
-        combined_data = sorted(
-            combined_data,
-            key=lambda x: (x["surname"] != surname, x["surname"], x["first_name"]),
-        )
+        combined_data = admin_serializer1.data
 
         if lang == "guj":
             error_message = (
@@ -365,12 +300,8 @@ class SurnameByVillageView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Fetch login person
-        login_person = get_person_queryset(request).filter(
-            Q(mobile_number1=mobile_number) |
-            Q(mobile_number2=mobile_number),
-            is_deleted=False
-        ).select_related("samaj__village").first()
+        # Resolved once per request by LoginPersonMiddleware
+        login_person = request.login_person
 
         if not login_person:
             return Response(
@@ -409,15 +340,16 @@ class GetSurnameBySamajView(APIView):
         mobile_number = request.headers.get("X-Mobile-Number")
         login_surname_id = None
         if mobile_number:
-            login_person = get_person_queryset(request).filter(
-                Q(mobile_number1=mobile_number) |
-                Q(mobile_number2=mobile_number),
-                is_deleted=False
-            ).first()
+            login_person = request.login_person
             if login_person and login_person.surname_id:
                 login_surname_id = login_person.surname_id
 
-        surnames = Surname.objects.filter(samaj_id=samaj_id).order_by('name')
+        # The login surname first, then the stored sort key of ``lang``
+        surnames = Surname.objects.filter(samaj_id=samaj_id).order_by(
+            Case(When(id=login_surname_id, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            Surname.sort_field(lang),
+            "id",
+        )
         serializer = SurnameSerializer(surnames, many=True, context={"lang": lang})
 
         is_demo = is_demo_login(request)
@@ -436,9 +368,6 @@ class GetSurnameBySamajView(APIView):
         for item in data:
             item["total_count"] = str(surname_counts.get(item["id"], 0))
 
-        if login_surname_id:
-            data = sorted(data, key=lambda x: (x.get("id") != login_surname_id, x.get("name", "")))
-
         return Response(data, status=status.HTTP_200_OK)
 
     
@@ -472,121 +401,16 @@ class V4LoginAPI(APIView):
             )
             return Response({"message": error_message}, status=status.HTTP_400_BAD_REQUEST)
 
-        # DEMO_MOBILE_NUMBER = "1111111111"
-        # is_demo = mobile_number == DEMO_MOBILE_NUMBER
-
-        try:
-            person = get_person_queryset(request).get(
-                Q(mobile_number1=mobile_number) | Q(mobile_number2=mobile_number)
-            )
-        except Person.DoesNotExist:
+        person = LoginBundleService.find_person(mobile_number, is_demo=is_demo_login(request))
+        if person is None:
             error_message = "સભ્ય નોંધાયેલ નથી" if lang == "guj" else "Person not found"
             return Response({"message": error_message}, status=status.HTTP_404_NOT_FOUND)
 
         available_platform = "Ios" if is_ios_platform == True else "Android"
-
-        if player_id :
-            try:
-                player_person = PersonPlayerId.objects.get(player_id=player_id)
-                if player_person:
-                    player_person.person = person
-                    player_person.platform = available_platform
-                    player_person.save()
-            except Exception:
-                PersonPlayerId.objects.create(
-                    person=person,
-                    player_id=player_id,
-                    platform=available_platform,
-                )
-
-        serializer = PersonV4Serializer(
-            person, context={"lang": lang, "person_id": person.id}
+        response_data = LoginBundleService.build(
+            person, lang=lang, player_id=player_id, platform=available_platform
         )
-
-        admin_list = {}
-        admin_list["person"] = serializer.data
-
-        login_surname = person.surname
-        login_samaj   = person.samaj
-        login_village = person.samaj.village if person.samaj else None
-
-        # STEP 1 — SAME SURNAME + SAME SAMAJ ADMINS
-        # (Since Surname is now localized to Samaj, filtering by both is redundant but safe)
-        admin_queryset = get_person_queryset(request).filter(
-            surname=login_surname,
-            samaj=login_samaj,
-            is_admin=True,
-            flag_show=True
-        ).exclude(id=person.id)
-
-
-        # STEP 2 — IF NO ADMIN → VILLAGE SUPER ADMIN
-        if admin_queryset.exists():
-
-            final_admin_queryset = admin_queryset
-
-        else:
-            final_admin_queryset = get_person_queryset(request).filter(
-                samaj__village=login_village,
-                is_admin=True,
-                flag_show=True
-            ).exclude(id=person.id)
-
-        # FINAL RESPONSE
-        admin_list["admin_data"] = PersonGetV4Serializer(
-            final_admin_queryset,
-            many=True,
-            context={"lang": lang}
-        ).data
-       
-        # Add samaj data and referral code
-        # admin_data["referral_code"] = ""
-        # admin_data["samaj_list"] = []
-        # if person.samaj.village:
-        #     samaj_in_village = person.samaj.village.samaj_list.all()
-        #     admin_data["samaj_list"] = SamajSerializer(samaj_in_village, many=True, context={"lang": lang}).data
-        #     print(" samaj_in_village: ", admin_data["samaj_list"])
-        #     # Prioritize the person's own samaj referral code
-        #     if person.samaj and person.samaj.referral_code:
-        #         admin_data["referral_code"] = person.samaj.referral_code
-        #         print("Referral code from person's samaj: ", admin_data["referral_code"])
-        #     # Fallback to first samaj in village for backward compatibility
-        #     elif samaj_in_village.exists() and samaj_in_village.first().referral_code:
-        #         admin_data["referral_code"] = samaj_in_village.first().referral_code
-        #         print("Referral code from first samaj in village: ", admin_data["referral_code"])
-        # print("Admin data before pending count:", admin_data)
-        admin_user_id = serializer.data.get("id")
-        if admin_user_id:
-            # if is_demo:
-            #     pendingdata_count = 0
-            # else:
-            try:
-                person_obj = get_person_queryset(request).get(pk=admin_user_id)
-                print("Person object for pending data count:", type(person_obj))
-                if person_obj.is_admin:
-                    if person_obj.is_admin:
-                        pending_users = get_person_queryset(request).filter(
-                            flag_show=False
-                        )
-                        print("Pending users for super admin:", pending_users)
-                    else:
-                        pending_users = get_person_queryset(request).filter(
-                            flag_show=False, 
-                            samaj=person_obj.samaj,
-                            surname=person_obj.surname
-                        ).exclude(id=person_obj.surname.top_member if person_obj.surname else None)
-                    pendingdata_count = pending_users.count()
-                    print("Pending data count:", pendingdata_count)
-                else:
-                    pendingdata_count = 0
-            except Person.DoesNotExist:
-                pendingdata_count = 0
-            
-            response_data = {"pending-data": pendingdata_count}
-            response_data.update(admin_list)
-            return Response(response_data, status=status.HTTP_200_OK)
-            
-        return Response(admin_list, status=status.HTTP_200_OK)
+        return Response(response_data, status=status.HTTP_200_OK)
 
 
 class AllVillageListView(APIView):
@@ -671,10 +495,7 @@ class  V4RelationtreeAPIView(APIView):
            )
 
        if mobile_number:
-           login_person = get_person_queryset(request).filter(
-               Q(mobile_number1=mobile_number) |
-               Q(mobile_number2=mobile_number),
-           ).select_related("samaj__village").first()
+           login_person = request.login_person
 
            if login_person and login_person.samaj and login_person.samaj.village_id:
                login_village_id = login_person.samaj.village_id
@@ -687,30 +508,15 @@ class  V4RelationtreeAPIView(APIView):
        try:
            person = get_person_queryset(request).get(id=person_id)
            surname = person.surname.id
-           surname_topmember = Surname.objects.get(id=surname)
-           topmember = surname_topmember.top_member
-           # Walk ancestor chain: batch lookups using child_id__in to reduce queries
-           relation_qs = get_relation_queryset(request)
-           parent_data_id = set([person_id])
-           to_process = [person_id]
-
-           while to_process:
-               # fetch parent ids for current batch (no unnecessary joins)
-               parent_ids = list(
-                   relation_qs.filter(child_id__in=to_process).values_list("parent_id", flat=True)
-               )
-               to_process = []
-               for parent_id in parent_ids:
-                   if parent_id == topmember:
-                       continue
-                   if parent_id not in parent_data_id:
-                       parent_data_id.add(parent_id)
-                       to_process.append(parent_id)
+           Surname.objects.get(id=surname)
+           # Self plus every ancestor, resolved by one closure-table subquery
+           ancestor_ids = LineageService.ancestor_ids(person.id, is_demo_login(request))
            person_data_queryset = (
                get_person_queryset(request).filter(
                    surname__id=surname, flag_show=True
                )
-               .exclude(id__in=parent_data_id)
+               .exclude(id=person.id)
+               .exclude(id__in=ancestor_ids)
                .annotate(
                    translated_first_name_annotated=Case(
                        # Gujarati translated name exists
@@ -908,10 +714,7 @@ class V4ParentChildRelationDetailView(APIView):
                 )
  
             if mobile_number:
-                login_person = get_person_queryset(request).filter(
-                    Q(mobile_number1=mobile_number) |
-                    Q(mobile_number2=mobile_number),
-                ).select_related("samaj__village").first()
+                login_person = request.login_person
  
                 if login_person and login_person.samaj and login_person.samaj.village_id:
                     login_village_id = login_person.samaj.village_id
@@ -922,218 +725,47 @@ class V4ParentChildRelationDetailView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
  
-            # Query
-            queryset = (
-                get_person_queryset(request).filter(surname__id=surnameid)
-                .order_by("date_of_birth")
-                .annotate(
-                    translated_first_name=Case(
- 
-                        # Gujarati translated name exists
-                        When(
-                            Q(
-                                translateperson__first_name__isnull=False,
-                                translateperson__language=lang,
-                            ) &
-                            ~Q(samaj__village_id=login_village_id),   
-                            then=Concat(
-                                F("translateperson__first_name"),
-                                Value(" ("),
-                                F("samaj__village__name"),
-                                Value(")"),
-                                output_field=CharField(),
-                            ),
-                        ),
- 
-                        # English name outside village
-                        When(
-                            ~Q(samaj__village_id=login_village_id),
-                            then=Concat(
-                                F("first_name"),
-                                Value(" ("),
-                                F("samaj__village__name"),
-                                Value(")"),
-                                output_field=CharField(),
-                            ),
-                        ),
- 
-                        # Default (same village)
-                        default=Case(
-                            When(
-                                Q(
-                                    translateperson__first_name__isnull=False,
-                                    translateperson__language=lang,
-                                ),
-                                then=F("translateperson__first_name"),
-                            ),
-                            default=F("first_name"),
-                        ),
- 
-                        output_field=CharField(),
-                    ),
-                    translated_middle_name=Case(
-                        When(
-                            Q(
-                                translateperson__middle_name__isnull=False,
-                                translateperson__language=lang,
-                            ),
-                            then=F("translateperson__middle_name"),
-                        ),
-                        default=F("middle_name"),
-                    ),
-                    village_name=F("samaj__village__name"),
-                    samaj_name=F("samaj__name"),
-                )
-                .select_related("surname")
-                .prefetch_related("translateperson")
-            )
- 
-            # Execute the query and fetch results
-            results = list(
-                queryset.values(
-                    "id",
-                    "translated_first_name",
-                    "translated_middle_name",
-                    "date_of_birth",
-                    "profile",
-                    "thumb_profile",
-                    "mobile_number1",
-                    "mobile_number2",
-                    "out_of_country",
-                    "flag_show",
-                    "village_name",
-                    "samaj_name",
-                    "emoji",
-                )
-            )
- 
-            total_count = len(results)
-            relation_data = (
-                get_relation_queryset(request).filter(
-                    Q(parent__surname__id=surnameid)
-                    & Q(child__surname__id=surnameid),
+            # Served from the materialized snapshot of this surname's tree;
+            # only the "(village)" name suffix depends on the login person.
+            try:
+                snapshot = FamilyTreeSnapshotService.get_snapshot(
+                    surnameid, lang, is_demo_login(request)
                 )
-                .select_related("parent", "child")
-                .order_by("parent__date_of_birth", "child__date_of_birth")
+            except Surname.DoesNotExist:
+                return Response({"total_count": 0, "data": []}, status=status.HTTP_200_OK)
+            etag = FamilyTreeSnapshotService.etag(snapshot, login_village_id)
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            total_count, data2 = FamilyTreeSnapshotService.render(
+                snapshot, login_village_id
             )
-            data2 = []
-            if relation_data.exists():
-                data = GetTreeRelationSerializer(relation_data, many=True).data
-                if len(data) > 0:
-                    surname_data = Surname.objects.filter(Q(id=int(surnameid)))
-                    if surname_data.exists():
-                        surname_data = surname_data.first()
-                        top_member = int(
-                            GetSurnameSerializer(surname_data).data.get("top_member", 0) or 0
-                        )
-                        filtered_surname_results = filter(
-                            lambda person: person["id"] == top_member, results
-                        )
-                        surname_relations = next(filtered_surname_results, None)
-                        default_path = os.path.join(
-                            settings.MEDIA_ROOT,
-                            os.getenv("DEFAULT_PROFILE_PATH_WITHOUT_MEDIA"),
-                        )
-                        for j in data:
-                            filtered_parent_results = filter(
-                                lambda person: person["id"] == j["parent"], results
-                            )
-                            parent_relations = next(filtered_parent_results, None)
-                            if parent_relations:
-                                if (
-                                    parent_relations["profile"] != "null"
-                                    and parent_relations["profile"] != ""
-                                ):
-                                    file_path = os.path.join(
-                                        settings.MEDIA_ROOT, parent_relations["profile"]
-                                    )
-                                    if not os.path.exists(file_path):
-                                        parent_relations["profile"] = default_path
-                                else:
-                                    parent_relations["profile"] = default_path
-                                if (
-                                    parent_relations["thumb_profile"] != "null"
-                                    and parent_relations["thumb_profile"] != ""
-                                ):
-                                    file_path = os.path.join(
-                                        settings.MEDIA_ROOT,
-                                        parent_relations["thumb_profile"],
-                                    )
-                                    if not os.path.exists(file_path):
-                                        parent_relations["thumb_profile"] = default_path
-                                else:
-                                    parent_relations["thumb_profile"] = default_path
-                            filtered_child_results = filter(
-                                lambda person: person["id"] == j["child"], results
-                            )
-                            child_relations = next(filtered_child_results, None)
-                            if child_relations:
-                                if (
-                                    child_relations["profile"] != "null"
-                                    and child_relations["profile"] != ""
-                                ):
-                                    file_path = os.path.join(
-                                        settings.MEDIA_ROOT, child_relations["profile"]
-                                    )
-                                    if not os.path.exists(file_path):
-                                        child_relations["profile"] = default_path
-                                else:
-                                    child_relations["profile"] = default_path
-                                if (
-                                    child_relations["thumb_profile"] != "null"
-                                    and child_relations["thumb_profile"] != ""
-                                ):
-                                    file_path = os.path.join(
-                                        settings.MEDIA_ROOT,
-                                        child_relations["thumb_profile"],
-                                    )
-                                    if not os.path.exists(file_path):
-                                        child_relations["thumb_profile"] = default_path
-                                else:
-                                    child_relations["thumb_profile"] = default_path
-                                if child_relations["flag_show"] == True:
-                                    j["child"] = child_relations
-                                    j["parent"] = parent_relations
-                                    parent = j.get("parent")
-                                    flag_show = None
-                                    if parent and isinstance(parent, dict):
-                                        flag_show = parent.get("flag_show")
-                                    if flag_show is not True:
-                                        j["parent"] = surname_relations
-                                    data2.append(j)
             return Response(
-                {"total_count": total_count, "data": data2}, status=status.HTTP_200_OK
+                {"total_count": total_count, "data": data2},
+                status=status.HTTP_200_OK,
+                headers={"ETag": etag},
             )
         else:
             return Response({"total_count": 0, "data": []}, status=status.HTTP_200_OK)
  
     def get_parent_child_relation(self, param, dictionary, lang):
+        # Whole family of ``param``: every relation below its top-most ancestors.
+        root_ids = LineageService.root_ids(param)
         parent_child_relation = ParentChildRelation.objects.filter(
-            Q(parent_id=param) | Q(child_id=param), is_deleted=False
-        )
+            child_id__in=LineageService.descendant_ids(root_ids), is_deleted=False
+        ).select_related("parent", "child")
         if parent_child_relation:
             serializer = GetParentChildRelationSerializer(
                 parent_child_relation, many=True, context={"lang": lang}
             )
+            seen = {
+                (int(data["parent"]["id"]), int(data["child"]["id"]))
+                for data in dictionary
+            }
             for child in serializer.data:
-                tmp = None
-                if len(dictionary) > 0:
-                    for data in dictionary:
-                        if int(child.get("child", None).get("id", None)) == int(
-                            data.get("child", None).get("id", None)
-                        ) and int(data.get("parent", None).get("id", None)) == int(
-                            child.get("parent", None).get("id", None)
-                        ):
-                            tmp = data
-                            break
-                if not tmp:
+                key = (int(child["parent"]["id"]), int(child["child"]["id"]))
+                if key not in seen:
+                    seen.add(key)
                     dictionary.append(child)
-                    self.get_parent_child_relation(
-                        int(child.get("parent", None).get("id", None)), dictionary, lang
-                    )
-                    self.get_parent_child_relation(
-                        int(child.get("child", None).get("id", None)), dictionary, lang
-                    )
  
     def put(self, request, pk=None):
         created_user_id = request.data.get("created_user")
@@ -1590,11 +1222,18 @@ class V4PersonDetailView(APIView):
                     child__in=children
                 )
                 if remove_child_person.exists():
+                    removed_child_ids = list(remove_child_person.values_list("child_id", flat=True))
                     remove_child_person.update(is_deleted=True)
+                    FamilyTreeSnapshotService.refresh_edges([persons.surname_id], is_demo_user)
+                    LineageService.rebuild_for(removed_child_ids, is_demo_user)
+                    SurnameMemberService.refresh_relations([persons.id, *removed_child_ids])
             if guj_first_name or guj_middle_name:
                 lang_data = TranslatePerson.objects.filter(person_id=persons.id, language='guj')
                 if lang_data.exists():
                     lang_data.update(first_name=guj_first_name, middle_name=guj_middle_name, address=guj_address, out_of_address=guj_out_of_address)
+                    FamilyTreeSnapshotService.refresh_person(persons.id, persons.surname_id, persons.is_demo)
+                    PersonSearchService.refresh([persons.id])
+                    SurnameMemberService.refresh([persons.id])
                 else:
                     TranslatePerson.objects.create(person_id=persons, first_name=guj_first_name, middle_name=guj_middle_name, address=guj_address, out_of_address=guj_out_of_address, language='guj')
             elif (lang != "en"):
@@ -1734,7 +1373,9 @@ class V4AdminAccess(APIView):
                     admin.password = new_password
                     admin.save()
 
-            admin_access = admin_access.exclude(flag_show=True)
+            admin_access = prefetch_guj_translations(
+                admin_access.exclude(flag_show=True).select_related(*PENDING_PERSON_RELATED)
+            )
             serializer = PersonV4Serializer(admin_access, many=True)
             if admin_access.exists():
                 error_message = ""
@@ -1959,18 +1600,14 @@ class V4AdminPersons(APIView):
                 )
                 .exclude(id=top_member)
                 .exclude(mobile_number1=["", None])
-                .order_by("first_name")
+                .order_by(f"surname_member__{SurnameMember.sort_field(lang)}", "id")
             )
             if persons.exists():
                 serializer = PersonGetV4Serializer(
                     persons, many=True, context={"lang": lang}
                 )
                 if len(serializer.data) > 0:
-                    data = sorted(
-                        serializer.data,
-                        key=lambda x: (x["first_name"], x["middle_name"], x["surname"]),
-                    )
-                    return JsonResponse({"data": data})
+                    return JsonResponse({"data": serializer.data})
         return JsonResponse({"data": []}, status=status.HTTP_200_OK)
 
     def put(self, request):
@@ -2442,6 +2079,12 @@ class V4AdminPersonDetailView(APIView):
                 father_data = get_relation_queryset(request).filter(child=persons.id)
                 if father_data.exists():
                     father_data.update(child=persons.id, parent_id=father, is_demo=is_demo_user)
+                    FamilyTreeSnapshotService.refresh_edges(
+                        [persons.surname_id], is_demo_user,
+                        relation_ids=list(father_data.values_list("id", flat=True)),
+                    )
+                    LineageService.rebuild_for([persons.id], is_demo_user)
+                    SurnameMemberService.refresh_relations([persons.id, father])
                 else:
                     ParentChildRelation.objects.create(child=persons, parent_id=father, created_user=persons, is_demo=is_demo_user)
  
@@ -2488,12 +2131,19 @@ class V4AdminPersonDetailView(APIView):
                     child__in=children
                 )
                 if remove_child_person.exists():
+                    removed_child_ids = list(remove_child_person.values_list("child_id", flat=True))
                     remove_child_person.update(is_deleted=True)
+                    FamilyTreeSnapshotService.refresh_edges([persons.surname_id], is_demo_user)
+                    LineageService.rebuild_for(removed_child_ids, is_demo_user)
+                    SurnameMemberService.refresh_relations([persons.id, *removed_child_ids])
                             
             if guj_first_name or guj_middle_name:
                 lang_data = TranslatePerson.objects.filter(person_id=persons.id, language='guj')
                 if lang_data.exists():
                     lang_data.update(first_name=guj_first_name, middle_name=guj_middle_name, address=guj_address, out_of_address=guj_out_of_address)
+                    FamilyTreeSnapshotService.refresh_person(persons.id, persons.surname_id, persons.is_demo)
+                    PersonSearchService.refresh([persons.id])
+                    SurnameMemberService.refresh([persons.id])
                 else:
                     TranslatePerson.objects.create(person_id=persons, first_name=guj_first_name, middle_name=guj_middle_name, address=guj_address, out_of_address=guj_out_of_address, language='guj')
  
@@ -2527,53 +2177,32 @@ class V4SearchbyPerson(APIView):
         except Person.DoesNotExist:
             return JsonResponse({"message": "Person not found"}, status=404)
  
-        # Build search query
-        search_keywords = search.split(" ")
-        search_q = Q()
-        for keyword in search_keywords:
-            search_q &= (
-                Q(first_name__icontains=keyword)
-                | Q(date_of_birth__icontains=keyword)
-                | Q(mobile_number1__icontains=keyword)
-                | Q(mobile_number2__icontains=keyword)
-                | Q(surname__name__icontains=keyword)
-                | Q(surname__guj_name__icontains=keyword)
-                | Q(translateperson__first_name__icontains=keyword)
-            )
- 
-        # Samaj + Village restriction
-        base_filter = Q(
-            samaj_id=login_person.samaj_id,
-            samaj__village_id=login_person.samaj.village_id,
-            flag_show=True,
-            is_deleted=False,
-        )
- 
-        persons = (
-            get_person_queryset(request).filter(search_q & base_filter)
-             .exclude(
-                id__in=Surname.objects.exclude(
-                    top_member__in=["", None]
-                ).annotate(
-                    top_member_as_int=Cast("top_member", IntegerField())
-                ).values_list("top_member_as_int", flat=True)
-            )
-            .select_related("surname", "samaj__village")
-            .distinct()
-            .order_by(
-                "first_name",
-                "translateperson__first_name",
-                "middle_name",
-                "translateperson__middle_name",
-                "surname__name",
-            )
+        # Ranked, samaj-scoped match on the trigram-indexed search documents.
+        try:
+            page = max(int(request.data.get("page", 1)), 1)
+            page_size = min(max(int(request.data.get("page_size", SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return JsonResponse({"message": "Invalid page or page_size"}, status=400)
+
+        if login_person.samaj_id is None:
+            return JsonResponse({"data": [], "page": page, "page_size": page_size, "has_next": False}, status=200)
+
+        offset = (page - 1) * page_size
+        persons = list(
+            PersonSearchService.search(
+                search, login_person.samaj_id, is_demo=is_demo_login(request)
+            )[offset:offset + page_size + 1]
         )
- 
+        has_next = len(persons) > page_size
+
         data = PersonGetDataSortSerializer(
-            persons, many=True, context={"lang": lang}
+            persons[:page_size], many=True, context={"lang": lang}
+        )
+
+        return JsonResponse(
+            {"data": data.data, "page": page, "page_size": page_size, "has_next": has_next},
+            status=200,
         )
- 
-        return JsonResponse({"data": data.data}, status=200)
 
 class V4PendingApproveDetailView(APIView):
     authentication_classes = []
@@ -2622,16 +2251,23 @@ class V4PendingApproveDetailView(APIView):
  
             # Filter users by surname instead of top_member
             if person.is_admin == True:
-                pending_users = get_person_queryset(request).filter(
-                    flag_show=False
-                ).exclude(id=surname.top_member)
-                if not pending_users.exists():
+                queue = PendingApprovalService.queue(is_demo=is_demo_login(request)).exclude(
+                    person_id=surname.top_member
+                )
+                if not queue.exists():
                     return Response(
                         {
                             "message": "No users with pending confirmation for this surname"
                         },
                         status=status.HTTP_200_OK,
                     )
+                if "page" in request.data:
+                    return self.queue_page(request, queue, lang)
+                pending_users = prefetch_guj_translations(
+                    get_person_queryset(request).filter(
+                        flag_show=False
+                    ).exclude(id=surname.top_member).select_related(*PENDING_PERSON_RELATED)
+                )
                 child_users = pending_users.filter(child_flag=True).order_by(
                     "first_name"
                 )
@@ -2648,9 +2284,11 @@ class V4PendingApproveDetailView(APIView):
                 }
             elif person.is_admin == True:
  
-                pending_users = get_person_queryset(request).filter(
-                    flag_show=False, surname=surname
-                ).exclude(id=surname.top_member)
+                pending_users = prefetch_guj_translations(
+                    get_person_queryset(request).filter(
+                        flag_show=False, surname=surname
+                    ).exclude(id=surname.top_member).select_related(*PENDING_PERSON_RELATED)
+                )
                 if not pending_users.exists():
                     return Response(
                         {
@@ -2686,7 +2324,39 @@ class V4PendingApproveDetailView(APIView):
             return Response(
                 {"message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        
+
+    def queue_page(self, request, queue, lang):
+        """One page of the approval queue, oldest request first."""
+        try:
+            page = max(int(request.data.get("page", 1)), 1)
+            page_size = min(max(int(request.data.get("page_size", PENDING_PAGE_SIZE)), 1), PENDING_MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return Response({"message": "Invalid page or page_size"}, status=status.HTTP_400_BAD_REQUEST)
+
+        offset = (page - 1) * page_size
+        person_ids = list(queue.values_list("person_id", flat=True)[offset:offset + page_size + 1])
+        has_next = len(person_ids) > page_size
+        person_ids = person_ids[:page_size]
+        persons = {
+            person.id: person
+            for person in prefetch_guj_translations(
+                Person.objects.filter(id__in=person_ids).select_related(*PENDING_PERSON_RELATED)
+            )
+        }
+        ordered = [persons[person_id] for person_id in person_ids if person_id in persons]
+        data = {
+            "child": PersonV4Serializer(
+                [person for person in ordered if person.child_flag], many=True, context={"lang": lang}
+            ).data,
+            "others": PersonV4Serializer(
+                [person for person in ordered if not person.child_flag], many=True, context={"lang": lang}
+            ).data,
+        }
+        return Response(
+            {"message": "success", "data": data, "page": page, "page_size": page_size, "has_next": has_next},
+            status=status.HTTP_200_OK,
+        )
+
     def put(self, request, format=None):
         try:
             admin_user_id = request.data.get("admin_user_id")
@@ -2868,6 +2538,63 @@ class V4PendingApproveDetailView(APIView):
                 {"message": f"Failed to delete the record"},
                 status=status.HTTP_404_NOT_FOUND,
             )   
+class V4PendingApproveBulkView(APIView):
+    """Approve or reject many pending members in one request."""
+    authentication_classes = []
+
+    @swagger_auto_schema(
+        operation_description="Approve or reject pending members in bulk",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["admin_user_id", "person_ids", "action"],
+            properties={
+                "admin_user_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                "person_ids": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                "action": openapi.Schema(type=openapi.TYPE_STRING, enum=list(PendingApprovalService.ACTIONS)),
+            },
+        ),
+        responses={200: "Reviewed and skipped ids", 400: "Invalid request", 403: "Not allowed", 404: "Admin not found"},
+    )
+    def post(self, request):
+        admin_user_id = request.data.get("admin_user_id")
+        action = request.data.get("action")
+        person_ids = request.data.get("person_ids")
+        if not admin_user_id:
+            return Response({"message": "Missing Admin User in request data"}, status=status.HTTP_400_BAD_REQUEST)
+        if action not in PendingApprovalService.ACTIONS:
+            return Response(
+                {"message": f"action must be one of {', '.join(PendingApprovalService.ACTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            if not isinstance(person_ids, list) or not person_ids:
+                raise TypeError
+            person_ids = {int(person_id) for person_id in person_ids}
+        except (TypeError, ValueError):
+            return Response({"message": "person_ids must be a non-empty list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            admin_person = get_person_queryset(request).select_related("surname").get(pk=admin_user_id)
+        except (Person.DoesNotExist, ValueError):
+            return Response({"message": "Admin Person not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not admin_person.is_admin:
+            return Response({"message": "User does not have admin access"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Cross-validate X-Mobile-Number header
+        mobile_header = request.headers.get("X-Mobile-Number")
+        if mobile_header and mobile_header not in (admin_person.mobile_number1, admin_person.mobile_number2):
+            return Response(
+                {"message": "Unauthorized: Mobile number does not match admin user"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        reviewed, skipped = PendingApprovalService.review(admin_person, person_ids, action)
+        return Response(
+            {"message": "success", "action": action, "reviewed": reviewed, "skipped": skipped},
+            status=status.HTTP_200_OK,
+        )
+
+
 class PersonBySurnameViewV4(APIView):
     def post(self, request):
         surname = request.data.get("surname")
@@ -2879,145 +2606,66 @@ class PersonBySurnameViewV4(APIView):
             message = "અટક જરૂરી છે" if lang == "guj" else "Surname ID is required"
             return JsonResponse({"message": message, "data": []}, status=400)
  
-        # Base queryset — demo-aware
-        queryset = get_person_queryset(request).filter(surname__id=surname, flag_show=True)
- 
         # Filter by Samaj if mobile header is provided
+        samaj_id = None
         if mobile_header:
-            try:
-                request_person = get_person_queryset(request).filter(
-                    Q(mobile_number1=mobile_header) | Q(mobile_number2=mobile_header),
-                    is_deleted=False
-                ).first()
-                if request_person and request_person.samaj:
-                    queryset = queryset.filter(samaj=request_person.samaj)
-            except Exception:
-                pass
- 
-        from django.db.models import Subquery, OuterRef
-        
-        trans_first_name_sq = Subquery(
-            TranslatePerson.objects.filter(
-                person_id=OuterRef("pk"),
-                language=lang,
-                is_deleted=False
-            ).values("first_name")[:1]
-        )
-        trans_middle_name_sq = Subquery(
-            TranslatePerson.objects.filter(
-                person_id=OuterRef("pk"),
-                language=lang,
-                is_deleted=False
-            ).values("middle_name")[:1]
+            request_person = getattr(request, "login_person", None)
+            if request_person and request_person.samaj_id:
+                samaj_id = request_person.samaj_id
+
+        # Top members (configured or roots of the relation graph) are
+        # precomputed in SurnameMember, so this is one sorted select.
+        members = SurnameMemberService.members(
+            surname,
+            is_demo=is_demo_login(request),
+            samaj_id=samaj_id,
+            lang=lang,
+            mobile_only=is_father_selection != "true",
         )
 
-        # Exclude top members for both real and demo scopes.
-        # 1) Use configured Surname.top_member when it belongs to current scope.
-        # 2) Also derive root members from relation graph in current scope (demo-aware).
-        top_member_ids = set()
-        configured_top_member = (
-            Surname.objects.filter(id=surname)
-            .exclude(top_member__in=["", None])
-            .annotate(top_member_as_int=Cast("top_member", IntegerField()))
-            .values_list("top_member_as_int", flat=True)
-            .first()
-        )
-        if configured_top_member and queryset.filter(id=configured_top_member).exists():
-            top_member_ids.add(configured_top_member)
-
-        scoped_member_ids = list(queryset.values_list("id", flat=True))
-        if scoped_member_ids:
-            scoped_relations = get_relation_queryset(request).filter(
-                parent_id__in=scoped_member_ids,
-                child_id__in=scoped_member_ids,
-            )
-            parent_ids = set(scoped_relations.values_list("parent_id", flat=True))
-            child_ids = set(scoped_relations.values_list("child_id", flat=True))
-            top_member_ids.update(parent_ids - child_ids)
-
-        persons_base_qs = (
-            queryset.exclude(id__in=top_member_ids) if top_member_ids else queryset
-        )
-
-        persons_qs = (
-            persons_base_qs
-            .select_related("surname")
-            .annotate(
-                trans_fname=trans_first_name_sq,
-                trans_mname=trans_middle_name_sq
-            )
-            .distinct()
-            .values(
-                "id",
-                "first_name",
-                "trans_fname",
-                "middle_name",
-                "trans_mname",
-                "date_of_birth",
-                "mobile_number1",
-                "mobile_number2",
-                "flag_show",
-                "profile",
-                "is_admin",
-                "surname",
-                "surname__name",
-                "surname__guj_name",
-                "thumb_profile",
-            )
-        )
- 
-        if is_father_selection != "true":
-            persons_qs = persons_qs.filter(
-                Q(mobile_number1__isnull=False) | Q(mobile_number2__isnull=False)
-            ).exclude(mobile_number1="")
- 
-        if persons_qs.exists():
-            persons_list = list(persons_qs)
-            
-            # Sort manually to avoid grouping/re-triggering distinct inside order_by
-            if lang == "en":
-                persons_list.sort(key=lambda x: (x.get("first_name") or "", x.get("middle_name") or ""))
+        default_profile = os.getenv("DEFAULT_PROFILE_PATH")
+        persons_list = []
+        for member in members:
+            first_name = member["person__first_name"]
+            middle_name = member["person__middle_name"]
+            if lang != "en":
+                surname_name = member["person__surname__guj_name"]
+                trans_first_name, trans_middle_name = first_name, middle_name
+                first_name = member["guj_first_name"] or first_name
+                middle_name = member["guj_middle_name"] or middle_name
             else:
-                persons_list.sort(key=lambda x: (x.get("trans_fname") or "", x.get("trans_mname") or ""))
+                surname_name = member["person__surname__name"]
+                trans_first_name = trans_middle_name = None
+
+            profile = member["person__profile"]
+            thumb_profile = member["person__thumb_profile"]
+            persons_list.append(
+                {
+                    "id": member["person_id"],
+                    "first_name": first_name,
+                    "middle_name": middle_name,
+                    "trans_first_name": trans_first_name,
+                    "trans_middle_name": trans_middle_name,
+                    "date_of_birth": member["person__date_of_birth"],
+                    "mobile_number1": member["person__mobile_number1"],
+                    "mobile_number2": member["person__mobile_number2"],
+                    "flag_show": member["person__flag_show"],
+                    "profile": (
+                        f"/media/{profile}" if profile and str(profile) not in ("null", "") else default_profile
+                    ),
+                    "is_admin": member["person__is_admin"],
+                    "surname": surname_name,
+                    "thumb_profile": (
+                        f"/media/{thumb_profile}"
+                        if thumb_profile and str(thumb_profile) not in ("null", "")
+                        else default_profile
+                    ),
+                }
+            )
 
-            for person in persons_list:
-                # Swap the values between first_name and middle_name
-                if lang != "en":
-                    person["surname"] = person.pop("surname__guj_name", person.get("surname"))
-                    person.pop("surname__name", None)
-                    
-                    person["trans_first_name"] = person.get("first_name")
-                    person["trans_middle_name"] = person.get("middle_name")
-                    
-                    person["first_name"] = person.pop("trans_fname", None) or person.get("first_name")
-                    person["middle_name"] = person.pop("trans_mname", None) or person.get("middle_name")
-                else:
-                    person["surname"] = person.pop("surname__name", person.get("surname"))
-                    person.pop("surname__guj_name", None)
-                    
-                    person["trans_first_name"] = person.pop("trans_fname", None)
-                    person["trans_middle_name"] = person.pop("trans_mname", None)
+        return JsonResponse({"data": persons_list}, status=200)
 
-                if (
-                    person.get("profile")
-                    and str(person["profile"]) not in ("null", "")
-                ):
-                    person["profile"] = f"/media/{(person['profile'])}"
-                else:
-                    person["profile"] = os.getenv("DEFAULT_PROFILE_PATH")
-                    
-                if (
-                    person.get("thumb_profile")
-                    and str(person["thumb_profile"]) not in ("null", "")
-                ):
-                    person["thumb_profile"] = f"/media/{(person['thumb_profile'])}"
-                else:
-                    person["thumb_profile"] = os.getenv("DEFAULT_PROFILE_PATH")
 
-            return JsonResponse({"data": persons_list}, status=200)
- 
-        return JsonResponse({"data": []}, status=200)
-        
 from rest_framework.parsers import MultiPartParser, FormParser
 
 class CSVUploadAPIView(APIView):
@@ -3038,29 +2686,51 @@ class CSVUploadAPIView(APIView):
         return val
 
     @swagger_auto_schema(
-        operation_description="Upload members via CSV/XLSX with strict location matching. Supports Dashboard sheet for referral codes.",
+        operation_description="Queue a member import from CSV/XLSX with strict location matching. Supports Dashboard sheet for referral codes. Poll the returned job for progress.",
         manual_parameters=[
             openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, description="CSV or XLSX File", required=True)
         ],
-        responses={200: "Processed successfully", 400: "Invalid data"}
+        responses={202: "Import queued", 400: "Invalid data"}
     )
     def post(self, request):
         uploaded_file = request.FILES.get('file')
         if not uploaded_file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
 
-        result = CSVImportService.process_file(uploaded_file, request=request)
-        
-        if "error" in result:
-            return Response({"error": result["error"]}, status=status.HTTP_400_BAD_REQUEST)
+        ext = uploaded_file.name.lower().split('.')[-1]
+        if ext not in ['csv', 'xlsx', 'xls']:
+            return Response({"error": "Only CSV or XLSX files are supported"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ImportJob.objects.create(
+            file=uploaded_file,
+            original_filename=uploaded_file.name,
+            is_demo=is_demo_login(request),
+            created_by=getattr(request, "login_person", None),
+        )
+        transaction.on_commit(lambda: run_import_job.delay(job.id))
 
         return Response({
-            "message": f"Processed successfully. Created {result['created']} and updated {result['updated']} entries.",
-            "created": result['created'],
-            "updated": result['updated'],
-            "bug_file": result['bug_file_url']
-        }, status=status.HTTP_200_OK)
-    
+            "message": "Import started. Poll the job for progress.",
+            "job": ImportJobSerializer(job, context={"request": request}).data,
+            "progress_url": request.build_absolute_uri(
+                reverse("v4-upload-csv-job", kwargs={"job_id": job.id})
+            ),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class CSVUploadJobAPIView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, job_id):
+        job = ImportJob.objects.filter(pk=job_id).first()
+        if not job:
+            return Response({"error": "Import job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            ImportJobSerializer(job, context={"request": request}).data,
+            status=status.HTTP_200_OK,
+        )
+
 class V4BannerDetailView(APIView):
     def get(self, request):
         lang = request.GET.get("lang", "en")
@@ -3077,10 +2747,7 @@ class V4BannerDetailView(APIView):
         login_person = None
 
         if mobile_header:
-            login_person = get_person_queryset(request).filter(
-                Q(mobile_number1=mobile_header) | Q(mobile_number2=mobile_header),
-                is_deleted=False
-            ).select_related("samaj").first()
+            login_person = request.login_person
 
             if not login_person:
                 return Response(
@@ -3397,12 +3064,25 @@ def append_to_log(filename, message):
 
 class V4ProfileDetailView(APIView):
 
+    def get(self, request, id=None):
+        person_id = id or request.GET.get("id")
+        person = get_person_queryset(request).filter(pk=person_id).first() if person_id else None
+        if not person:
+            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            {
+                "id": person.id,
+                "profile": person.profile.url if person.profile else os.getenv("DEFAULT_PROFILE_PATH"),
+                "thumb_profile": person.thumb_profile.url if person.thumb_profile else os.getenv("DEFAULT_PROFILE_PATH"),
+                "thumb_status": person.thumb_status,
+            },
+            status=status.HTTP_200_OK,
+        )
+
     def post(self, request):
         person_id = request.data.get("id", None)
 
         try:
-            size = (300, 300)
-            quality = 60
             if person_id:
                 person = get_object_or_404(Person, pk=person_id)
                 if person.profile != "":
@@ -3415,22 +3095,26 @@ class V4ProfileDetailView(APIView):
             serializer.is_valid(raise_exception=True)
             serializer_data = serializer.save()
 
+            # The face-cropped thumbnail is generated in the background; the app
+            # polls GET api/v4/profile?id=... until thumb_status is "ready".
             if "profile" in request.FILES:
-                thumb_img = compress_image(
-                    serializer_data.profile,
-                    serializer_data.thumb_profile,
-                    size,
-                    quality,
-                )
+                mark_pending(serializer_data)
+                transaction.on_commit(generate_pending_thumbnails.delay)
 
             if person_id:
                 return Response(
-                    {"success": "Profile data updated successfully!"},
+                    {
+                        "success": "Profile data updated successfully!",
+                        "thumb_status": serializer_data.thumb_status,
+                    },
                     status=status.HTTP_200_OK,
                 )
             else:
                 return Response(
-                    {"success": "Profile data saved successfully!"},
+                    {
+                        "success": "Profile data saved successfully!",
+                        "thumb_status": serializer_data.thumb_status,
+                    },
                     status=status.HTTP_201_CREATED,
                 )
 
@@ -3787,9 +3471,7 @@ class V4CountryWiseSummaryAPIView(APIView):
         if not mobile_number:
             return Response({"error": "Mobile number is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        login_person = get_person_queryset(request).filter(
-            Q(mobile_number1=mobile_number) | Q(mobile_number2=mobile_number),
-        ).first()
+        login_person = request.login_person
 
         if not login_person:
             return Response({"error": "Person not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -3921,14 +3603,13 @@ class AdditionalData(APIView):
         if not mobile_header:
             return Response({"message": "X-Mobile-Number header is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        person_exists = get_person_queryset(request).filter(Q(mobile_number1=mobile_header) | Q(mobile_number2=mobile_header)).exists()
-        if not person_exists:
+        person = request.login_person
+        if not person:
             return Response({"message": "Unauthorized: Mobile number does not match any person"}, status=status.HTTP_403_FORBIDDEN)
 
         lang = request.GET.get("lang", "en")
         
-        person = get_person_queryset(request).filter(Q(mobile_number1=mobile_header) | Q(mobile_number2=mobile_header)).first()
-        samaj_id = person.samaj_id if person else None
+        samaj_id = person.samaj_id
         
         # Try to get samaj specific setting
         additional_data_entry = None
@@ -22,15 +22,14 @@ from io import BytesIO
 
 from PIL import Image
 from django.core.files import File
-import cv2
 import os
-import numpy as np
 from django.contrib.auth import authenticate
 
 from django.db import IntegrityError
 
 import logging
 from .signals import *
+from .thumbnails import crop_face, detect_faces, get_dominant_color
 
 logger = logging.getLogger(__name__)
 
@@ -2099,64 +2098,10 @@ class ParentChildRelationDetailView(APIView):
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 
-prototxt_path = os.getenv("PROTO_TXT_PATH")
-model_path = os.getenv("MODEL_PATH")
-net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-
-
 def find_faces_and_crop(image, aspect_ratio=(1, 1), padding_ratio=50):
-    # Convert PIL Image to an OpenCV Image
-    cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
-    # Get the image dimensions
-    (h, w) = cv_image.shape[:2]
-
-    # Preprocess the image: mean subtraction, scaling, and swapping Red and Blue channels
-    blob = cv2.dnn.blobFromImage(cv_image, 1.0, (300, 300), (104.0, 177.0, 123.0))
-
-    # Pass the blob through the network to detect faces
-    net.setInput(blob)
-    detections = net.forward()
-
-    cropped_images = []
-
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > 0.5:
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-            (startX, startY, endX, endY) = box.astype("int")
-
-            # Calculate the center of the face
-            centerX, centerY = (startX + endX) // 2, (startY + endY) // 2
-
-            # Calculate the width and height based on the desired aspect ratio
-            face_width = endX - startX
-            face_height = face_width * aspect_ratio[1] // aspect_ratio[0]
-
-            # Add padding to include neck and hair
-            padding = int(padding_ratio)
-            crop_top = max(centerY - face_height - padding // 2, 0)
-            crop_bottom = min(centerY + face_height + padding // 2, h)
-
-            # Ensure the dimensions do not exceed the image boundaries
-            crop_left = max(centerX - face_width - padding // 2, 0)
-            crop_right = min(centerX + face_width + padding // 2, w)
-
-            # Crop the image to the calculated dimensions
-            img_cropped = image.crop((crop_left, crop_top, crop_right, crop_bottom))
-            cropped_images.append(img_cropped)
-
-    return cropped_images
-
-
-def get_dominant_color(image, num_colors=1):
-    """Returns the dominant color(s) in the image."""
-    image = image.convert("RGB")
-    pixels = np.array(image).reshape(-1, 3)
-    colors, count = np.unique(pixels, axis=0, return_counts=True)
-    sorted_indices = np.argsort(count)[::-1]
-    dominant_colors = colors[sorted_indices][:num_colors]
-    return tuple(dominant_colors[0])
+    # One crop per detected face; the detector is loaded on first use
+    faces = detect_faces([image.convert("RGB")])[0]
+    return [crop_face(image, box, aspect_ratio, padding_ratio) for box in faces]
 
 
 def compress_image(input_path, output_folder, size=(300, 300), quality=40):